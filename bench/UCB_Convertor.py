@@ -0,0 +1,76 @@
+from decimal import Decimal
+import time
+import src.UC_Convertor as UC_Convertor
+import src.UC_Unit as UC_Unit
+from bench.UCB_FileIO import symbol
+
+SIZES = [1000, 5000, 10000]
+
+def bench_addition():
+	# Time per added unit should stay constant as the number of definitions grows
+	print("Adding units one at a time:")
+	for size in SIZES:
+		convertor = UC_Convertor.Convertor({"m": UC_Unit.Unit("m")}, {}, {"k": (Decimal(10), Decimal(3))})
+		start = time.perf_counter()
+		for i in range(1, size):
+			convertor.addUnit(f"u{symbol(i)}", Decimal(2), UC_Unit.Unit("km"))
+		elapsed = time.perf_counter() - start
+		print(f" -> {size} units: {elapsed * 1e3:.1f} ms ({elapsed / size * 1e6:.2f} us/unit)")
+
+def bench_chained_addition():
+	# Time per added unit should stay constant when each unit depends on the previous one
+	print("Adding a chain of units one at a time:")
+	for size in SIZES:
+		convertor = UC_Convertor.Convertor({"m": UC_Unit.Unit("m")}, {}, {})
+		start = time.perf_counter()
+		for i in range(1, size):
+			convertor.addUnit(f"u{symbol(i)}", Decimal(1), UC_Unit.Unit(f"u{symbol(i - 1)}" if i > 1 else "m"))
+		elapsed = time.perf_counter() - start
+		print(f" -> {size} units: {elapsed * 1e3:.1f} ms ({elapsed / size * 1e6:.2f} us/unit)")
+
+def bench_transaction():
+	# Compare adding units one at a time with adding them in a single transaction
+	print("Adding units in a transaction:")
+	for size in SIZES:
+		convertor = UC_Convertor.Convertor({"m": UC_Unit.Unit("m")}, {}, {"k": (Decimal(10), Decimal(3))})
+		start = time.perf_counter()
+		with convertor.transaction() as transaction:
+			for i in range(1, size):
+				transaction.addUnit(f"u{symbol(i)}", Decimal(2), UC_Unit.Unit("km"))
+		elapsed = time.perf_counter() - start
+		print(f" -> {size} units: {elapsed * 1e3:.1f} ms ({elapsed / size * 1e6:.2f} us/unit)")
+
+def bench_deletion():
+	# Deleting a unit which every other unit depends on should take time linear in the number of units
+	print("Deleting a widely-used unit:")
+	for size in SIZES:
+		convertor = UC_Convertor.Convertor({"m": UC_Unit.Unit("m")}, {}, {"k": (Decimal(10), Decimal(3))})
+		for i in range(1, size):
+			convertor.addUnit(f"u{symbol(i)}", Decimal(2), UC_Unit.Unit("km"))
+		start = time.perf_counter()
+		convertor.delUnit("m")
+		elapsed = time.perf_counter() - start
+		print(f" -> {size} units: {elapsed * 1e3:.1f} ms ({elapsed / size * 1e6:.2f} us/unit)")
+
+def bench_chain():
+	# Compiling a long chain of units should not recurse, and should take time linear in its length
+	print("Compiling a chain of units:")
+	for size in SIZES:
+		convertor = UC_Convertor.Convertor({"m": UC_Unit.Unit("m")}, {}, {})
+		with convertor.transaction() as transaction:
+			for i in range(1, size):
+				transaction.addUnit(f"u{symbol(i)}", Decimal(1), UC_Unit.Unit(f"u{symbol(i - 1)}" if i > 1 else "m"))
+		start = time.perf_counter()
+		convertor.convert(UC_Unit.Unit(f"u{symbol(size - 1)}"), UC_Unit.Unit("m"))
+		elapsed = time.perf_counter() - start
+		print(f" -> {size} units: {elapsed * 1e3:.1f} ms ({elapsed / size * 1e6:.2f} us/unit)")
+
+def main():
+	bench_addition()
+	bench_chained_addition()
+	bench_transaction()
+	bench_deletion()
+	bench_chain()
+
+if (__name__ == "__main__"):
+	main()
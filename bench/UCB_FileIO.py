@@ -0,0 +1,54 @@
+from decimal import Decimal
+import os
+import tempfile
+import time
+import src.UC_Convertor as UC_Convertor
+import src.UC_FileIO as UC_FileIO
+import src.UC_FileParser as UC_FileParser
+import src.UC_Utils as UC_Utils
+from bench.UCB_Numeric import loadConvertor, timePerCall
+
+SIZES = [1000, 10000, 50000]
+
+def symbol(index):
+	# Generate a unique alphabetical symbol
+	sym = ""
+	while True:
+		sym += chr(ord('a') + index % 26)
+		index //= 26
+		if not index: return sym
+
+def generateLines(count):
+	lines = ["m;"]
+	for i in range(1, count):
+		lines.append(f"u{symbol(i)} : {i}.5, m 1;")
+	return lines
+
+def bench_parsing():
+	# Parsing time per line should stay constant as the file grows
+	print("Parsing synthetic unit files:")
+	for size in SIZES:
+		tokens = UC_FileIO.tokenize(generateLines(size))
+		start = time.perf_counter()
+		UC_FileParser.parseFile(UC_Utils.TokenStream(tokens), {}, {}, {})
+		elapsed = time.perf_counter() - start
+		print(f" -> {size} lines: {elapsed * 1e3:.1f} ms ({elapsed / size * 1e6:.2f} us/line)")
+
+def bench_loading():
+	# Compare loading definitions from text with loading a binary snapshot
+	print("Loading standard.uc:")
+	directory = tempfile.TemporaryDirectory()
+	filename = os.path.join(directory.name, "standard.ucb")
+	loadConvertor(Decimal).saveSnapshot(filename)
+	elapsed = timePerCall(lambda: loadConvertor(Decimal))
+	print(f" -> text: {elapsed * 1e3:.2f} ms")
+	elapsed = timePerCall(lambda: UC_Convertor.Convertor.fromSnapshot(filename))
+	print(f" -> snapshot: {elapsed * 1e3:.2f} ms")
+	directory.cleanup()
+
+def main():
+	bench_parsing()
+	bench_loading()
+
+if (__name__ == "__main__"):
+	main()
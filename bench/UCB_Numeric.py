@@ -0,0 +1,118 @@
+from decimal import Decimal
+from fractions import Fraction
+import time
+import timeit
+import tracemalloc
+import src.UC_AST as UC_AST
+import src.UC_Batch as UC_Batch
+import src.UC_Convertor as UC_Convertor
+import src.UC_FileIO as UC_FileIO
+import src.UC_StrParser as UC_StrParser
+import src.UC_Unit as UC_Unit
+
+NUMBER_TYPES = [Decimal, float, Fraction]
+EXPRESSIONS = [
+	"60 mph : m/s",
+	"100 kg * 9.8 m/s^2 : N",
+	"500 N / 12 mm^2 : kPa",
+	"123.4 lb / (5 ft + 6 in)^2 : BMI",
+]
+
+def loadConvertor(numberType):
+	units, conversions, prefixes = {}, {}, {}
+	UC_FileIO.loadFile("standard.uc", units, conversions, prefixes)
+	return UC_Convertor.Convertor(units, conversions, prefixes, numberType = numberType)
+
+def timePerCall(function, repeat = 5):
+	# Use the best of several runs to reduce noise
+	timer = timeit.Timer(function)
+	number, elapsed = timer.autorange()
+	return min([elapsed] + timer.repeat(repeat - 1, number)) / number
+
+def bench_evaluation():
+	print("Evaluating parsed expressions:")
+	for numberType in NUMBER_TYPES:
+		convertor = loadConvertor(numberType)
+		asts = [UC_StrParser.parse(expression, numberType) for expression in EXPRESSIONS]
+		elapsed = timePerCall(lambda: [ast.evaluate(convertor) for ast in asts])
+		print(f" -> {numberType.__name__}: {elapsed / len(asts) * 1e6:.2f} us/expression")
+
+def bench_simplification():
+	print("Evaluating simplified expressions:")
+	for numberType in NUMBER_TYPES:
+		convertor = loadConvertor(numberType)
+		asts = [UC_AST.AST_Simplified(UC_StrParser.parse(expression, numberType)) for expression in EXPRESSIONS]
+		elapsed = timePerCall(lambda: [ast.evaluate(convertor) for ast in asts])
+		print(f" -> {numberType.__name__}: {elapsed / len(asts) * 1e6:.2f} us/expression")
+
+def bench_compilation():
+	# Compare compiled stack machine programs with the closures compiled from the tree
+	print("Evaluating compiled expressions with placeholders:")
+	convertor = loadConvertor(Decimal)
+	for expression in [expression.replace("60", "?").replace("100", "?").replace("500", "?").replace("123.4", "?") for expression in EXPRESSIONS]:
+		unit, function = UC_StrParser.parse(expression).compileNumeric(convertor, convertor.toNumber)
+		program = UC_StrParser.compile(expression).getProgram(convertor)
+		value = Decimal(7)
+		closureTime = timePerCall(lambda: function(value))
+		programTime = timePerCall(lambda: program.run(value))
+		print(f" -> {expression}: closures {closureTime * 1e6:.2f} us, program {programTime * 1e6:.2f} us ({len(program.instructions)} instructions)")
+
+def bench_conversion():
+	print("Applying a compiled conversion to 1000 values:")
+	values = [Decimal(i) / 7 for i in range(1000)]
+	for numberType in NUMBER_TYPES:
+		convertor = loadConvertor(numberType)
+		ast = UC_StrParser.parse("1 mph : m/s", numberType)
+		conversion = convertor.compile(ast.left.evaluate(convertor).unit, ast.right.evaluate(convertor).unit)
+		typedValues = [convertor.toNumber(value) for value in values]
+		elapsed = timePerCall(lambda: [conversion(value) for value in typedValues])
+		print(f" -> {numberType.__name__}: {elapsed / len(values) * 1e9:.1f} ns/value")
+
+def bench_allocation():
+	# Measure the memory allocated while evaluating each expression, once conversions are cached
+	print("Allocating memory during evaluation:")
+	convertor = loadConvertor(Decimal)
+	repeat = 100
+	for expression in EXPRESSIONS:
+		ast = UC_StrParser.parse(expression)
+		ast.evaluate(convertor)
+		results = []
+		peakBytes = 0
+		tracemalloc.start()
+		before = tracemalloc.take_snapshot()
+		for i in range(repeat):
+			tracemalloc.reset_peak()
+			start, peak = tracemalloc.get_traced_memory()
+			results.append(ast.evaluate(convertor))
+			current, peak = tracemalloc.get_traced_memory()
+			peakBytes += peak - start
+		after = tracemalloc.take_snapshot()
+		tracemalloc.stop()
+		blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+		print(f" -> {expression}: peak {peakBytes / repeat:.0f} bytes, {blocks / repeat:.1f} blocks retained per result")
+
+def bench_arrays():
+	# Compare converting a column of values one quantity at a time with converting it as an array
+	print("Converting 1000000 values from mph to m/s:")
+	convertor = loadConvertor(float)
+	srcUnit, dstUnit = UC_Unit.Unit("mph"), UC_Unit.Unit(baseUnits = {"m": 1, "s": -1})
+	values = [i / 7 for i in range(1000000)]
+	start = time.perf_counter()
+	[UC_Unit.Quantity(value * convertor.convert(srcUnit, dstUnit), dstUnit) for value in values]
+	print(f" -> quantities: {(time.perf_counter() - start) * 1e3:.1f} ms")
+	for useNumpy in [False, True] if UC_Batch.numpy is not None else [False]:
+		quantities = UC_Batch.QuantityArray(values, srcUnit, useNumpy)
+		start = time.perf_counter()
+		quantities.to(dstUnit, convertor)
+		print(f" -> {'NumPy array' if useNumpy else 'array.array'}: {(time.perf_counter() - start) * 1e3:.1f} ms")
+
+def main():
+	bench_evaluation()
+	bench_simplification()
+	bench_compilation()
+	bench_conversion()
+	bench_allocation()
+	bench_arrays()
+
+if (__name__ == "__main__"):
+	main()
\ No newline at end of file
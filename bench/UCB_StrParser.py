@@ -0,0 +1,35 @@
+import src.UC_StrParser as UC_StrParser
+from bench.UCB_Numeric import timePerCall
+
+EXPRESSIONS = [
+	"60 mph : m/s",
+	"100 kg * 9.8 m/s^2 : N",
+	"500 N / 12 mm^2 : kPa",
+	"123.4 lb / (5 ft + 6 in)^2 : BMI",
+	"6.022e23 / mol * 1.38e-23 J/K : J/(K*mol)",
+]
+
+def bench_tokenization():
+	# Compare the single-pass tokenizer with the character-level tokenizer
+	print("Tokenizing expressions:")
+	longExpression = " + ".join(f"{i}.5e-3 km/h^2" for i in range(200))
+	for name, strings in [("short", EXPRESSIONS), ("long", [longExpression])]:
+		length = sum(len(string) for string in strings)
+		for tokenize in [UC_StrParser.tokenize, UC_StrParser.tokenizeByCharacter]:
+			elapsed = timePerCall(lambda: [tokenize(string) for string in strings])
+			print(f" -> {name} ({tokenize.__name__}): {length / elapsed / 1e6:.2f} MB/s")
+
+def bench_scaling():
+	# Parsing time per term should stay constant as the expression grows
+	print("Parsing long expressions:")
+	for size in [100, 1000, 10000]:
+		string = " + ".join(f"{i} km/h" for i in range(size))
+		elapsed = timePerCall(lambda: UC_StrParser.parse(string), 3)
+		print(f" -> {size} terms: {elapsed * 1e3:.1f} ms ({elapsed / size * 1e6:.2f} us/term)")
+
+def main():
+	bench_tokenization()
+	bench_scaling()
+
+if (__name__ == "__main__"):
+	main()
@@ -0,0 +1,193 @@
+from decimal import Decimal
+import json
+import math
+import os
+import platform
+import sys
+import tempfile
+import time
+import src.UC_Common as UC_Common
+import src.UC_Convertor as UC_Convertor
+import src.UC_FileIO as UC_FileIO
+import src.UC_StrParser as UC_StrParser
+import src.UC_Unit as UC_Unit
+from bench.UCB_FileIO import generateLines, symbol
+from main import INPUT_EXAMPLES
+
+LONG_EXPRESSION_SIZES = [100, 1000]
+LOAD_SIZES = [10000, 100000, 1000000]
+CHURN_SIZE = 5000
+
+# Fraction by which a latency may grow before it is reported as a regression
+DEFAULT_THRESHOLD = 0.2
+
+def percentile(sortedValues, fraction):
+	# Use the nearest-rank percentile, so that every reported latency was observed
+	return sortedValues[max(0, math.ceil(fraction * len(sortedValues)) - 1)]
+
+def summarize(latencies):
+	"""
+	Summarize the latencies of a benchmark
+	@param latencies: the time taken by each operation, in seconds
+	@return a map of statistic names to values, with latencies in seconds and throughput in operations per second
+	"""
+	sortedLatencies = sorted(latencies)
+	total = sum(sortedLatencies)
+	return {
+		"operations": len(sortedLatencies),
+		"seconds": total,
+		"throughput": len(sortedLatencies) / total if total else math.inf,
+		"mean": total / len(sortedLatencies),
+		"p50": percentile(sortedLatencies, 0.5),
+		"p90": percentile(sortedLatencies, 0.9),
+		"p99": percentile(sortedLatencies, 0.99),
+		"max": sortedLatencies[-1],
+	}
+
+def measure(function, args):
+	"""
+	Time a function once for each set of arguments
+	@param function: the function to time
+	@param args: an iterable of argument tuples
+	@return the time taken by each call, in seconds
+	"""
+	latencies = []
+	clock = time.perf_counter
+	for arg in args:
+		start = clock()
+		function(*arg)
+		latencies.append(clock() - start)
+	return latencies
+
+def loadConvertor(cacheCapacity = None):
+	units, conversions, prefixes = {}, {}, {}
+	UC_FileIO.loadFile("standard.uc", units, conversions, prefixes)
+	UC_FileIO.loadFile("misc.uc", units, conversions, prefixes, True)
+	if cacheCapacity is None: return UC_Convertor.Convertor(units, conversions, prefixes)
+	return UC_Convertor.Convertor(units, conversions, prefixes, cacheCapacity)
+
+def bench_parsing(results, quick):
+	repeat = 200 if quick else 2000
+	results["tokenize_examples"] = summarize(measure(UC_StrParser.tokenize, [(string,) for string in INPUT_EXAMPLES] * repeat))
+	results["parse_examples"] = summarize(measure(UC_StrParser.parse, [(string,) for string in INPUT_EXAMPLES] * repeat))
+	for size in LONG_EXPRESSION_SIZES:
+		string = " + ".join(f"{i}.5e-3 km/h^2" for i in range(size))
+		results[f"parse_long_{size}"] = summarize(measure(UC_StrParser.parse, [(string,)] * max(1, repeat * 10 // size)))
+
+def bench_conversion(results, quick):
+	# Convert between every pair of units which can be converted, since failed conversions are not cached
+	convertor = loadConvertor(0)
+	syms = sorted(convertor.units.keys())
+	if quick: syms = syms[::4]
+	pairs = []
+	for srcSym in syms:
+		for dstSym in syms:
+			srcUnit, dstUnit = UC_Unit.Unit(srcSym), UC_Unit.Unit(dstSym)
+			try: convertor.convert(srcUnit, dstUnit)
+			except UC_Common.UnitError: continue
+			pairs.append((srcUnit, dstUnit))
+
+	# The cached convertor holds every pair, so the timed pass only measures cache hits
+	for name, cacheCapacity in [("convert_pairs_uncached", 0), ("convert_pairs_cached", len(pairs))]:
+		convertor = loadConvertor(cacheCapacity)
+
+		# Compile every unit and fill the cache first, so that only conversions are timed
+		measure(convertor.convert, pairs)
+		before = convertor.conversionCache.getStats()
+		results[name] = summarize(measure(convertor.convert, pairs * max(1, 10000 // len(pairs))))
+		after = convertor.conversionCache.getStats()
+		lookups = after["hits"] + after["misses"] - before["hits"] - before["misses"]
+		results[name]["hit_rate"] = (after["hits"] - before["hits"]) / lookups if lookups else 0
+
+def bench_loading(results, quick):
+	directory = tempfile.TemporaryDirectory()
+	for size in LOAD_SIZES[:1] if quick else LOAD_SIZES:
+		filename = os.path.join(directory.name, f"synthetic{size}.uc")
+		with open(filename, 'w') as file:
+			for line in generateLines(size): file.write(f"{line}\n")
+		repeat = max(1, 100000 // size)
+		results[f"load_file_{size}"] = summarize(measure(lambda: UC_FileIO.loadFile(filename, {}, {}, {}), [()] * repeat))
+	directory.cleanup()
+
+def bench_churn(results, quick):
+	# Repeatedly add units which depend on existing units and on each other, then delete them
+	size = CHURN_SIZE // 10 if quick else CHURN_SIZE
+	convertor = loadConvertor()
+	syms = [f"churn{symbol(i)}" for i in range(size)]
+	dependencies = [UC_Unit.Unit("km") if i % 2 else UC_Unit.Unit(baseUnits = {syms[i - 1]: 1, "s": -1}) for i in range(size)]
+	dependencies[0] = UC_Unit.Unit("km")
+	results["add_unit"] = summarize(measure(convertor.addUnit, [(sym, Decimal(2), unit) for sym, unit in zip(syms, dependencies)]))
+	results["del_unit"] = summarize(measure(lambda sym: convertor.delUnit(sym) if sym in convertor.units else None, [(sym,) for sym in reversed(syms)]))
+
+BENCHMARKS = [bench_parsing, bench_conversion, bench_loading, bench_churn]
+
+def run(quick = False):
+	"""
+	Run every benchmark
+	@param quick: True to run smaller benchmarks, which are quicker but noisier
+	@return a map containing the environment and a map of benchmark names to their statistics
+	"""
+	results = {}
+	for benchmark in BENCHMARKS: benchmark(results, quick)
+	return {
+		"environment": {
+			"python": sys.version.split()[0],
+			"implementation": platform.python_implementation(),
+			"platform": platform.platform(),
+			"quick": quick,
+			"time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+		},
+		"results": results,
+	}
+
+def compare(report, baseline, threshold = DEFAULT_THRESHOLD):
+	"""
+	Compare benchmark results against a baseline
+	A benchmark regresses if its median or mean latency grows by more than the threshold
+	@param report: the benchmark results to check
+	@param baseline: the benchmark results to compare against
+	@param threshold: the fraction by which a latency may grow
+	@return a list of (benchmark name, statistic name, baseline value, new value) tuples for each regression
+	"""
+	regressions = []
+	for name, stats in report["results"].items():
+		if name not in baseline["results"]: continue
+		for statistic in ["p50", "mean"]:
+			old, new = baseline["results"][name][statistic], stats[statistic]
+			if new > old * (1 + threshold): regressions.append((name, statistic, old, new))
+	return regressions
+
+def printComparison(report, baseline, regressions):
+	print(f"{'benchmark':<24} {'baseline p50':>14} {'p50':>14} {'change':>8}")
+	for name, stats in report["results"].items():
+		hitRate = f" (cache hit rate {stats['hit_rate'] * 100:.1f}%)" if "hit_rate" in stats else ""
+		if name not in baseline["results"]:
+			print(f"{name:<24} {'-':>14} {stats['p50'] * 1e6:>11.2f} us {'new':>8}{hitRate}")
+			continue
+		old = baseline["results"][name]["p50"]
+		print(f"{name:<24} {old * 1e6:>11.2f} us {stats['p50'] * 1e6:>11.2f} us {(stats['p50'] / old - 1) * 100:>+7.1f}%{hitRate}")
+	for name, statistic, old, new in regressions:
+		print(f"Regression: {name} {statistic} grew from {old * 1e6:.2f} us to {new * 1e6:.2f} us")
+
+def main(output = None, baselineFilename = None, threshold = DEFAULT_THRESHOLD, quick = False):
+	"""
+	Run every benchmark, write the results, and compare them against a baseline
+	@param output: the name of the JSON file to write, '-' for standard output, or None to not write results
+	@param baselineFilename: the name of a JSON file written by a previous run, or None to not compare results
+	@param threshold: the fraction by which a latency may grow before it is reported as a regression
+	@param quick: True to run smaller benchmarks
+	@return the number of regressions
+	"""
+	report = run(quick)
+	if output == "-": print(json.dumps(report, indent = "\t"))
+	elif output is not None:
+		with open(output, 'w') as file: json.dump(report, file, indent = "\t")
+	if baselineFilename is None: return 0
+
+	with open(baselineFilename, 'r') as file: baseline = json.load(file)
+	for key in ["python", "implementation", "quick"]:
+		if baseline["environment"].get(key) != report["environment"][key]:
+			print(f"Warning: baseline was run with {key} {baseline['environment'].get(key)}; now running with {report['environment'][key]}")
+	regressions = compare(report, baseline, threshold)
+	printComparison(report, baseline, regressions)
+	return len(regressions)
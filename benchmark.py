@@ -0,0 +1,21 @@
+import argparse
+import bench.UCB_Convertor as UCB_Convertor
+import bench.UCB_FileIO as UCB_FileIO
+import bench.UCB_Numeric as UCB_Numeric
+import bench.UCB_StrParser as UCB_StrParser
+import bench.UCB_Suite as UCB_Suite
+
+if (__name__ == "__main__"):
+	parser = argparse.ArgumentParser(description = "Run the benchmarks, printing a summary of each by default")
+	parser.add_argument("--json", metavar = "FILE", help = "run the benchmark suite and write its results to FILE ('-' for standard output)")
+	parser.add_argument("--compare", metavar = "BASELINE", help = "run the benchmark suite and report regressions against results written by --json")
+	parser.add_argument("--threshold", type = float, default = UCB_Suite.DEFAULT_THRESHOLD, help = "fraction by which a latency may grow before it is a regression")
+	parser.add_argument("--quick", action = "store_true", help = "run a smaller benchmark suite")
+	args = parser.parse_args()
+
+	if args.json is None and args.compare is None:
+		UCB_Numeric.main()
+		UCB_StrParser.main()
+		UCB_FileIO.main()
+		UCB_Convertor.main()
+	elif UCB_Suite.main(args.json, args.compare, args.threshold, args.quick): exit(1)
@@ -1,63 +1,105 @@
 from decimal import Decimal
 import fileinput
+import sys
+import src.UC_Batch as UC_Batch
 import src.UC_FileIO as UC_FileIO
+import src.UC_AST as UC_AST
 import src.UC_Convertor as UC_Convertor
+import src.UC_Snapshot as UC_Snapshot
 import src.UC_StrParser as UC_StrParser
 import src.UC_Common as UC_Common
 import src.UC_Utils as UC_Utils
 
 DEFAULT_FILE = "standard.uc"
 
-COMMAND_EXIT   = "exit"
-COMMAND_HELP   = "help"
-COMMAND_EVAL   = "eval"
-COMMAND_SHOW   = "show"
-COMMAND_ADD    = "add"
-COMMAND_DEL    = "del"
-COMMAND_LOAD   = "load"
-COMMAND_SAVE   = "save"
-COMMAND_UNLOAD = "unload"
+COMMAND_EXIT    = "exit"
+COMMAND_HELP    = "help"
+COMMAND_EVAL    = "eval"
+COMMAND_SHOW    = "show"
+COMMAND_ADD     = "add"
+COMMAND_DEL     = "del"
+COMMAND_LOAD    = "load"
+COMMAND_SAVE    = "save"
+COMMAND_UNLOAD  = "unload"
+COMMAND_EXPLAIN = "explain"
 convertor = UC_Convertor.Convertor({}, {}, {})
 INDENT = " -> "
+INPUT_EXAMPLES = [
+	"60 mph : m/s",
+	"100 kg * 9.8 m/s^2 : N",
+	"500 N / 12 mm^2 : kPa",
+	"123.4 lb / (5 ft + 6 in)^2 : BMI",
+]
 
 def command_help(args):
 	helpStrings = {
-		COMMAND_EXIT  : "Exit the program",
-		COMMAND_HELP  : "Print this text",
-		COMMAND_EVAL  : "Evaluate an expression from file",
-		COMMAND_SHOW  : "Show currently-loaded definitions",
-		COMMAND_ADD   : "Add a unit/prefix definition",
-		COMMAND_DEL   : "Delete a unit/prefix definition and all definitions which depend on it",
-		COMMAND_LOAD  : "Load additional definitions from file",
-		COMMAND_SAVE  : "Save currently-loaded definitions to file",
-		COMMAND_UNLOAD: "Unload all currently-loaded definitions",
+		COMMAND_EXIT   : "Exit the program",
+		COMMAND_HELP   : "Print this text",
+		COMMAND_EVAL   : "Evaluate an expression from file, or each line of a file separately",
+		COMMAND_SHOW   : "Show currently-loaded definitions",
+		COMMAND_ADD    : "Add a unit/prefix definition",
+		COMMAND_DEL    : "Delete a unit/prefix definition and all definitions which depend on it",
+		COMMAND_LOAD   : "Load additional definitions from file",
+		COMMAND_SAVE   : "Save currently-loaded definitions to file",
+		COMMAND_UNLOAD : "Unload all currently-loaded definitions",
+		COMMAND_EXPLAIN: "Explain each step of a unit conversion",
 	}
 
-	inputExamples = [
-		"60 mph : m/s",
-		"100 kg * 9.8 m/s^2 : N",
-		"500 N / 12 mm^2 : kPa",
-		"123.4 lb / (5 ft + 6 in)^2 : BMI",
-	]
-
 	print("--------------------------")
 	print("Available commands:")
 	for command, helpString in helpStrings.items(): print(f"{INDENT}{command}: {helpString}")
 	print("Example input:")
-	for example in inputExamples: print(f"{INDENT}{example}")
+	for example in INPUT_EXAMPLES: print(f"{INDENT}{example}")
 	print("--------------------------")
 
+def command_eval_batch(args):
+	usage = f"Usage: {COMMAND_EVAL} <input filename|-> <output filename|-> [{'|'.join(UC_Batch.FORMATS)}] [workers]"
+	format = args[3] if len(args) > 3 else ("jsonl" if args[2].endswith(".jsonl") else "csv")
+	if len(args) > 5 or format not in UC_Batch.FORMATS or (len(args) == 5 and not args[4].isdigit()): print(usage)
+	else:
+		workers = int(args[4]) if len(args) == 5 else 1
+		try:
+			# Standard input is read and standard output is written as results are generated
+			inputFile = sys.stdin if args[1] == "-" else open(args[1], 'r')
+			try:
+				outputFile = sys.stdout if args[2] == "-" else open(args[2], 'w', newline = "")
+				try: count, errors = UC_Batch.writeResults(UC_Batch.evaluateLines(inputFile, convertor, workers), outputFile, format)
+				finally:
+					if outputFile is not sys.stdout: outputFile.close()
+			finally:
+				if inputFile is not sys.stdin: inputFile.close()
+			# Keep the summary out of results written to standard output
+			print(f"Evaluated {count} lines ({errors} errors)", file = sys.stderr if args[2] == "-" else sys.stdout)
+		except OSError as err: print(err)
+
 def command_eval(args):
-	if len(args) == 2:
+	if len(args) > 2: command_eval_batch(args)
+	elif len(args) == 2:
 		try:
 			file = open(args[1], 'r')
 			line = " ".join(file.readlines())
 			file.close()
-			ast = UC_StrParser.parse(line)
+			ast = UC_StrParser.parseSimplified(line)
 			print(f"Interpreting input as: '{str(ast)}'")
 			print(f"{INDENT}{str(ast.evaluate(convertor))}")
 		except (OSError, UC_Common.UnitError) as err: print(err)
-	else: print(f"Usage: {COMMAND_EVAL} <filename>")
+	else:
+		print(f"Usage: {COMMAND_EVAL} <filename>")
+		print(f"Usage: {COMMAND_EVAL} <input filename|-> <output filename|-> [{'|'.join(UC_Batch.FORMATS)}] [workers]")
+
+def command_explain(args):
+	usage = f"Usage: {COMMAND_EXPLAIN} <expression> : <expression>"
+	if len(args) < 2: print(usage)
+	else:
+		try:
+			ast = UC_StrParser.parseCached(" ".join(args[1:]))
+			if not isinstance(ast, UC_AST.AST_Eql): print(usage)
+			else:
+				print(f"Interpreting input as: '{str(ast)}'")
+				srcUnit = ast.left.evaluate(convertor).unit
+				dstUnit = ast.right.evaluate(convertor).unit
+				print(convertor.explain(srcUnit, dstUnit))
+		except UC_Common.UnitError as err: print(err)
 
 def command_show(args):
 	usage = f"Usage: {COMMAND_SHOW} <unit|prefix> [symbol]"
@@ -137,11 +179,13 @@ def command_load(args):
 	else:
 		try:
 			global convertor
-			units       = {} if args[2] == "0" else convertor.units.copy()
-			conversions = {} if args[2] == "0" else convertor.conversions.copy()
-			prefixes    = {} if args[2] == "0" else convertor.prefixes.copy()
-			UC_FileIO.loadFile(args[1], units, conversions, prefixes, args[2] == "1")
-			convertor = UC_Convertor.Convertor(units, conversions, prefixes)
+			if args[2] == "0" and UC_Snapshot.isSnapshot(args[1]):
+				convertor = UC_Convertor.Convertor.fromSnapshot(args[1])
+			elif args[2] == "0":
+				units, conversions, prefixes = {}, {}, {}
+				UC_FileIO.loadFile(args[1], units, conversions, prefixes)
+				convertor = UC_Convertor.Convertor(units, conversions, prefixes)
+			else: convertor.load(args[1], args[2] == "1")
 			print(f"Successfully loaded definitions from '{args[1]}'")
 		except (OSError, UC_Common.UnitError, UC_Common.FileFormatError) as err:
 			print(f"Encountered error while loading from '{args[1]}': {err}")
@@ -157,20 +201,22 @@ def command_save(args):
 	if len(args) != 2: print(f"Usage: {COMMAND_SAVE} <filename>")
 	else:
 		try:
-			UC_FileIO.writeFile(args[1], convertor.units, convertor.conversions, convertor.prefixes)
+			if args[1].endswith(UC_Snapshot.EXTENSION): convertor.saveSnapshot(args[1])
+			else: UC_FileIO.writeFile(args[1], convertor.units, convertor.conversions, convertor.prefixes)
 			print(f"Successfully saved definitions to '{args[1]}'")
 		except OSError as err: print(f"Encountered error while saving to '{args[1]}': {err}")
 
 commands = {
-	COMMAND_EXIT  : (lambda args: exit()),
-	COMMAND_HELP  : (lambda args: command_help(args)),
-	COMMAND_EVAL  : (lambda args: command_eval(args)),
-	COMMAND_SHOW  : (lambda args: command_show(args)),
-	COMMAND_ADD   : (lambda args: command_add(args)),
-	COMMAND_DEL   : (lambda args: command_del(args)),
-	COMMAND_LOAD  : (lambda args: command_load(args)),
-	COMMAND_SAVE  : (lambda args: command_save(args)),
-	COMMAND_UNLOAD: (lambda args: command_unload(args)),
+	COMMAND_EXIT   : (lambda args: exit()),
+	COMMAND_HELP   : (lambda args: command_help(args)),
+	COMMAND_EVAL   : (lambda args: command_eval(args)),
+	COMMAND_SHOW   : (lambda args: command_show(args)),
+	COMMAND_ADD    : (lambda args: command_add(args)),
+	COMMAND_DEL    : (lambda args: command_del(args)),
+	COMMAND_LOAD   : (lambda args: command_load(args)),
+	COMMAND_SAVE   : (lambda args: command_save(args)),
+	COMMAND_UNLOAD : (lambda args: command_unload(args)),
+	COMMAND_EXPLAIN: (lambda args: command_explain(args)),
 }
 
 def main():
@@ -184,7 +230,7 @@ def main():
 			print()
 		elif line:
 			try:
-				ast = UC_StrParser.parse(line)
+				ast = UC_StrParser.parseSimplified(line)
 				print(f"Interpreting input as: '{str(ast)}'")
 				print(f"{INDENT}{str(ast.evaluate(convertor))}")
 			except UC_Common.UnitError as err:
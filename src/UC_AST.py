@@ -13,10 +13,17 @@ class AST_Add:
 		leftResult = self.left.evaluate(convertor)
 		rightResult = self.right.evaluate(convertor)
 		if leftResult.unit != rightResult.unit:
-			leftResult.value *= convertor.convert(leftResult.unit, rightResult.unit)
-			leftResult.unit = rightResult.unit
+			scaleFactor = convertor.convert(leftResult.unit, rightResult.unit)
+			leftResult = UC_Unit.Quantity(leftResult.value * scaleFactor, rightResult.unit)
 		return leftResult + rightResult
 
+	def compileNumeric(self, convertor, number):
+		leftUnit, leftFunction = self.left.compileNumeric(convertor, number)
+		rightUnit, rightFunction = self.right.compileNumeric(convertor, number)
+		if leftUnit == rightUnit: return rightUnit, lambda value: leftFunction(value) + rightFunction(value)
+		scaleFactor = number(convertor.convert(leftUnit, rightUnit))
+		return rightUnit, lambda value: leftFunction(value) * scaleFactor + rightFunction(value)
+
 class AST_Sub:
 	def __init__(self, left, right):
 		self.left = left
@@ -28,10 +35,16 @@ class AST_Sub:
 	def evaluate(self, convertor):
 		leftResult = self.left.evaluate(convertor)
 		rightResult = self.right.evaluate(convertor)
-		leftResult.value *= convertor.convert(leftResult.unit, rightResult.unit)
-		leftResult.unit = rightResult.unit
+		scaleFactor = convertor.convert(leftResult.unit, rightResult.unit)
+		leftResult = UC_Unit.Quantity(leftResult.value * scaleFactor, rightResult.unit)
 		return leftResult - rightResult
 
+	def compileNumeric(self, convertor, number):
+		leftUnit, leftFunction = self.left.compileNumeric(convertor, number)
+		rightUnit, rightFunction = self.right.compileNumeric(convertor, number)
+		scaleFactor = number(convertor.convert(leftUnit, rightUnit))
+		return rightUnit, lambda value: leftFunction(value) * scaleFactor - rightFunction(value)
+
 class AST_Mul:
 	def __init__(self, left, right):
 		self.left = left
@@ -43,6 +56,11 @@ class AST_Mul:
 	def evaluate(self, convertor):
 		return self.left.evaluate(convertor) * self.right.evaluate(convertor)
 
+	def compileNumeric(self, convertor, number):
+		leftUnit, leftFunction = self.left.compileNumeric(convertor, number)
+		rightUnit, rightFunction = self.right.compileNumeric(convertor, number)
+		return leftUnit * rightUnit, lambda value: leftFunction(value) * rightFunction(value)
+
 class AST_Div:
 	def __init__(self, left, right):
 		self.left = left
@@ -54,6 +72,11 @@ class AST_Div:
 	def evaluate(self, convertor):
 		return self.left.evaluate(convertor) / self.right.evaluate(convertor)
 
+	def compileNumeric(self, convertor, number):
+		leftUnit, leftFunction = self.left.compileNumeric(convertor, number)
+		rightUnit, rightFunction = self.right.compileNumeric(convertor, number)
+		return leftUnit / rightUnit, lambda value: leftFunction(value) / rightFunction(value)
+
 class AST_Exp:
 	def __init__(self, left, right):
 		self.left = left
@@ -62,14 +85,24 @@ class AST_Exp:
 	def __str__(self):
 		return f"(({str(self.left)})^({str(self.right)}))"
 
-	def evaluate(self, convertor):
+	def evaluateExponent(self, convertor):
 		exp = self.right.evaluate(convertor)
 		try:
 			scaleFactor = convertor.convert(exp.unit, UC_Unit.Unit())
-			exp.value *= scaleFactor
-			exp.unit = UC_Unit.Unit()
-		except: pass
-		return self.left.evaluate(convertor) ** exp
+			exp = UC_Unit.Quantity(exp.value * scaleFactor, UC_Unit.Unit())
+		except UC_Common.UnitError: pass
+		return exp
+
+	def evaluate(self, convertor):
+		return self.left.evaluate(convertor) ** self.evaluateExponent(convertor)
+
+	def compileNumeric(self, convertor, number):
+		# The unit of the result depends on the exponent, so the exponent must be a constant
+		exp = self.evaluateExponent(convertor)
+		if exp.unit.reduce(): raise UC_Common.UnitError(f"Cannot exponentiate with unit '{str(exp.unit)}'")
+		leftUnit, leftFunction = self.left.compileNumeric(convertor, number)
+		power = number(exp.value)
+		return leftUnit ** exp.value, lambda value: leftFunction(value) ** power
 
 class AST_Eql:
 	def __init__(self, left, right):
@@ -82,7 +115,203 @@ class AST_Eql:
 	def evaluate(self, convertor):
 		leftResult = self.left.evaluate(convertor)
 		rightResult = self.right.evaluate(convertor)
-		leftResult.value *= convertor.convert(leftResult.unit, rightResult.unit)
-		leftResult.value /= rightResult.value
-		leftResult.unit = rightResult.unit
-		return leftResult
\ No newline at end of file
+		scaleFactor = convertor.convert(leftResult.unit, rightResult.unit)
+		return UC_Unit.Quantity(leftResult.value * scaleFactor / rightResult.value, rightResult.unit)
+
+	def compileNumeric(self, convertor, number):
+		leftUnit, leftFunction = self.left.compileNumeric(convertor, number)
+		rightUnit, rightFunction = self.right.compileNumeric(convertor, number)
+		scaleFactor = number(convertor.convert(leftUnit, rightUnit))
+		return rightUnit, lambda value: leftFunction(value) * scaleFactor / rightFunction(value)
+
+class AST_Placeholder:
+	def __init__(self, unit):
+		self.unit = unit
+
+	def __str__(self):
+		unitStr = str(self.unit)
+		if unitStr: return f"{UC_Common.PLACEHOLDER} {unitStr}"
+		return UC_Common.PLACEHOLDER
+
+	def evaluate(self, convertor):
+		raise UC_Common.UnitError(f"No value provided for placeholder '{UC_Common.PLACEHOLDER}'")
+
+	def compileNumeric(self, convertor, number):
+		return self.unit, lambda value: value
+
+class AST_Converted:
+	"""
+	An addition, subtraction, or conversion whose conversion factor was resolved when the tree was simplified
+	"""
+	def __init__(self, operator, left, right, scaleFactor, unit):
+		"""
+		AST_Converted constructor
+		@param operator: the operator - UC_Common.OPERATOR_ADD, OPERATOR_SUB, or OPERATOR_EQL
+		@param left: the left operand
+		@param right: the right operand
+		@param scaleFactor: the factor converting the left operand to the unit of the right operand, or None if the units are equal
+		@param unit: the unit of the result
+		"""
+		self.operator = operator
+		self.left = left
+		self.right = right
+		self.scaleFactor = scaleFactor
+		self.unit = unit
+
+	def __str__(self):
+		return f"({str(self.left)} {self.operator} {str(self.right)})"
+
+	def evaluate(self, convertor):
+		leftValue = self.left.evaluate(convertor).value
+		rightValue = self.right.evaluate(convertor).value
+		if self.scaleFactor is not None: leftValue *= self.scaleFactor
+		if self.operator == UC_Common.OPERATOR_ADD: return UC_Unit.Quantity(leftValue + rightValue, self.unit)
+		if self.operator == UC_Common.OPERATOR_SUB: return UC_Unit.Quantity(leftValue - rightValue, self.unit)
+		return UC_Unit.Quantity(leftValue / rightValue, self.unit)
+
+	def compileNumeric(self, convertor, number):
+		leftUnit, leftFunction = self.left.compileNumeric(convertor, number)
+		rightUnit, rightFunction = self.right.compileNumeric(convertor, number)
+		if self.scaleFactor is not None:
+			scaleFactor = number(self.scaleFactor)
+			leftFunction = (lambda function: lambda value: function(value) * scaleFactor)(leftFunction)
+		if self.operator == UC_Common.OPERATOR_ADD: return self.unit, lambda value: leftFunction(value) + rightFunction(value)
+		if self.operator == UC_Common.OPERATOR_SUB: return self.unit, lambda value: leftFunction(value) - rightFunction(value)
+		return self.unit, lambda value: leftFunction(value) / rightFunction(value)
+
+class AST_Product:
+	"""
+	A chain of multiplications, whose constant factors were multiplied together when the tree was simplified
+	"""
+	def __init__(self, constant, factors, unit):
+		"""
+		AST_Product constructor
+		@param constant: the product of the constant factors, as a quantity
+		@param factors: the remaining factors
+		@param unit: the unit of the result, with its units in the order they appear in the chain
+		"""
+		self.constant = constant
+		self.factors = factors
+		self.unit = unit
+
+	def __str__(self):
+		return f"({' * '.join(str(factor) for factor in [self.constant, *self.factors])})"
+
+	def evaluate(self, convertor):
+		value = self.constant.value
+		for factor in self.factors: value *= factor.evaluate(convertor).value
+		return UC_Unit.Quantity(value, self.unit)
+
+	def compileNumeric(self, convertor, number):
+		constant = number(self.constant.value)
+		functions = [factor.compileNumeric(convertor, number)[1] for factor in self.factors]
+		if len(functions) == 1:
+			function = functions[0]
+			return self.unit, lambda value: constant * function(value)
+		def product(value):
+			result = constant
+			for function in functions: result *= function(value)
+			return result
+		return self.unit, product
+
+def getStaticUnit(node):
+	# The unit of a simplified node, if it is known without evaluating the node
+	return getattr(node, "unit", None)
+
+def simplifyNode(node, left, right, convertor):
+	"""
+	Simplify a node whose operands have already been simplified
+	@param node: the node to simplify
+	@param left: the simplified left operand
+	@param right: the simplified right operand
+	@param convertor: the convertor used to resolve conversion factors
+	@return the simplified node
+	"""
+	# Fold constant subtrees, leaving those which cannot be evaluated to report their errors when evaluated
+	nodeType = type(node)
+	if isinstance(left, UC_Unit.Quantity) and isinstance(right, UC_Unit.Quantity):
+		try: return nodeType(left, right).evaluate(convertor)
+		except (UC_Common.UnitError, ArithmeticError): return nodeType(left, right)
+
+	leftUnit, rightUnit = getStaticUnit(left), getStaticUnit(right)
+	if leftUnit is None or rightUnit is None: return nodeType(left, right)
+
+	# Resolve conversion factors, which are fixed once the units of the operands are known
+	if nodeType in [AST_Add, AST_Sub, AST_Eql]:
+		try:
+			if nodeType == AST_Add and leftUnit == rightUnit: return AST_Converted(UC_Common.OPERATOR_ADD, left, right, None, leftUnit)
+			scaleFactor = convertor.convert(leftUnit, rightUnit)
+		except (UC_Common.UnitError, ArithmeticError): return nodeType(left, right)
+		operator = {AST_Add: UC_Common.OPERATOR_ADD, AST_Sub: UC_Common.OPERATOR_SUB, AST_Eql: UC_Common.OPERATOR_EQL}[nodeType]
+		return AST_Converted(operator, left, right, scaleFactor, rightUnit)
+
+	# Collapse chains of multiplications, multiplying their constant factors together
+	if nodeType == AST_Mul:
+		constant = None
+		factors = []
+		for operand in [left, right]:
+			for factor in [operand.constant, *operand.factors] if isinstance(operand, AST_Product) else [operand]:
+				if not isinstance(factor, UC_Unit.Quantity): factors.append(factor)
+				elif constant is None: constant = factor
+				else: constant = constant * factor
+		if constant is None: constant = UC_Unit.Quantity(convertor.toNumber(1), UC_Unit.Unit())
+		return AST_Product(constant, factors, leftUnit * rightUnit)
+	return nodeType(left, right)
+
+def simplify(node, convertor):
+	"""
+	Simplify a tree for evaluation with a convertor, without modifying it
+	Constant subtrees are evaluated, conversion factors between operands are resolved, and chains of
+	multiplications are collapsed - the simplified tree is only valid while the convertor's definitions are unchanged
+	Constant factors are multiplied together before the other factors, which may round differently
+	@param node: the root of the tree
+	@param convertor: the convertor used to resolve conversion factors
+	@return the root of the simplified tree
+	"""
+	binaryNodes = (AST_Add, AST_Sub, AST_Mul, AST_Div, AST_Exp, AST_Eql)
+
+	# Visit the tree in post-order using an explicit stack, so that deep trees do not recurse
+	simplified = []
+	toVisit = [(node, False)]
+	while toVisit:
+		current, visited = toVisit.pop()
+		if not isinstance(current, binaryNodes): simplified.append(current)
+		elif not visited:
+			toVisit.append((current, True))
+			toVisit.append((current.right, False))
+			toVisit.append((current.left, False))
+		else:
+			right = simplified.pop()
+			left = simplified.pop()
+			simplified.append(simplifyNode(current, left, right, convertor))
+	return simplified.pop()
+
+class AST_Simplified:
+	"""
+	A tree which is simplified for the convertor it is evaluated with, and simplified again when the
+	convertor's definitions change or it is evaluated with a different convertor
+	"""
+	def __init__(self, root):
+		"""
+		AST_Simplified constructor
+		@param root: the root of the tree to simplify
+		"""
+		self.root = root
+		self.state = None
+
+	def __str__(self):
+		return str(self.root)
+
+	def getSimplified(self, convertor):
+		# Replace the state in one assignment, so that concurrent evaluations see a consistent state
+		state = self.state
+		if state is None or state[0] is not convertor or state[1] != convertor.generation:
+			state = (convertor, convertor.generation, simplify(self.root, convertor))
+			self.state = state
+		return state[2]
+
+	def evaluate(self, convertor):
+		return self.getSimplified(convertor).evaluate(convertor)
+
+	def compileNumeric(self, convertor, number):
+		return self.getSimplified(convertor).compileNumeric(convertor, number)
\ No newline at end of file
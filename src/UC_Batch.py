@@ -0,0 +1,252 @@
+import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import csv
+import itertools
+import json
+import math
+import operator
+import src.UC_Common as UC_Common
+import src.UC_Convertor as UC_Convertor
+import src.UC_StrParser as UC_StrParser
+import src.UC_Unit as UC_Unit
+
+try: import numpy
+except ImportError: numpy = None
+
+# Output formats for evaluating a file of expressions, and the number of lines each worker evaluates at a time
+FORMATS = ["csv", "jsonl"]
+CHUNK_SIZE = 256
+
+class BatchExpression:
+	"""
+	An expression whose placeholder magnitudes ('?') are bound to many values at once
+	Units and conversion factors are resolved once when the expression is compiled, so
+	evaluating it only performs the numeric operations for each value
+	"""
+	def __init__(self, string, convertor):
+		"""
+		BatchExpression constructor
+		@param string: the expression to compile - every placeholder takes the same value
+		@param convertor: the convertor used to resolve conversion factors
+		"""
+		self.ast = UC_StrParser.parseCached(string, convertor.numberType)
+		self.convertor = convertor
+		self.unit, self.function = self.ast.compileNumeric(convertor, convertor.toNumber)
+		self.floatFunction = None
+
+	def __str__(self):
+		return str(self.ast)
+
+	def evaluate(self, values):
+		"""
+		Evaluate the expression for each value
+		NumPy arrays are evaluated element-wise as floats, and other sequences are evaluated using the
+		convertor's numeric type
+		@param values: a NumPy array or sequence of numbers
+		@return the magnitudes of the results as a NumPy array or list, all of which have the unit self.unit
+		"""
+		if numpy is not None and isinstance(values, numpy.ndarray):
+			if self.floatFunction is None:
+				unit, self.floatFunction = self.ast.compileNumeric(self.convertor, float)
+			return numpy.broadcast_to(self.floatFunction(values.astype(float)), values.shape).copy()
+		return [self.function(self.convertor.toNumber(value)) for value in values]
+
+def isNumpyArray(values):
+	return numpy is not None and isinstance(values, numpy.ndarray)
+
+def toBuffer(values, useNumpy = None):
+	"""
+	Store numbers in a contiguous buffer of floats
+	@param values: a NumPy array, array.array, or iterable of numbers
+	@param useNumpy: True to use a NumPy array, False to use an array.array, or None to use NumPy if it is available
+	@return the buffer, which is the given array if it already has the requested type
+	"""
+	if useNumpy is None: useNumpy = numpy is not None
+	if useNumpy:
+		if numpy is None: raise ImportError("NumPy is not available")
+		return numpy.asarray(values, dtype = float)
+	if isinstance(values, array.array) and values.typecode == 'd': return values
+	return array.array('d', (float(value) for value in values))
+
+def elementwise(function, left, right):
+	"""
+	Apply a binary function element-wise, broadcasting scalars
+	NumPy arrays use NumPy's broadcasting rules, and other buffers must have equal lengths
+	@param function: the function to apply, such as operator.add
+	@param left: a buffer or a float
+	@param right: a buffer or a float
+	@return a buffer of the results
+	"""
+	if isNumpyArray(left) or isNumpyArray(right): return function(left, right)
+	if isinstance(left, float): return array.array('d', map(function, itertools.repeat(left), right))
+	if isinstance(right, float): return array.array('d', map(function, left, itertools.repeat(right)))
+	if len(left) != len(right): raise ValueError(f"Cannot broadcast arrays of lengths {len(left)} and {len(right)}")
+	return array.array('d', map(function, left, right))
+
+class QuantityArray:
+	"""
+	Many magnitudes sharing one unit, stored in a contiguous buffer of floats
+	Units are checked and combined once per operation rather than once per element, and the magnitudes are
+	combined element-wise using NumPy when the buffer is a NumPy array
+	"""
+	__slots__ = ("values", "unit")
+
+	def __init__(self, values, unit: UC_Unit.Unit = None, useNumpy = None):
+		"""
+		QuantityArray constructor
+		@param values: the magnitudes, as a NumPy array, array.array, or iterable of numbers
+		@param unit: the unit of every magnitude
+		@param useNumpy: True to store the magnitudes in a NumPy array, False to store them in an array.array,
+		or None to keep an existing NumPy array or array.array, and otherwise use NumPy if it is available
+		"""
+		if useNumpy is None: useNumpy = isNumpyArray(values) or (numpy is not None and not isinstance(values, array.array))
+		self.values = toBuffer(values, useNumpy)
+		self.unit = UC_Unit.Unit() if unit is None else unit
+
+	def __len__(self):
+		return len(self.values)
+
+	def __getitem__(self, index):
+		if isinstance(index, slice): return QuantityArray(self.values[index], self.unit)
+		return UC_Unit.Quantity(float(self.values[index]), self.unit)
+
+	def __iter__(self):
+		return (UC_Unit.Quantity(float(value), self.unit) for value in self.values)
+
+	def __str__(self):
+		unitStr = str(self.unit)
+		valuesStr = f"[{', '.join(str(float(value)) for value in self.values)}]"
+		if unitStr: return f"{valuesStr} {unitStr}"
+		return valuesStr
+
+	def __repr__(self):
+		return f"QuantityArray({list(self.values)!r}, {self.unit!r})"
+
+	def __eq__(self, other):
+		if not isinstance(other, QuantityArray): return NotImplemented
+		return self.unit == other.unit and len(self.values) == len(other.values) and all(a == b for a, b in zip(self.values, other.values))
+
+	def operand(self, other):
+		# Split an operand into its magnitudes and unit - plain numbers are dimensionless
+		if isinstance(other, QuantityArray): return other.values, other.unit
+		if isinstance(other, UC_Unit.Quantity): return float(other.value), other.unit
+		return float(other), UC_Unit.Unit()
+
+	def __add__(self, other):
+		values, unit = self.operand(other)
+		if not self.unit == unit: raise UC_Common.UnitError('Incompatible units')
+		return QuantityArray(elementwise(operator.add, self.values, values), self.unit)
+
+	def __sub__(self, other):
+		values, unit = self.operand(other)
+		if not self.unit == unit: raise UC_Common.UnitError('Incompatible units')
+		return QuantityArray(elementwise(operator.sub, self.values, values), self.unit)
+
+	def __mul__(self, other):
+		values, unit = self.operand(other)
+		return QuantityArray(elementwise(operator.mul, self.values, values), self.unit * unit)
+
+	def __truediv__(self, other):
+		values, unit = self.operand(other)
+		return QuantityArray(elementwise(operator.truediv, self.values, values), self.unit / unit)
+
+	def __pow__(self, other):
+		values, unit = self.operand(other)
+		if unit.reduce(): raise UC_Common.UnitError(f"Cannot exponentiate with unit '{str(unit)}'")
+		if not isinstance(values, float) and self.unit.reduce():
+			raise UC_Common.UnitError(f"Cannot exponentiate unit '{str(self.unit)}' by an array")
+		# Keep the exponent's numeric type in the unit, as Quantity does
+		power = (other.value if isinstance(other, UC_Unit.Quantity) else other) if isinstance(values, float) else 1
+		return QuantityArray(elementwise(operator.pow if isNumpyArray(self.values) else math.pow, self.values, values), self.unit ** power)
+
+	def __radd__(self, other):
+		return self + other
+
+	def __rsub__(self, other):
+		values, unit = self.operand(other)
+		if not self.unit == unit: raise UC_Common.UnitError('Incompatible units')
+		return QuantityArray(elementwise(operator.sub, values, self.values), self.unit)
+
+	def __rmul__(self, other):
+		return self * other
+
+	def __rtruediv__(self, other):
+		values, unit = self.operand(other)
+		return QuantityArray(elementwise(operator.truediv, values, self.values), unit / self.unit)
+
+	def to(self, unit, convertor):
+		"""
+		Convert every magnitude to another unit
+		@param unit: the unit to convert to
+		@param convertor: the convertor used to find the scale factor
+		@return a new array with the given unit
+		"""
+		scaleFactor = float(convertor.convert(self.unit, unit))
+		return QuantityArray(elementwise(operator.mul, self.values, scaleFactor), unit)
+
+def evaluateExpression(string, convertor):
+	"""
+	Evaluate an expression, capturing any error
+	@param string: the expression to evaluate
+	@param convertor: the convertor used to evaluate the expression
+	@return the result as a string and None, or None and the error message
+	"""
+	try: return str(UC_StrParser.parseSimplified(string, convertor.numberType).evaluate(convertor)), None
+	except UC_Common.UnitError as err: return None, str(err)
+	except ArithmeticError as err: return None, type(err).__name__
+
+# Convertor of each worker process, rebuilt from the definitions of the parent's convertor
+workerConvertor = None
+
+def initWorker(units, conversions, prefixes, numberType):
+	global workerConvertor
+	workerConvertor = UC_Convertor.Convertor(units, conversions, prefixes, numberType = numberType)
+
+def evaluateChunk(chunk):
+	return [(lineNumber, string, *evaluateExpression(string, workerConvertor)) for lineNumber, string in chunk]
+
+def evaluateLines(lines, convertor, workers = 1):
+	"""
+	Evaluate each line as an independent expression, skipping blank lines
+	Lines are read and results are generated as they are needed, so any number of lines can be evaluated
+	@param lines: an iterable of strings, such as an open file
+	@param convertor: the convertor used to evaluate expressions
+	@param workers: the number of processes evaluating lines at once - evaluation is CPU-bound, so threads would not
+	evaluate lines in parallel
+	@return a generator of (line number, expression, result, error) tuples in the order of the lines, where
+	exactly one of the result and error is None
+	"""
+	expressions = ((lineNumber, line.strip()) for lineNumber, line in enumerate(lines, 1) if line.strip())
+	if workers <= 1:
+		for lineNumber, string in expressions: yield (lineNumber, string, *evaluateExpression(string, convertor))
+		return
+
+	# Evaluate chunks of lines in worker processes, keeping a bounded number of chunks in flight
+	initargs = (convertor.units, convertor.conversions, convertor.prefixes, convertor.numberType)
+	with ProcessPoolExecutor(workers, initializer = initWorker, initargs = initargs) as executor:
+		pending = deque()
+		while chunk := [*itertools.islice(expressions, CHUNK_SIZE)]:
+			pending.append(executor.submit(evaluateChunk, chunk))
+			if len(pending) > 2 * workers: yield from pending.popleft().result()
+		while pending: yield from pending.popleft().result()
+
+def writeResults(results, file, format = "csv"):
+	"""
+	Write evaluated lines to a file as they are generated
+	@param results: an iterable of (line number, expression, result, error) tuples, as generated by evaluateLines
+	@param file: the open file to write to
+	@param format: 'csv' to write a header followed by one row per line, or 'jsonl' to write one JSON object per line
+	@return the number of lines written and the number of lines which could not be evaluated
+	"""
+	if format not in FORMATS: raise ValueError(f"Expected format in {FORMATS}; received '{format}'")
+	count, errors = 0, 0
+	if format == "csv":
+		writer = csv.writer(file)
+		writer.writerow(["line", "expression", "result", "error"])
+	for lineNumber, string, result, error in results:
+		if format == "csv": writer.writerow([lineNumber, string, result or "", error or ""])
+		else: file.write(json.dumps({"line": lineNumber, "expression": string, "result": result, "error": error}) + "\n")
+		count += 1
+		errors += error is not None
+	return count, errors
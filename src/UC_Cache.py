@@ -0,0 +1,76 @@
+from collections import OrderedDict
+import threading
+
+DEFAULT_CAPACITY = 1024
+
+class LRUCache:
+	"""
+	Bounded map which evicts the least recently used entry once full
+	Hits, misses, and evictions are counted for tuning the capacity
+	"""
+	def __init__(self, capacity: int = DEFAULT_CAPACITY):
+		"""
+		LRUCache constructor
+		@param capacity: the maximum number of entries to keep - a capacity of 0 disables caching
+		"""
+		if capacity < 0: raise ValueError(f"Expected non-negative capacity; received {capacity}")
+		self.capacity = capacity
+		self.entries = OrderedDict()
+		self.lock = threading.Lock()
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+
+	def __len__(self):
+		return len(self.entries)
+
+	def __contains__(self, key):
+		return key in self.entries
+
+	def get(self, key, default = None):
+		"""
+		Get the value cached for a key and mark it as recently used
+		@param key: the key to look up
+		@param default: the value to return if the key is not cached
+		@return the cached value, or the default if the key is not cached
+		"""
+		with self.lock:
+			if key in self.entries:
+				self.entries.move_to_end(key)
+				self.hits += 1
+				return self.entries[key]
+			self.misses += 1
+			return default
+
+	def put(self, key, value):
+		"""
+		Cache a value, evicting the least recently used entry if the cache is full
+		@param key: the key to cache the value under
+		@param value: the value to cache
+		"""
+		if self.capacity == 0: return
+		with self.lock:
+			self.entries[key] = value
+			self.entries.move_to_end(key)
+			if len(self.entries) > self.capacity:
+				self.entries.popitem(last = False)
+				self.evictions += 1
+
+	def clear(self):
+		"""
+		Discard all cached entries, keeping the counters
+		"""
+		with self.lock: self.entries.clear()
+
+	def getStats(self):
+		"""
+		Get the cache counters
+		@return a map of counter names to values
+		"""
+		return {
+			"capacity": self.capacity,
+			"size": len(self.entries),
+			"hits": self.hits,
+			"misses": self.misses,
+			"evictions": self.evictions,
+		}
\ No newline at end of file
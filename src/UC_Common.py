@@ -14,6 +14,7 @@ OPERATOR_SUB = '-'
 OPERATOR_EQL = ':'
 BRACKET_OPEN = '('
 BRACKET_SHUT = ')'
+PLACEHOLDER = '?'
 
 # Map of operator to precedence and associativity
 # A larger precedence value means that the operator is higher precedence
@@ -0,0 +1,257 @@
+import src.UC_AST as UC_AST
+import src.UC_Common as UC_Common
+import src.UC_Unit as UC_Unit
+
+# Instructions of the stack machine, as (opcode, argument) pairs
+# Binary operations pop the right operand, then replace the left operand with the result
+OP_CONST = 0			# Push the argument
+OP_LOAD = 1				# Push the placeholder value
+OP_ADD = 2				# Add
+OP_ADD_SCALED = 3		# Scale the left operand by the argument, then add
+OP_SUB = 4				# Scale the left operand by the argument, then subtract
+OP_MUL = 5				# Multiply
+OP_DIV = 6				# Divide
+OP_POW = 7				# Raise the top of the stack to the power of the argument
+OP_EQL = 8				# Scale the left operand by the argument, then divide
+OP_PRODUCT = 9			# Pop the argument number of operands and push their product, multiplied from left to right
+
+OPCODE_NAMES = ["CONST", "LOAD", "ADD", "ADD_SCALED", "SUB", "MUL", "DIV", "POW", "EQL", "PRODUCT"]
+
+# Source of each binary operation in assembled functions
+BINARY_TEMPLATES = {
+	OP_ADD: "{left} + {right}",
+	OP_ADD_SCALED: "{left} * {constant} + {right}",
+	OP_SUB: "{left} * {constant} - {right}",
+	OP_MUL: "{left} * {right}",
+	OP_DIV: "{left} / {right}",
+	OP_EQL: "{left} * {constant} / {right}",
+}
+
+class Program:
+	"""
+	A flat list of stack machine instructions computing the magnitude of an expression
+	Units were resolved when the program was lowered, so running it only performs numeric operations
+	"""
+	def __init__(self, instructions, unit, placeholders):
+		"""
+		Program constructor
+		@param instructions: a list of (opcode, argument) pairs
+		@param unit: the unit of the result
+		@param placeholders: the number of placeholders in the expression
+		"""
+		self.instructions = instructions
+		self.unit = unit
+		self.placeholders = placeholders
+		self.function = assemble(instructions)
+
+	def __str__(self):
+		return "\n".join(OPCODE_NAMES[opcode] if argument is None else f"{OPCODE_NAMES[opcode]} {argument}" for opcode, argument in self.instructions)
+
+	def run(self, value = None):
+		"""
+		Run the program's assembled function
+		@param value: the value of every placeholder, or None if the expression has no placeholders
+		@return the magnitude of the result, in self.unit
+		"""
+		if self.placeholders and value is None:
+			raise UC_Common.UnitError(f"No value provided for placeholder '{UC_Common.PLACEHOLDER}'")
+		return self.function(value)
+
+	def interpret(self, value = None):
+		"""
+		Run the program one instruction at a time, without assembling it
+		@param value: the value of every placeholder, or None if the expression has no placeholders
+		@return the magnitude of the result, in self.unit
+		"""
+		if self.placeholders and value is None:
+			raise UC_Common.UnitError(f"No value provided for placeholder '{UC_Common.PLACEHOLDER}'")
+		stack = []
+		push, pop = stack.append, stack.pop
+		for opcode, argument in self.instructions:
+			if opcode == OP_CONST: push(argument)
+			elif opcode == OP_LOAD: push(value)
+			elif opcode == OP_MUL:
+				right = pop()
+				stack[-1] = stack[-1] * right
+			elif opcode == OP_DIV:
+				right = pop()
+				stack[-1] = stack[-1] / right
+			elif opcode == OP_EQL:
+				right = pop()
+				stack[-1] = stack[-1] * argument / right
+			elif opcode == OP_ADD:
+				right = pop()
+				stack[-1] = stack[-1] + right
+			elif opcode == OP_ADD_SCALED:
+				right = pop()
+				stack[-1] = stack[-1] * argument + right
+			elif opcode == OP_SUB:
+				right = pop()
+				stack[-1] = stack[-1] * argument - right
+			elif opcode == OP_POW: stack[-1] = stack[-1] ** argument
+			else:
+				operands = stack[-argument:]
+				del stack[-argument:]
+				result = operands[0]
+				for operand in operands[1:]: result *= operand
+				push(result)
+		return stack[0]
+
+def assemble(instructions):
+	"""
+	Assemble instructions into a Python function, assigning each stack slot to a local variable
+	The function is straight-line code, so it runs without dispatching on each instruction
+	@param instructions: a list of (opcode, argument) pairs
+	@return a function of the placeholder value, which returns the magnitude of the result
+	"""
+	# Arguments are referenced by name rather than formatted into the source, so no precision is lost
+	constants = {}
+	lines = ["def program(value):"]
+	depth = 0
+	for opcode, argument in instructions:
+		name = None
+		if argument is not None and opcode != OP_PRODUCT:
+			name = f"c{len(constants)}"
+			constants[name] = argument
+		if opcode == OP_CONST:
+			lines.append(f"\ts{depth} = {name}")
+			depth += 1
+		elif opcode == OP_LOAD:
+			lines.append(f"\ts{depth} = value")
+			depth += 1
+		elif opcode == OP_POW: lines.append(f"\ts{depth - 1} = s{depth - 1} ** {name}")
+		elif opcode == OP_PRODUCT:
+			# Multiply one factor per statement, since the compiler recurses into long chains of operators
+			depth -= argument - 1
+			for i in range(depth, depth - 1 + argument): lines.append(f"\ts{depth - 1} = s{depth - 1} * s{i}")
+		else:
+			depth -= 1
+			lines.append(f"\ts{depth - 1} = {BINARY_TEMPLATES[opcode].format(left = f's{depth - 1}', right = f's{depth}', constant = name)}")
+	lines.append("\treturn s0")
+	exec("\n".join(lines), constants)
+	return constants["program"]
+
+def getOperands(node):
+	"""
+	Get the operands of a node which are lowered before the node itself
+	@param node: the node
+	@return a list of operands, in the order they are pushed onto the stack
+	"""
+	if isinstance(node, UC_AST.AST_Product): return [node.constant, *node.factors]
+	# Exponents determine the unit of the result, so they are evaluated when the program is lowered
+	if isinstance(node, UC_AST.AST_Exp): return [node.left]
+	if isinstance(node, (UC_AST.AST_Converted, UC_AST.AST_Add, UC_AST.AST_Sub, UC_AST.AST_Mul, UC_AST.AST_Div, UC_AST.AST_Eql)):
+		return [node.left, node.right]
+	return []
+
+def lowerNode(node, units, instructions, convertor):
+	"""
+	Append the instruction for a node whose operands have already been lowered
+	@param node: the node to lower
+	@param units: the units of the node's operands
+	@param instructions: the list of instructions to append to
+	@param convertor: the convertor used to resolve units and conversion factors
+	@return the unit of the node
+	"""
+	nodeType = type(node)
+	if nodeType == UC_Unit.Quantity:
+		instructions.append((OP_CONST, node.value))
+		return node.unit
+	if nodeType == UC_AST.AST_Placeholder:
+		instructions.append((OP_LOAD, None))
+		return node.unit
+	if nodeType == UC_AST.AST_Product:
+		instructions.append((OP_PRODUCT, len(units)))
+		return node.unit
+	if nodeType == UC_AST.AST_Converted:
+		if node.operator == UC_Common.OPERATOR_ADD:
+			instructions.append((OP_ADD, None) if node.scaleFactor is None else (OP_ADD_SCALED, node.scaleFactor))
+		elif node.operator == UC_Common.OPERATOR_SUB: instructions.append((OP_SUB, node.scaleFactor))
+		else: instructions.append((OP_EQL, node.scaleFactor))
+		return node.unit
+	if nodeType == UC_AST.AST_Exp:
+		exp = node.evaluateExponent(convertor)
+		if exp.unit.reduce(): raise UC_Common.UnitError(f"Cannot exponentiate with unit '{str(exp.unit)}'")
+		instructions.append((OP_POW, exp.value))
+		return units[0] ** exp.value
+
+	leftUnit, rightUnit = units
+	if nodeType == UC_AST.AST_Mul:
+		instructions.append((OP_MUL, None))
+		return leftUnit * rightUnit
+	if nodeType == UC_AST.AST_Div:
+		instructions.append((OP_DIV, None))
+		return leftUnit / rightUnit
+	if nodeType == UC_AST.AST_Add and leftUnit == rightUnit:
+		instructions.append((OP_ADD, None))
+		return leftUnit
+	scaleFactor = convertor.convert(leftUnit, rightUnit)
+	opcode = {UC_AST.AST_Add: OP_ADD_SCALED, UC_AST.AST_Sub: OP_SUB, UC_AST.AST_Eql: OP_EQL}[nodeType]
+	instructions.append((opcode, scaleFactor))
+	return rightUnit
+
+def lower(node, convertor):
+	"""
+	Lower a tree into a stack machine program for a convertor
+	The tree is simplified first, so constant subtrees become single instructions
+	@param node: the root of the tree
+	@param convertor: the convertor used to resolve units and conversion factors
+	@return the program
+	"""
+	instructions = []
+	units = []
+	placeholders = 0
+
+	# Visit the tree in post-order using an explicit stack, so that deep trees do not recurse
+	toVisit = [(UC_AST.simplify(node, convertor), None)]
+	while toVisit:
+		current, operands = toVisit.pop()
+		if operands is None:
+			operands = getOperands(current)
+			toVisit.append((current, operands))
+			for operand in reversed(operands): toVisit.append((operand, None))
+		else:
+			operandUnits = units[len(units) - len(operands):]
+			del units[len(units) - len(operands):]
+			units.append(lowerNode(current, operandUnits, instructions, convertor))
+			if isinstance(current, UC_AST.AST_Placeholder): placeholders += 1
+	return Program(instructions, units.pop(), placeholders)
+
+class CompiledExpression:
+	"""
+	An expression which is lowered into a stack machine program for the convertor it is evaluated with,
+	and lowered again when the convertor's definitions change or it is evaluated with a different convertor
+	"""
+	def __init__(self, root):
+		"""
+		CompiledExpression constructor
+		@param root: the root of the tree to compile
+		"""
+		self.root = root
+		self.state = None
+
+	def __str__(self):
+		return str(self.root)
+
+	def getProgram(self, convertor):
+		"""
+		Get the program for a convertor, lowering the tree if needed
+		@param convertor: the convertor used to resolve units and conversion factors
+		@return the program
+		"""
+		# Replace the state in one assignment, so that concurrent evaluations see a consistent state
+		state = self.state
+		if state is None or state[0] is not convertor or state[1] != convertor.generation:
+			state = (convertor, convertor.generation, lower(self.root, convertor))
+			self.state = state
+		return state[2]
+
+	def evaluate(self, convertor, value = None):
+		"""
+		Evaluate the expression
+		@param convertor: the convertor used to resolve units and conversion factors
+		@param value: the value of every placeholder, or None if the expression has no placeholders
+		@return the result, as a quantity
+		"""
+		program = self.getProgram(convertor)
+		return UC_Unit.Quantity(program.run(value), program.unit)
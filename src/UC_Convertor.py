@@ -1,26 +1,243 @@
+from collections import deque
 from decimal import Decimal
 import src.UC_Unit as UC_Unit
+import src.UC_Cache as UC_Cache
 import src.UC_Common as UC_Common
+import src.UC_FileIO as UC_FileIO
+import src.UC_Metrics as UC_Metrics
+import src.UC_Snapshot as UC_Snapshot
+import src.UC_SuffixTrie as UC_SuffixTrie
 import src.UC_Utils as UC_Utils
+import time
 
-def removeCancelledUnits(unitMap):
-	toRemove = []
-	for sym, exp in unitMap.items():
-		if exp == 0: toRemove.append(sym)
-	for sym in toRemove: unitMap.pop(sym)
+class Conversion:
+	"""
+	A conversion between a fixed pair of units, with a precomputed scale factor
+	"""
+	def __init__(self, srcUnit, dstUnit, scaleFactor, numberType = Decimal):
+		"""
+		Conversion constructor
+		@param srcUnit: the unit to convert from
+		@param dstUnit: the unit to convert to
+		@param scaleFactor: the scale factor from the source unit to the destination unit
+		@param numberType: the numeric type used for arithmetic - Decimal, float, or Fraction
+		"""
+		self.srcUnit = srcUnit
+		self.dstUnit = dstUnit
+		self.scaleFactor = UC_Utils.toNumber(scaleFactor, numberType)
+		self.numberType = numberType
+
+	def __str__(self):
+		return f"1 {str(self.srcUnit)} = {self.scaleFactor} {str(self.dstUnit)}"
+
+	def __call__(self, value):
+		return UC_Utils.toNumber(value, self.numberType) * self.scaleFactor
+
+class Explanation:
+	"""
+	A trace of the steps taken to convert between a pair of units
+	Each step records its depth in the reduction, a description, the scale factor it applied, and its duration
+	"""
+	def __init__(self, srcUnit, dstUnit):
+		"""
+		Explanation constructor
+		@param srcUnit: the unit to convert from
+		@param dstUnit: the unit to convert to
+		"""
+		self.srcUnit = srcUnit
+		self.dstUnit = dstUnit
+		self.steps = []
+		self.scaleFactor = None
+		self.error = None
+		self.elapsed = 0
+
+	def __str__(self):
+		lines = [f"Converting {str(self.srcUnit)} to {str(self.dstUnit)}:"]
+		for depth, description, scaleFactor, elapsed in self.steps:
+			factorStr = "" if scaleFactor is None else f" (x {scaleFactor})"
+			elapsedStr = "" if elapsed is None else f" [{elapsed * 1e6:.1f} us]"
+			lines.append(f"{'  ' * (depth + 1)}{description}{factorStr}{elapsedStr}")
+		if self.error is not None: lines.append(f"Error: {self.error}")
+		else: lines.append(f"Result: 1 {str(self.srcUnit)} = {self.scaleFactor} {str(self.dstUnit)}")
+		lines.append(f"{len(self.steps)} steps, maximum depth {self.getDepth()}, {self.elapsed * 1e6:.1f} us")
+		return "\n".join(lines)
+
+	def addStep(self, depth, description, scaleFactor = None, elapsed = None):
+		self.steps.append((depth, description, scaleFactor, elapsed))
+
+	def getDepth(self):
+		return max((depth for depth, description, scaleFactor, elapsed in self.steps), default = 0)
+
+def formatUnit(sym, exp):
+	return f"{sym}{'' if exp == 1 else f'^({exp})'}"
+
+class Transaction:
+	"""
+	A batch of unit and prefix changes which are validated together and applied atomically
+	Changes are staged on a copy of the convertor's definitions, so the convertor is unchanged
+	until the transaction is committed
+	"""
+	def __init__(self, convertor):
+		"""
+		Transaction constructor
+		@param convertor: the convertor to apply the changes to
+		"""
+		self.convertor = convertor
+		self.generation = convertor.generation
+		self.staged = Convertor(convertor.units, convertor.conversions, convertor.prefixes, 0, convertor.numberType)
+		self.staged.validating = False
+		self.committed = False
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, excType, excValue, traceback):
+		# Discard staged changes if the block raised
+		if excType is None: self.commit()
+
+	def getStaged(self):
+		"""
+		Get the convertor holding the staged definitions
+		@return the staged convertor
+		"""
+		# The convertor adopts the staged definitions when committed, so later changes would bypass validation
+		if self.committed: raise UC_Common.UnitError("Transaction has already been committed")
+		return self.staged
+
+	def addUnit(self, sym, scaleFactor, unit):
+		self.getStaged().addUnit(sym, scaleFactor, unit)
+
+	def addPrefix(self, sym, base, exp):
+		self.getStaged().addPrefix(sym, base, exp)
+
+	def delUnit(self, symToDelete):
+		return self.getStaged().delUnit(symToDelete)
+
+	def delPrefix(self, symToDelete):
+		return self.getStaged().delPrefix(symToDelete)
+
+	def commit(self):
+		"""
+		Validate the staged definitions and apply them to the convertor
+		If validation fails, or the convertor's definitions changed after the transaction started, the convertor is left unchanged
+		"""
+		if self.committed: raise UC_Common.UnitError("Transaction has already been committed")
+
+		# Staged definitions are a copy taken when the transaction started, so committing them would discard later changes
+		if self.convertor.generation != self.generation:
+			raise UC_Common.UnitError("Definitions were changed after the transaction started")
+		staged = self.staged
+		UC_Utils.validate(staged.units, staged.conversions, staged.prefixes, staged.symbolIndex)
+		self.convertor.adopt(staged)
+		self.staged = None
+		self.committed = True
 
 class Convertor:
-	def __init__(self, units = {}, conversions = {}, prefixes = {}):
-		self.units = units
-		self.conversions = conversions
-		self.prefixes = prefixes
+	def __init__(self, units = None, conversions = None, prefixes = None, cacheCapacity = UC_Cache.DEFAULT_CAPACITY, numberType = Decimal):
+		# Definitions are modified in place and indexed, so each convertor keeps its own copy of the maps
+		self.units = {} if units is None else dict(units)
+		self.conversions = {} if conversions is None else dict(conversions)
+		self.prefixes = {} if prefixes is None else dict(prefixes)
+		self.symbolIndex = UC_SuffixTrie.SuffixTrie(self.units.keys())
+
+		# Scale factors are computed using Decimal, float, or Fraction arithmetic
+		self.numberType = numberType
+		self.prefixScaleFactors = {}
+
+		# Canonical forms of units, compiled on demand
+		self.compiledUnits = {}
+
+		# Reverse dependency graph of the unit references which appear in definitions
+		self.indexAllReferences()
+
+		# Scale factors of recent conversions, keyed on the reduced source and destination units
+		self.conversionCache = UC_Cache.LRUCache(cacheCapacity)
+		self.generation = 0
+
+		# Transactions defer validation of their staged definitions until they are committed
+		self.validating = True
+
+	@classmethod
+	def fromSnapshot(cls, filename, cacheCapacity = UC_Cache.DEFAULT_CAPACITY, numberType = Decimal):
+		"""
+		Create a convertor from a binary snapshot without re-validating its definitions
+		@param filename: the name of the snapshot to load
+		@param cacheCapacity: the maximum number of conversions to cache
+		@param numberType: the numeric type used for arithmetic - Decimal, float, or Fraction
+		@return the convertor
+		"""
+		units, conversions, prefixes, compiledUnits = UC_Snapshot.readSnapshot(filename)
+		convertor = cls(units, conversions, prefixes, cacheCapacity, numberType)
+
+		# Stored canonical forms are computed with Decimal arithmetic, so other types recompile them
+		if numberType is Decimal:
+			convertor.compiledUnits.update(compiledUnits)
+		return convertor
+
+	def saveSnapshot(self, filename):
+		"""
+		Write the definitions and their canonical forms to a binary snapshot
+		@param filename: the name of the file to write
+		"""
+		compiler = self if self.numberType is Decimal else Convertor(self.units, self.conversions, self.prefixes)
+		for sym in self.units: compiler.compileUnit(sym)
+		UC_Snapshot.writeSnapshot(filename, self.units, self.conversions, self.prefixes, compiler.compiledUnits)
+
+	def transaction(self):
+		"""
+		Start a transaction for applying many changes at once
+		Used as a context manager, the transaction is committed when the block exits normally
+		and discarded if the block raises
+		@return the transaction
+		"""
+		return Transaction(self)
+
+	def adopt(self, other):
+		"""
+		Replace the definitions with those of another convertor, discarding compiled units and cached conversions
+		@param other: the convertor whose definitions to use
+		"""
+		self.units = other.units
+		self.conversions = other.conversions
+		self.prefixes = other.prefixes
+		self.symbolIndex = other.symbolIndex
+		self.references = other.references
+		self.referenceIndex = other.referenceIndex
+		self.resolutions = other.resolutions
+		self.unitReferences = other.unitReferences
+		self.prefixReferences = other.prefixReferences
+		self.rankUnits()
+		self.prefixScaleFactors = {}
+		self.compiledUnits = {}
+		self.definitionsChanged()
+
+	def definitionsChanged(self):
+		"""
+		Discard cached conversions and start a new generation of definitions, after definitions have changed
+		Anything derived from the definitions can record the generation to detect when it is stale
+		"""
+		self.conversionCache.clear()
+		self.generation += 1
+
+	def stripPrefix(self, string):
+		return self.symbolIndex.stripPrefix(string)
+
+	def toNumber(self, value):
+		return UC_Utils.toNumber(value, self.numberType)
 
 	def getPrefixScaleFactor(self, prefix):
 		base, exp = self.prefixes[prefix]
 		return (base)**(exp)
 
+	def getNumericPrefixScaleFactor(self, prefix):
+		# Compute prefix scale factors once using the selected numeric type
+		if prefix not in self.prefixScaleFactors:
+			base, exp = self.prefixes[prefix]
+			self.prefixScaleFactors[prefix] = self.toNumber(base)**self.toNumber(exp)
+		return self.prefixScaleFactors[prefix]
+
 	def getUnitDefinitionStr(self, string):
-		prefix, sym = UC_Utils.stripPrefix(self.units, string)
+		prefix, sym = self.stripPrefix(string)
 		if prefix:
 			scaleFactor = self.getPrefixScaleFactor(prefix)
 			return f"1 {string} = prefix: '{prefix}', unit: '{sym}' = {scaleFactor} {sym}"
@@ -32,93 +249,367 @@ class Convertor:
 		base, exp = self.prefixes[string]
 		return f"{string} = ({base})^({exp}) = {base**exp}"
 
-	def processPrefixes(self, units):
-		scaleFactor = Decimal(1)
-		unitsToUpdate = {}
-		for prefixedSym, exp in units.items():
-			# Find prefix and base unit
-			prefix, baseUnit = UC_Utils.stripPrefix(self.units, prefixedSym)
-			if len(prefix) == 0: continue
-			if prefix not in self.prefixes: raise UC_Common.UnitError(f"Unknown unit: '{prefixedSym}'")
-			unitsToUpdate[prefixedSym] = baseUnit
+	def canonicalize(self, unitMap):
+		"""
+		Reduce a map of (possibly prefixed) units to irreducible units
+		@param unitMap: a map of unit symbols to exponents
+		@return the scale factor and the map of irreducible unit symbols to exponents
+		"""
+		scaleFactor = self.toNumber(1)
+		baseUnitMap = {}
+		for prefixedSym, exp in unitMap.items():
+			exp = self.toNumber(exp)
 
-			# Calculate scale factor
-			scaleFactor *= self.getPrefixScaleFactor(prefix)**(exp)
-			
-		# Update unit map
-		for fromSym, toSym in unitsToUpdate.items():
-			if not (toSym in units): units[toSym] = 0
-			units[toSym] += units[fromSym]
-			units.pop(fromSym)
+			# Find prefix and base unit
+			prefix, sym = self.stripPrefix(prefixedSym)
+			if prefix:
+				if prefix not in self.prefixes: raise UC_Common.UnitError(f"Unknown unit: '{prefixedSym}'")
+				scaleFactor *= self.getNumericPrefixScaleFactor(prefix)**(exp)
+				if UC_Metrics.enabled: UC_Metrics.increment("prefix_strips")
 
-		return scaleFactor
+			# Substitute the canonical form of the base unit
+			unitScaleFactor, unitBaseUnitMap = self.compileUnit(sym)
+			scaleFactor *= unitScaleFactor**(exp)
+			for baseSym, baseExp in unitBaseUnitMap.items():
+				baseUnitMap[baseSym] = baseUnitMap.get(baseSym, 0) + exp * baseExp
 
-	def factorUnits(self, srcUnits, dstUnits):
-		# Find common factors
-		commonUnits = {}
-		for srcUnitSym, srcUnitExp in srcUnits.items():
-			if srcUnitSym in dstUnits:
-				if not (srcUnitSym in commonUnits): commonUnits[srcUnitSym] = 0
-				commonUnits[srcUnitSym] += min(srcUnitExp, dstUnits[srcUnitSym])
-
-		# Factor out common factors
-		for commonUnitSym, commonUnitExp in commonUnits.items():
-			srcUnits[commonUnitSym] -= commonUnitExp
-			dstUnits[commonUnitSym] -= commonUnitExp
-			if srcUnits[commonUnitSym] == 0: srcUnits.pop(commonUnitSym)
-			if dstUnits[commonUnitSym] == 0: dstUnits.pop(commonUnitSym)
-
-	def reduceUnit(self, reducedUnitSym, unitMap):
-		# Calculate scale factor
-		scaleFactor = 1
-		if reducedUnitSym in self.conversions:
-			tmp = (self.conversions[reducedUnitSym])**(unitMap[reducedUnitSym])
-			scaleFactor *= tmp
-
-		# Reduce unit
-		reducedUnitExp = unitMap.pop(reducedUnitSym)
-		for sym, exp in self.units[reducedUnitSym].baseUnits.items():
-			if not (sym in unitMap): unitMap[sym] = 0
-			unitMap[sym] += reducedUnitExp * exp
-		
 		# Remove cancelled units
-		removeCancelledUnits(unitMap)
+		if UC_Metrics.enabled: UC_Metrics.increment("unit_reductions", len(unitMap))
+		return scaleFactor, {sym: exp for sym, exp in baseUnitMap.items() if exp != 0}
 
-		return scaleFactor
+	def compileUnit(self, sym):
+		"""
+		Get the canonical form of a unit, compiling it if needed
+		@param sym: the unit symbol, without a prefix
+		@return the scale factor and the map of irreducible unit symbols to exponents
+		"""
+		if sym in self.compiledUnits: return self.compiledUnits[sym]
+
+		# Find the units which need to be compiled
+		toCompile = {sym}
+		toVisit = [sym]
+		while toVisit:
+			for dependencySym in self.dependencies(toVisit.pop()):
+				if dependencySym not in toCompile and dependencySym not in self.compiledUnits:
+					toCompile.add(dependencySym)
+					toVisit.append(dependencySym)
+		for dependencySym in toCompile:
+			if dependencySym not in self.ranks: raise UC_Common.UnitError(f"Dependency cycle detected for unit '{dependencySym}'")
+
+		# Compile units in order of rank, so that the units each unit depends on are already compiled
+		for dependencySym in sorted(toCompile, key = self.ranks.__getitem__):
+			unit = self.units[dependencySym]
+			if unit.isDerivedUnit():
+				scaleFactor, baseUnitMap = self.canonicalize(unit.baseUnits)
+				if dependencySym in self.conversions: scaleFactor *= self.toNumber(self.conversions[dependencySym])
+			else: scaleFactor, baseUnitMap = self.toNumber(1), {dependencySym: 1}
+			self.compiledUnits[dependencySym] = (scaleFactor, baseUnitMap)
+		if UC_Metrics.enabled: UC_Metrics.increment("unit_compilations", len(toCompile))
+		return self.compiledUnits[sym]
+
+	def indexAllReferences(self):
+		"""
+		Rebuild the reverse dependency graph from the unit definitions
+		"""
+		# Unit references mapped to the units whose definitions contain them
+		self.references = {}
+		self.referenceIndex = UC_SuffixTrie.SuffixTrie()
+
+		# The prefix and unit which each reference resolves to, and the references which resolve to each unit and prefix
+		self.resolutions = {}
+		self.unitReferences = {}
+		self.prefixReferences = {}
+
+		for sym in self.units: self.indexReferences(sym)
+		self.rankUnits()
+
+	def indexReferences(self, sym):
+		"""
+		Record the unit references in a unit's definition
+		@param sym: the unit symbol
+		"""
+		for reference in self.units[sym].baseUnits.keys():
+			if reference not in self.references:
+				self.references[reference] = set()
+				self.referenceIndex.add(reference)
+			self.references[reference].add(sym)
+			if reference not in self.resolutions: self.resolveReference(reference)
+
+	def unindexReferences(self, sym):
+		"""
+		Discard the unit references in a unit's definition
+		@param sym: the unit symbol
+		"""
+		for reference in self.units[sym].baseUnits.keys():
+			self.references[reference].discard(sym)
+			if not self.references[reference]:
+				del self.references[reference]
+				self.referenceIndex.remove(reference)
+				self.unresolveReference(reference)
+
+	def resolveReference(self, reference):
+		"""
+		Resolve a unit reference to its prefix and unit, updating the reverse dependency graph
+		Units whose definitions contain the reference are invalidated if it resolved differently before
+		@param reference: the (possibly prefixed) unit symbol
+		"""
+		# References may be unresolvable while a transaction's changes are staged
+		try: resolution = self.stripPrefix(reference)
+		except UC_Common.UnitError: resolution = None
+		if resolution == self.resolutions.get(reference): return
+
+		if self.unresolveReference(reference): self.invalidateUnits(self.references[reference])
+		self.resolutions[reference] = resolution
+		if resolution is not None:
+			prefix, sym = resolution
+			self.unitReferences.setdefault(sym, set()).add(reference)
+			if prefix: self.prefixReferences.setdefault(prefix, set()).add(reference)
+
+	def unresolveReference(self, reference):
+		"""
+		Remove a unit reference from the reverse dependency graph
+		@param reference: the (possibly prefixed) unit symbol
+		@return True if the reference was resolved, False otherwise
+		"""
+		resolution = self.resolutions.pop(reference, None)
+		if resolution is None: return False
+		prefix, sym = resolution
+		self.unitReferences[sym].discard(reference)
+		if not self.unitReferences[sym]: del self.unitReferences[sym]
+		if prefix:
+			self.prefixReferences[prefix].discard(reference)
+			if not self.prefixReferences[prefix]: del self.prefixReferences[prefix]
+		return True
+
+	def dependencies(self, sym):
+		"""
+		Get the units which a unit's definition refers to, with or without a prefix
+		@param sym: the unit symbol
+		@return the set of unit symbols
+		"""
+		resolutions = [self.resolutions.get(reference) for reference in self.units[sym].baseUnits.keys()]
+		return {resolution[1] for resolution in resolutions if resolution is not None}
+
+	def dependents(self, sym):
+		"""
+		Get the units whose definitions refer to a unit, with or without a prefix
+		@param sym: the unit symbol
+		@return the set of dependent unit symbols
+		"""
+		return {dependent for reference in self.unitReferences.get(sym, ()) for dependent in self.references[reference]}
+
+	def prefixDependents(self, prefix):
+		"""
+		Get the units whose definitions use a prefix
+		@param prefix: the prefix symbol
+		@return the set of dependent unit symbols
+		"""
+		return {dependent for reference in self.prefixReferences.get(prefix, ()) for dependent in self.references[reference]}
+
+	def findDependents(self, syms):
+		"""
+		Get the units which depend on any of the given units, directly or through other units
+		@param syms: the unit symbols
+		@return the set of dependent unit symbols
+		"""
+		found = set()
+		toVisit = deque(syms)
+		while toVisit:
+			for dependent in self.dependents(toVisit.popleft()):
+				if dependent not in found:
+					found.add(dependent)
+					toVisit.append(dependent)
+		return found
+
+	def rankUnits(self):
+		"""
+		Rank every unit by the length of the longest chain of dependencies below it
+		Units whose dependencies form a cycle are not ranked
+		"""
+		# Rank each unit once all of its dependencies have been ranked
+		if UC_Metrics.enabled: UC_Metrics.increment("topological_sorts")
+		self.ranks = {}
+		pending = {sym: len(self.dependencies(sym)) for sym in self.units}
+		toRank = deque(sym for sym, count in pending.items() if count == 0)
+		while toRank:
+			sym = toRank.popleft()
+			self.ranks[sym] = self.getRank(sym)
+			for dependent in self.dependents(sym):
+				pending[dependent] -= 1
+				if pending[dependent] == 0: toRank.append(dependent)
+
+	def updateRanks(self, syms):
+		"""
+		Update the ranks of units whose dependencies have changed, and of their dependents
+		@param syms: the unit symbols to update
+		"""
+		toUpdate = deque(syms)
+		while toUpdate:
+			sym = toUpdate.popleft()
+			rank = self.getRank(sym)
+			if self.ranks.get(sym) != rank:
+				self.ranks[sym] = rank
+				toUpdate.extend(self.dependents(sym))
+
+	def getRank(self, sym):
+		"""
+		Compute the rank of a unit from the ranks of its dependencies
+		@param sym: the unit symbol
+		@return 0 for base units, or one more than the highest rank of the unit's dependencies
+		"""
+		return max((self.ranks[dependencySym] for dependencySym in self.dependencies(sym)), default = -1) + 1
+
+	def invalidateUnits(self, syms):
+		"""
+		Discard the canonical forms of units and of all units which were compiled from them
+		@param syms: the unit symbols to invalidate
+		"""
+		toInvalidate = [*syms]
+		while toInvalidate:
+			# A unit is only compiled after the units it depends on, so uncompiled units have no compiled dependents
+			sym = toInvalidate.pop()
+			if self.compiledUnits.pop(sym, None) is not None: toInvalidate.extend(self.dependents(sym))
+
+	def deleteUnits(self, syms):
+		"""
+		Delete units, which must include all of their dependents
+		@param syms: the unit symbols to delete
+		"""
+		self.invalidateUnits(syms)
+		for sym in syms: self.unindexReferences(sym)
+		for sym in syms:
+			del self.units[sym]
+			if sym in self.conversions: del self.conversions[sym]
+			self.ranks.pop(sym, None)
+			self.symbolIndex.remove(sym)
+		self.definitionsChanged()
 
 	def convert(self, srcUnit, dstUnit):
-		srcUnits = srcUnit.reduce()
-		dstUnits = dstUnit.reduce()
-
-		# Reduce all units to irreducible
-		performedReduction = True
-		scaleFactor = 1
-		while performedReduction:
-			# Simplify units using SI prefixes
-			scaleFactor *= self.processPrefixes(srcUnits)
-			scaleFactor /= self.processPrefixes(dstUnits)
-
-			# Factor out common units and perform a topological sort to find the next unit to reduce
-			self.factorUnits(srcUnits, dstUnits)
-			unitsToReduce = UC_Utils.topologicalSort(self.units, [*srcUnits.keys()] + [*dstUnits.keys()])
-
-			# Reduce units
-			if len(unitsToReduce) == 0: break
-			performedReduction = self.units[unitsToReduce[0]].isDerivedUnit()
-			if performedReduction:
-				if unitsToReduce[0] in srcUnits: scaleFactor *= self.reduceUnit(unitsToReduce[0], srcUnits)
-				else: scaleFactor /= self.reduceUnit(unitsToReduce[0], dstUnits)
-		
-		# Remove cancelled units
-		removeCancelledUnits(srcUnits)
-		removeCancelledUnits(dstUnits)
+		if UC_Metrics.enabled: return self.convertTimed(srcUnit, dstUnit)
+		# Units are hashed on their reduced form, so equivalent units share a cache entry
+		scaleFactor = self.conversionCache.get((srcUnit, dstUnit))
+		if scaleFactor is not None: return scaleFactor
+		return self.convertUncached(srcUnit, dstUnit)
+
+	def convertTimed(self, srcUnit, dstUnit):
+		"""
+		Get the scale factor between units, recording cache hits and the time taken
+		@param srcUnit: the unit to convert from
+		@param dstUnit: the unit to convert to
+		@return the scale factor
+		"""
+		start = time.perf_counter()
+		# Units are hashed on their reduced form, so equivalent units share a cache entry
+		scaleFactor = self.conversionCache.get((srcUnit, dstUnit))
+		try:
+			if scaleFactor is not None:
+				UC_Metrics.increment("conversion_cache_hits")
+				return scaleFactor
+			UC_Metrics.increment("conversion_cache_misses")
+			return self.convertUncached(srcUnit, dstUnit)
+		except UC_Common.UnitError:
+			UC_Metrics.increment("conversion_errors")
+			raise
+		finally: UC_Metrics.observe("convert_seconds", time.perf_counter() - start)
+
+	def convertUncached(self, srcUnit, dstUnit):
+		"""
+		Get the scale factor between units by canonicalizing them, caching the result
+		@param srcUnit: the unit to convert from
+		@param dstUnit: the unit to convert to
+		@return the scale factor
+		"""
+		srcScaleFactor, srcUnits = self.canonicalize(srcUnit.reduce())
+		dstScaleFactor, dstUnits = self.canonicalize(dstUnit.reduce())
 
 		# Check for conversion error
-		if len(srcUnits) > 0 or len(dstUnits) > 0:
+		if srcUnits != dstUnits:
 			raise UC_Common.UnitError(f"Invalid conversion: {str(srcUnit)} to {str(dstUnit)}")
 
+		scaleFactor = srcScaleFactor / dstScaleFactor
+		self.conversionCache.put((srcUnit, dstUnit), scaleFactor)
 		return scaleFactor
-	
+
+	def explainCanonicalize(self, unitMap, explanation):
+		"""
+		Reduce a map of (possibly prefixed) units to irreducible units, recording each step
+		Definitions are expanded one at a time rather than using compiled units, so every step is shown
+		@param unitMap: a map of unit symbols to exponents
+		@param explanation: the explanation to record steps in
+		@return the scale factor and the map of irreducible unit symbols to exponents
+		"""
+		scaleFactor = self.toNumber(1)
+		baseUnitMap = {}
+		toReduce = [(prefixedSym, self.toNumber(exp), 1) for prefixedSym, exp in reversed(unitMap.items())]
+		while toReduce:
+			prefixedSym, exp, depth = toReduce.pop()
+
+			# Strip prefix
+			start = time.perf_counter()
+			prefix, sym = self.stripPrefix(prefixedSym)
+			if prefix:
+				if prefix not in self.prefixes: raise UC_Common.UnitError(f"Unknown unit: '{prefixedSym}'")
+				factor = self.getNumericPrefixScaleFactor(prefix)**(exp)
+				scaleFactor *= factor
+				explanation.addStep(depth, f"strip prefix '{prefix}' from {formatUnit(prefixedSym, exp)}", factor, time.perf_counter() - start)
+				start = time.perf_counter()
+
+			# Reduce unit using its definition
+			unit = self.units[sym]
+			if unit.isDerivedUnit():
+				factor = self.toNumber(self.conversions.get(sym, 1))**(exp)
+				scaleFactor *= factor
+				definition = " ".join(formatUnit(dependencySym, exp * dependencyExp) for dependencySym, dependencyExp in unit.baseUnits.items())
+				for dependencySym, dependencyExp in reversed(unit.baseUnits.items()):
+					toReduce.append((dependencySym, exp * self.toNumber(dependencyExp), depth + 1))
+				explanation.addStep(depth, f"reduce {formatUnit(sym, exp)} to {definition}", factor, time.perf_counter() - start)
+			else:
+				baseUnitMap[sym] = baseUnitMap.get(sym, 0) + exp
+				explanation.addStep(depth, f"{formatUnit(sym, exp)} is irreducible", None, time.perf_counter() - start)
+
+		# Remove cancelled units
+		cancelled = [sym for sym, exp in baseUnitMap.items() if exp == 0]
+		if cancelled: explanation.addStep(1, f"cancel {' '.join(cancelled)}")
+		return scaleFactor, {sym: exp for sym, exp in baseUnitMap.items() if exp != 0}
+
+	def explain(self, srcUnit, dstUnit):
+		"""
+		Convert between units, recording each step of the reduction and how long it took
+		@param srcUnit: the unit to convert from
+		@param dstUnit: the unit to convert to
+		@return the explanation, whose error is set if the conversion failed
+		"""
+		explanation = Explanation(srcUnit, dstUnit)
+		start = time.perf_counter()
+		try:
+			explanation.addStep(0, f"reduce source unit {str(srcUnit)}")
+			srcScaleFactor, srcUnits = self.explainCanonicalize(srcUnit.reduce(), explanation)
+			explanation.addStep(0, f"reduce destination unit {str(dstUnit)}")
+			dstScaleFactor, dstUnits = self.explainCanonicalize(dstUnit.reduce(), explanation)
+
+			# Check for conversion error
+			if srcUnits != dstUnits:
+				raise UC_Common.UnitError(f"Invalid conversion: {str(srcUnit)} to {str(dstUnit)}")
+			common = " ".join(formatUnit(sym, exp) for sym, exp in srcUnits.items())
+			explanation.addStep(0, f"cancel {common or 'dimensionless units'} common to both units")
+
+			explanation.scaleFactor = srcScaleFactor / dstScaleFactor
+			explanation.addStep(0, f"divide source scale factor {srcScaleFactor} by destination scale factor {dstScaleFactor}", explanation.scaleFactor)
+		except UC_Common.UnitError as err: explanation.error = str(err)
+		explanation.elapsed = time.perf_counter() - start
+		return explanation
+
+	def compile(self, srcUnit, dstUnit, useFloat = False):
+		"""
+		Create a function which converts magnitudes between a fixed pair of units
+		@param srcUnit: the unit to convert from
+		@param dstUnit: the unit to convert to
+		@param useFloat: True to convert using float arithmetic instead of the convertor's numeric type
+		@return the conversion, which is called with a magnitude in the source unit
+		"""
+		numberType = float if useFloat else self.numberType
+		return Conversion(srcUnit, dstUnit, self.convert(srcUnit, dstUnit), numberType)
+
 	def addUnit(self, sym, scaleFactor, unit):
 		if not UC_Utils.isValidSymbol(sym):
 			raise UC_Common.UnitError(f"Invalid symbol '{sym}': valid unit symbols are composed of alphabetical characters and underscores")
@@ -127,15 +618,32 @@ class Convertor:
 			raise UC_Common.UnitError(f"Unit '{sym}' already exists: {self.getUnitDefinitionStr(sym)}")
 		else:
 			# Try adding unit
-			units = self.units.copy()
-			units[sym] = UC_Unit.Unit(sym, unit.reduce())
-			conversions = self.conversions.copy()
-			conversions[sym] = scaleFactor
-			
-			# Check that all dependencies exist and check for an acyclic dependency graph
-			UC_Utils.validate(units, conversions, self.prefixes)
-			self.units = units
-			self.conversions = conversions
+			self.units[sym] = UC_Unit.Unit(sym, unit.reduce())
+			self.symbolIndex.add(sym)
+
+			# Check the new unit's dependencies and the existing references which now resolve to it,
+			# then check for a dependency cycle through the new unit
+			try:
+				if self.validating:
+					references = [*self.units[sym].baseUnits.keys(), *self.referenceIndex.endingWith(sym)]
+					UC_Utils.validateDependencies(references, self.units, self.prefixes, self.symbolIndex)
+
+					# Existing definitions are acyclic, so a cycle must pass through a reference which resolves to the new unit
+					if any(self.stripPrefix(reference)[1] == sym for reference in references):
+						UC_Utils.validateAcyclic(sym, self.units, self.symbolIndex)
+			except UC_Common.UnitError:
+				del self.units[sym]
+				self.symbolIndex.remove(sym)
+				raise
+			self.conversions[sym] = scaleFactor
+			self.indexReferences(sym)
+
+			# Existing references which end with the new symbol may now resolve to it
+			for reference in self.referenceIndex.endingWith(sym): self.resolveReference(reference)
+
+			# Staged definitions may be incomplete or cyclic, so transactions rank units when committed
+			if self.validating: self.updateRanks([sym, *self.dependents(sym)])
+			self.definitionsChanged()
 	
 	def addPrefix(self, sym, base, exp):
 		if not UC_Utils.isValidSymbol(sym):
@@ -144,36 +652,14 @@ class Convertor:
 			base, exp = self.prefixes[sym]
 			raise UC_Common.UnitError(f"Prefix '{sym}' already exists: '{sym}' = {base}^{exp} = {base**exp}")
 		else:
-			# Try adding prefix
-			prefixes = self.prefixes.copy()
-			prefixes[sym] = (base, exp)
-
-			# Check that all dependencies exist and check for an acyclic dependency graph
-			UC_Utils.validate(self.units, self.conversions, prefixes)
-			self.prefixes = prefixes
+			# A new prefix cannot invalidate existing definitions
+			self.prefixes[sym] = (base, exp)
+			self.definitionsChanged()
 
 	def delUnit(self, symToDelete):
 		if symToDelete in self.units:
-			unitsToDelete = {symToDelete}
-
-			# Find all units to delete
-			foundDependentUnit = True
-			while foundDependentUnit:
-				foundDependentUnit = False
-				for sym, unit in self.units.items():
-					if sym in unitsToDelete: continue
-					for dependencySym in unit.baseUnits.keys():
-						prefix, baseSym = UC_Utils.stripPrefix(self.units, dependencySym)
-						if baseSym in unitsToDelete:
-							unitsToDelete.add(sym)
-							foundDependentUnit = True
-							break
-
-			# Delete all units which need to be deleted
-			for sym in unitsToDelete:
-				del self.units[sym]
-				if sym in self.conversions: del self.conversions[sym]
-			
+			unitsToDelete = {symToDelete} | self.findDependents([symToDelete])
+			self.deleteUnits(unitsToDelete)
 			return unitsToDelete
 		else:
 			try: unitDefStr = self.getUnitDefinitionStr(symToDelete)
@@ -182,28 +668,39 @@ class Convertor:
 	
 	def delPrefix(self, symToDelete):
 		if symToDelete in self.prefixes:
-			unitsToDelete = set()
-
-			# Find all units to delete
-			foundDependentUnit = True
-			while foundDependentUnit:
-				foundDependentUnit = False
-				for sym, unit in self.units.items():
-					if sym in unitsToDelete: continue
-					for dependencySym in unit.baseUnits.keys():
-						prefix, baseSym = UC_Utils.stripPrefix(self.units, dependencySym)
-						if prefix == symToDelete or baseSym in unitsToDelete:
-							unitsToDelete.add(sym)
-							foundDependentUnit = True
-							break
-
-			# Delete all units which need to be deleted
-			for sym in unitsToDelete:
-				del self.units[sym]
-				if sym in self.conversions: del self.conversions[sym]
+			prefixDependents = self.prefixDependents(symToDelete)
+			unitsToDelete = prefixDependents | self.findDependents(prefixDependents)
+			self.deleteUnits(unitsToDelete)
 			
 			# Delete from prefix map
 			del self.prefixes[symToDelete]
+			self.prefixScaleFactors.pop(symToDelete, None)
 
 			return unitsToDelete
-		else: raise UC_Common.UnitError(f"Cannot delete '{symToDelete}' - prefix does not exist") 
\ No newline at end of file
+		else: raise UC_Common.UnitError(f"Cannot delete '{symToDelete}' - prefix does not exist")
+
+	def load(self, filename, overwrite = False):
+		# Load definitions into copies so that a failed load leaves the convertor unchanged
+		units = self.units.copy()
+		conversions = self.conversions.copy()
+		prefixes = self.prefixes.copy()
+		if UC_Snapshot.isSnapshot(filename): UC_Snapshot.loadFile(filename, units, conversions, prefixes, overwrite)
+		else: UC_FileIO.loadFile(filename, units, conversions, prefixes, overwrite)
+
+		# Index newly-defined symbols and discard canonical forms which may have changed
+		for sym, unit in units.items():
+			if sym not in self.units:
+				self.symbolIndex.add(sym)
+				for reference in self.referenceIndex.endingWith(sym): self.resolveReference(reference)
+			elif unit is not self.units[sym] or conversions.get(sym) != self.conversions.get(sym):
+				self.invalidateUnits([sym])
+		for prefix, value in prefixes.items():
+			if prefix in self.prefixes and self.prefixes[prefix] != value:
+				self.invalidateUnits(self.prefixDependents(prefix))
+
+		self.prefixScaleFactors.clear()
+		self.units = units
+		self.conversions = conversions
+		self.prefixes = prefixes
+		self.indexAllReferences()
+		self.definitionsChanged()
\ No newline at end of file
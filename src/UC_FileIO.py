@@ -1,58 +1,92 @@
 import src.UC_Common as UC_Common
 import src.UC_FileParser as UC_FileParser
 import src.UC_FileSerializer as UC_FileSerializer
+import src.UC_Metrics as UC_Metrics
 import src.UC_Utils as UC_Utils
 
-def tokenize(lines: list = []):
+def generateTokens(lines):
 	"""
-	Generate a list of tokens from a list of strings
-	@param lines: the list of strings from which to generate tokens
-	@return a list of tokens
+	Generate tokens and their positions from an iterable of strings
+	@param lines: the strings from which to generate tokens, such as an open file
+	@return a generator of (token, line number, column number) tuples, numbered from 1
 	"""
-	tokens = []
-	for line in lines:
+	for lineNumber, line in enumerate(lines, 1):
 		token = ''
-		for char in line:
+		for column, char in enumerate(line, 1):
 			# Stop processing line if there is a comment
 			if char == UC_Common.COMMENT_DELIMITER:
-				if token: tokens.append(token)
+				if token: yield token, lineNumber, column - len(token)
+				token = ''
 				break
 			# Handle whitespace
 			if UC_Utils.isWhitespace(char):
 				if token:
-					tokens.append(token)
+					yield token, lineNumber, column - len(token)
 					token = ''
 			# Handle delimiters
 			elif UC_Utils.isDelimiter(char):
 				if token:
-					tokens.append(token)
+					yield token, lineNumber, column - len(token)
 					token = ''
-				tokens.append(char)
+				yield char, lineNumber, column
 			# Build token
 			else: token += char
 		
-		if token: tokens.append(token)
+		if token: yield token, lineNumber, len(line) - len(token) + 1
 
-	return tokens
+def tokenize(lines: list = []):
+	"""
+	Generate a list of tokens from a list of strings
+	@param lines: the list of strings from which to generate tokens
+	@return a list of tokens
+	"""
+	return [token for token, lineNumber, column in generateTokens(lines)]
+
+class FileTokenStream(UC_Utils.TokenStream):
+	"""
+	Stream of tokens generated lazily from the lines of a file
+	The position of the most recently consumed token is kept for reporting errors
+	"""
+	def __init__(self, lines):
+		"""
+		FileTokenStream constructor
+		@param lines: an iterable of strings, such as an open file
+		"""
+		super().__init__(generateTokens(lines))
+		self.lineNumber = 1
+		self.column = 1
+
+	def __getitem__(self, index):
+		return super().__getitem__(index)[0]
 
-def loadFile(filename, units, conversions, prefixes, overwrite):
+	def popleft(self):
+		token, self.lineNumber, self.column = super().popleft()
+		return token
+
+def loadFile(filename, units, conversions, prefixes, overwrite = False):
 	"""
 	Read a file and generate maps of units, conversions, and prefixes
+	The file is parsed one definition at a time as it is read
 	@param filename: the name of the file to load
 	@param units: a map of unit symbols to unit objects
 	@param conversions: a map of derived unit symbols to scale factors
 	@param prefixes: a map of prefixes to exponents
 	"""
-	# Generate a list of tokens from the file
-	file = open(filename, 'r')
-	tokens = tokenize(file.readlines())
-	file.close()
-
-	# Parse tokens to generate maps
-	UC_FileParser.parseFile(tokens, units, conversions, prefixes, overwrite)
+	if UC_Metrics.enabled: stopwatch = UC_Metrics.Stopwatch("load_file")
+	with open(filename, 'r') as file:
+		# Parse tokens to generate maps
+		tokens = FileTokenStream(file)
+		try: UC_FileParser.parseFile(tokens, units, conversions, prefixes, overwrite)
+		except (UC_Common.UnitError, UC_Common.FileFormatError) as err:
+			raise UC_Common.FileFormatError(f"{filename}, line {tokens.lineNumber}, column {tokens.column}: {err}")
+	if UC_Metrics.enabled: stopwatch.lap("parse")
 
 	# Check that all dependencies exist and check for an acyclic dependency graph
 	UC_Utils.validate(units, conversions, prefixes)
+	if UC_Metrics.enabled:
+		stopwatch.lap("validate")
+		stopwatch.stop()
+		UC_Metrics.increment("file_loads")
 
 def writeFile(filename, units, conversions, prefixes):
 	"""
@@ -6,9 +6,10 @@ import src.UC_Common as UC_Common
 def parseBaseUnitMap(tokens):
 	"""
 	Convert the next series of tokens into a map of units to exponents
-	@param tokens: a list of tokens
+	@param tokens: a stream of tokens
 	@return pairs of units and their corresponding exponents
 	"""
+	tokens = UC_Utils.toTokenStream(tokens)
 	baseUnitMap = {}
 
 	baseSym = UC_Utils.parseSymbol(tokens)
@@ -29,8 +30,9 @@ def parseUnit(units, conversions, tokens, overwrite = False):
 	Convert the next series of tokens into a unit
 	@param units: a map of unit symbols to unit objects to be modified
 	@param conversions: a map of unit symbols to scale factors to be modified
-	@param tokens: a list of tokens
+	@param tokens: a stream of tokens
 	"""
+	tokens = UC_Utils.toTokenStream(tokens)
 	baseUnitMap = {}
 
 	# Handle base unit
@@ -56,9 +58,10 @@ def parsePrefixMapping(prefixes, tokens, base, overwrite = False):
 	"""
 	Convert the next series of tokens into a prefix-exponent pair
 	@param prefixes: the prefix-exponent map to modify
-	@param tokens: a list of tokens
+	@param tokens: a stream of tokens
 	@param base: the base for the exponent
 	"""
+	tokens = UC_Utils.toTokenStream(tokens)
 	prefix = UC_Utils.getNextToken(tokens)
 	if not overwrite and (prefix in prefixes):
 		raise UC_Common.FileFormatError(f"Duplicate definition of prefix '{prefix}'")
@@ -68,8 +71,9 @@ def parsePrefix(prefixes, tokens, overwrite = False):
 	"""
 	Convert the next series of tokens into prefix-exponent pairs
 	@param prefixes: the prefix-exponent map to modify
-	@param tokens: a list of tokens
+	@param tokens: a stream of tokens
 	"""
+	tokens = UC_Utils.toTokenStream(tokens)
 	base = UC_Utils.parseFloat(tokens)
 	UC_Utils.getNextToken(tokens, UC_Common.MAP_DELIMITER)
 
@@ -82,13 +86,14 @@ def parsePrefix(prefixes, tokens, overwrite = False):
 # Recursive descent parsing
 def parseFile(tokens, units, conversions, prefixes, overwrite = False):
 	"""
-	Convert a list of tokens into maps of units, conversions, and prefixes
-	@param tokens: a list of tokens
+	Convert a stream of tokens into maps of units, conversions, and prefixes
+	@param tokens: a stream of tokens
 	@param units: a map of unit symbols to unit objects
 	@param conversions: a map of derived unit symbols to scale factors
 	@param prefixes: a map of prefixes to exponents
 	"""
-	while len(tokens):
+	tokens = UC_Utils.toTokenStream(tokens)
+	while tokens:
 		if UC_Utils.isValidSymbol(tokens[0]): parseUnit(units, conversions, tokens, overwrite)
 		else: parsePrefix(prefixes, tokens, overwrite)
 
@@ -0,0 +1,145 @@
+import bisect
+import threading
+import time
+
+# Metrics are only recorded while enabled - instrumented code checks this flag before doing any work
+enabled = False
+
+# Upper bounds of the timing histogram buckets, in seconds
+BUCKETS = (1e-6, 4e-6, 1.6e-5, 6.4e-5, 2.56e-4, 1.024e-3, 4.096e-3, 1.6384e-2, 6.5536e-2, 0.262144, 1.048576)
+
+# Prefix of metric names in the Prometheus text format
+NAMESPACE = "unit_convertor"
+
+class Histogram:
+	"""
+	Distribution of observed values, counted in fixed buckets
+	"""
+	def __init__(self, buckets = BUCKETS):
+		"""
+		Histogram constructor
+		@param buckets: the increasing upper bounds of the buckets - larger values are only counted in the total
+		"""
+		self.buckets = buckets
+		self.counts = [0] * len(buckets)
+		self.count = 0
+		self.sum = 0
+
+	def observe(self, value):
+		"""
+		Count a value in the first bucket whose upper bound is at least the value
+		@param value: the value to count
+		"""
+		index = bisect.bisect_left(self.buckets, value)
+		if index < len(self.counts): self.counts[index] += 1
+		self.count += 1
+		self.sum += value
+
+	def getStats(self):
+		"""
+		Get the histogram counters
+		@return a map of the count, sum, and cumulative count of each bucket keyed on its upper bound
+		"""
+		cumulativeCounts = {}
+		total = 0
+		for bound, count in zip(self.buckets, self.counts):
+			total += count
+			cumulativeCounts[bound] = total
+		return {"count": self.count, "sum": self.sum, "buckets": cumulativeCounts}
+
+class Stopwatch:
+	"""
+	Times consecutive stages of an operation, recording each stage in its own histogram
+	"""
+	def __init__(self, name):
+		"""
+		Stopwatch constructor
+		@param name: the name of the operation, which prefixes the name of each stage
+		"""
+		self.name = name
+		self.start = self.lapStart = time.perf_counter()
+
+	def lap(self, stage):
+		"""
+		Record the time since the previous lap
+		@param stage: the name of the stage which just finished
+		"""
+		now = time.perf_counter()
+		observe(f"{self.name}_{stage}_seconds", now - self.lapStart)
+		self.lapStart = now
+
+	def stop(self):
+		"""
+		Record the time since the stopwatch was started
+		"""
+		observe(f"{self.name}_seconds", time.perf_counter() - self.start)
+
+lock = threading.Lock()
+counters = {}
+histograms = {}
+
+def enable():
+	global enabled
+	enabled = True
+
+def disable():
+	global enabled
+	enabled = False
+
+def reset():
+	"""
+	Discard all recorded metrics
+	"""
+	with lock:
+		counters.clear()
+		histograms.clear()
+
+def increment(name, amount = 1):
+	"""
+	Increase a counter, creating it if needed
+	@param name: the name of the counter
+	@param amount: the amount to increase the counter by
+	"""
+	with lock: counters[name] = counters.get(name, 0) + amount
+
+def observe(name, value):
+	"""
+	Record a value in a histogram, creating it if needed
+	@param name: the name of the histogram
+	@param value: the value to record
+	"""
+	with lock:
+		if name not in histograms: histograms[name] = Histogram()
+		histograms[name].observe(value)
+
+def snapshot():
+	"""
+	Get the current value of every metric
+	@return a map containing a map of counter names to values, and a map of histogram names to their counters
+	"""
+	with lock:
+		return {
+			"counters": dict(counters),
+			"histograms": {name: histogram.getStats() for name, histogram in histograms.items()},
+		}
+
+def toPrometheus(namespace = NAMESPACE):
+	"""
+	Format the current value of every metric in the Prometheus text exposition format
+	@param namespace: the prefix of each metric name
+	@return the formatted metrics, one sample per line
+	"""
+	metrics = snapshot()
+	lines = []
+	for name, value in sorted(metrics["counters"].items()):
+		name = f"{namespace}_{name}_total"
+		lines.append(f"# TYPE {name} counter")
+		lines.append(f"{name} {value}")
+	for name, stats in sorted(metrics["histograms"].items()):
+		name = f"{namespace}_{name}"
+		lines.append(f"# TYPE {name} histogram")
+		for bound, count in stats["buckets"].items(): lines.append(f"{name}_bucket{{le=\"{bound}\"}} {count}")
+		lines.append(f"{name}_bucket{{le=\"+Inf\"}} {stats['count']}")
+		lines.append(f"{name}_sum {stats['sum']}")
+		lines.append(f"{name}_count {stats['count']}")
+	return "".join(f"{line}\n" for line in lines)
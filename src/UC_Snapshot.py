@@ -0,0 +1,163 @@
+from decimal import Decimal
+import mmap
+import struct
+import src.UC_Common as UC_Common
+import src.UC_Unit as UC_Unit
+import src.UC_Utils as UC_Utils
+
+# Snapshots are laid out as the magic bytes followed by three sections of records:
+# prefixes (symbol, base, exponent), units (symbol, conversion, dependencies), and
+# compiled units (symbol, scale factor, irreducible units)
+# Numbers are stored as decimal strings so that no precision is lost
+MAGIC = b"UCB1"
+EXTENSION = ".ucb"
+COUNT = struct.Struct("<I")
+LENGTH = struct.Struct("<H")
+
+def isSnapshot(filename):
+	"""
+	Determine whether a file is a binary snapshot
+	@param filename: the name of the file to check
+	@return True if the file starts with the snapshot magic bytes, False otherwise
+	"""
+	with open(filename, 'rb') as file: return file.read(len(MAGIC)) == MAGIC
+
+class SnapshotWriter:
+	def __init__(self):
+		self.data = bytearray(MAGIC)
+
+	def writeCount(self, count):
+		self.data += COUNT.pack(count)
+
+	def writeString(self, string):
+		encoded = str(string).encode("utf-8")
+		self.data += LENGTH.pack(len(encoded))
+		self.data += encoded
+
+	def writeUnitMap(self, unitMap):
+		self.writeCount(len(unitMap))
+		for sym, exp in unitMap.items():
+			self.writeString(sym)
+			self.writeString(exp)
+
+class SnapshotReader:
+	def __init__(self, data):
+		if data[:len(MAGIC)] != MAGIC: raise UC_Common.FileFormatError("Invalid snapshot: missing header")
+		self.data = data
+		self.offset = len(MAGIC)
+
+	def readCount(self):
+		count, = COUNT.unpack_from(self.data, self.offset)
+		self.offset += COUNT.size
+		return count
+
+	def readString(self):
+		length, = LENGTH.unpack_from(self.data, self.offset)
+		self.offset += LENGTH.size
+		if self.offset + length > len(self.data): raise struct.error("string extends past end of snapshot")
+		string = self.data[self.offset:self.offset + length].decode("utf-8")
+		self.offset += length
+		return string
+
+	def readNumber(self):
+		return Decimal(self.readString())
+
+	def readExponent(self):
+		# Keep integral exponents as ints, as they are when parsed from text
+		string = self.readString()
+		return int(string) if UC_Utils.isInt(string) else Decimal(string)
+
+	def readUnitMap(self):
+		unitMap = {}
+		for i in range(self.readCount()):
+			sym = self.readString()
+			unitMap[sym] = self.readExponent()
+		return unitMap
+
+def writeSnapshot(filename, units, conversions, prefixes, compiledUnits = {}):
+	"""
+	Write a binary snapshot of validated definitions
+	@param filename: the name of the file to write
+	@param units: a map of unit symbols to unit objects
+	@param conversions: a map of derived unit symbols to scale factors
+	@param prefixes: a map of prefixes to exponents
+	@param compiledUnits: a map of unit symbols to their scale factors and maps of irreducible units
+	"""
+	writer = SnapshotWriter()
+
+	writer.writeCount(len(prefixes))
+	for sym, (base, exp) in prefixes.items():
+		writer.writeString(sym)
+		writer.writeString(UC_Utils.toDecimal(base))
+		writer.writeString(UC_Utils.toDecimal(exp))
+
+	writer.writeCount(len(units))
+	for sym, unit in units.items():
+		writer.writeString(sym)
+		writer.writeString(UC_Utils.toDecimal(conversions[sym]) if sym in conversions else "")
+		writer.writeUnitMap(unit.baseUnits)
+
+	writer.writeCount(len(compiledUnits))
+	for sym, (scaleFactor, baseUnitMap) in compiledUnits.items():
+		writer.writeString(sym)
+		writer.writeString(UC_Utils.toDecimal(scaleFactor))
+		writer.writeUnitMap(baseUnitMap)
+
+	with open(filename, 'wb') as file: file.write(writer.data)
+
+def readSnapshot(filename):
+	"""
+	Read a binary snapshot without validating its definitions
+	@param filename: the name of the file to read
+	@return the maps of units, conversions, prefixes, and compiled units
+	"""
+	units, conversions, prefixes, compiledUnits = {}, {}, {}, {}
+	with open(filename, 'rb') as file:
+		try: data = mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ)
+		except ValueError: raise UC_Common.FileFormatError(f"Invalid snapshot: '{filename}' is empty")
+
+	with data:
+		try:
+			reader = SnapshotReader(data)
+			for i in range(reader.readCount()):
+				sym = reader.readString()
+				prefixes[sym] = (reader.readNumber(), reader.readNumber())
+
+			for i in range(reader.readCount()):
+				sym = reader.readString()
+				conversion = reader.readString()
+				if conversion: conversions[sym] = Decimal(conversion)
+				units[sym] = UC_Unit.Unit(sym, reader.readUnitMap())
+
+			for i in range(reader.readCount()):
+				sym = reader.readString()
+				scaleFactor = reader.readNumber()
+				compiledUnits[sym] = (scaleFactor, reader.readUnitMap())
+		except (struct.error, ArithmeticError, UnicodeDecodeError) as err:
+			raise UC_Common.FileFormatError(f"Invalid snapshot: '{filename}' is corrupt ({err})")
+
+	return units, conversions, prefixes, compiledUnits
+
+def loadFile(filename, units, conversions, prefixes, overwrite = False):
+	"""
+	Read a binary snapshot and merge its definitions into maps of units, conversions, and prefixes
+	Merged definitions are validated, since they may interact with existing definitions
+	@param filename: the name of the file to load
+	@param units: a map of unit symbols to unit objects
+	@param conversions: a map of derived unit symbols to scale factors
+	@param prefixes: a map of prefixes to exponents
+	"""
+	newUnits, newConversions, newPrefixes, compiledUnits = readSnapshot(filename)
+	for sym, value in newPrefixes.items():
+		if not overwrite and (sym in prefixes):
+			raise UC_Common.FileFormatError(f"Duplicate definition of prefix '{sym}'")
+		prefixes[sym] = value
+	for sym, unit in newUnits.items():
+		if not overwrite and (sym in units):
+			raise UC_Common.FileFormatError(f"Duplicate definition of unit '{sym}'")
+		units[sym] = unit
+		if sym in newConversions: conversions[sym] = newConversions[sym]
+		else: conversions.pop(sym, None)
+
+	# Check that all dependencies exist and check for an acyclic dependency graph
+	UC_Utils.validate(units, conversions, prefixes)
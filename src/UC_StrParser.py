@@ -1,9 +1,35 @@
 from decimal import Decimal
+import re
+import src.UC_Cache as UC_Cache
 import src.UC_Common as UC_Common
+import src.UC_Compiler as UC_Compiler
+import src.UC_Metrics as UC_Metrics
 import src.UC_Utils as UC_Utils
 import src.UC_Unit as UC_Unit
 import src.UC_AST as UC_AST
 
+# Parsed expressions, keyed on the input string
+parseCache = UC_Cache.LRUCache()
+
+# Characters which are always their own token, and characters which may form part of a symbol
+SPECIAL_CHARS = "".join(re.escape(char) for char in [
+	*UC_Common.operatorPrecedences.keys(),
+	UC_Common.BRACKET_OPEN,
+	UC_Common.BRACKET_SHUT,
+	UC_Common.PLACEHOLDER,
+])
+SYMBOL_CHAR = rf"[^ \t\r\n0-9.{SPECIAL_CHARS}]"
+
+# Single-pass tokenizer for ASCII strings, equivalent to tokenizeByCharacter
+# A float followed by '.' puts the character-level state machine in a state which this pattern does
+# not model, so such floats are captured in a separate group to fall back to tokenizeByCharacter
+TOKEN_PATTERN = re.compile(
+	rf"[ \t\r\n]+"
+	rf"|([{SPECIAL_CHARS}])"
+	rf"|((?:{SYMBOL_CHAR}*\.|[0-9]+\.?)[0-9]*(?:[eE][+-]?[0-9]+)?)((?:[eE][+-]?)?\.)?"
+	rf"|({SYMBOL_CHAR}+)"
+)
+
 def tokenizeFloat(token, tokens, char, parseFloatState):
 	"""
 	Incrementally parse floats as a single token
@@ -62,6 +88,18 @@ def tokenize(line):
 	@param line: the string to convert
 	@return a list of tokens
 	"""
+	if not line.isascii(): return tokenizeByCharacter(line)
+	matches = TOKEN_PATTERN.findall(line)
+	for specialChar, number, trailingDot, sym in matches:
+		if trailingDot: return tokenizeByCharacter(line)
+	return [specialChar or number or sym for specialChar, number, trailingDot, sym in matches if specialChar or number or sym]
+
+def tokenizeByCharacter(line):
+	"""
+	Convert a string into a list of tokens, one character at a time
+	@param line: the string to convert
+	@return a list of tokens
+	"""
 	tokens = []
 	token = ''
 	
@@ -76,7 +114,7 @@ def tokenize(line):
 		elif UC_Utils.isWhitespace(char):
 			if token: tokens.append(token)
 			token = ""
-		elif UC_Utils.isSpecialChar(char):
+		elif UC_Utils.isSpecialChar(char) or char == UC_Common.PLACEHOLDER:
 			if token: tokens.append(token)
 			token = ""
 			tokens.append(char)
@@ -99,8 +137,8 @@ def convertToRPN(tokens):
 		elif token == UC_Common.BRACKET_SHUT:
 			while operatorStack and operatorStack[-1] != UC_Common.BRACKET_OPEN:
 				outputQueue.append(operatorStack.pop())
-			if operatorStack.pop() != UC_Common.BRACKET_OPEN:
-				raise UC_CommonUnitError(f"Detected mismatched parentheses: '{UC_Common.BRACKET_SHUT}'")
+			if not operatorStack or operatorStack.pop() != UC_Common.BRACKET_OPEN:
+				raise UC_Common.UnitError(f"Detected mismatched parentheses: '{UC_Common.BRACKET_SHUT}'")
 		elif UC_Utils.isOperator(token):
 			while (
 				operatorStack and
@@ -113,7 +151,7 @@ def convertToRPN(tokens):
 	
 	while operatorStack:
 		if operatorStack[-1] == UC_Common.BRACKET_OPEN:
-			raise UC_CommonUnitError(f"Detected mismatched parentheses: '{UC_Common.BRACKET_OPEN}'")
+			raise UC_Common.UnitError(f"Detected mismatched parentheses: '{UC_Common.BRACKET_OPEN}'")
 		outputQueue.append(operatorStack.pop())
 
 	return outputQueue
@@ -121,11 +159,12 @@ def convertToRPN(tokens):
 def aggregateSign(tokens, updatedTokens = []):
 	"""
 	Replace the negation operator '-' with a multiplication by -1
-	@param tokens: a list of tokens
+	@param tokens: a list or stream of tokens
 	"""
+	tokens = UC_Utils.toTokenStream(tokens)
 	def aggregateSignHelper(tokens, updatedTokens):
 		while tokens:
-			token = tokens.pop(0)
+			token = tokens.popleft()
 			if token == UC_Common.BRACKET_OPEN:
 				updatedTokens.append(token)
 				aggregateSignHelper(tokens, updatedTokens)
@@ -136,7 +175,7 @@ def aggregateSign(tokens, updatedTokens = []):
 				(not updatedTokens or UC_Utils.isSpecialChar(updatedTokens[-1]))
 			):
 				if tokens and UC_Utils.isFloat(tokens[0]):
-					updatedTokens.append(f"{token}{tokens.pop(0)}")
+					updatedTokens.append(f"{token}{tokens.popleft()}")
 				elif not updatedTokens or updatedTokens[-1] != UC_Common.BRACKET_SHUT:
 					updatedTokens.extend([UC_Common.BRACKET_OPEN, f"{token}1", UC_Common.OPERATOR_MUL])
 					aggregateSignHelper(tokens, updatedTokens)
@@ -152,8 +191,9 @@ def aggregateSign(tokens, updatedTokens = []):
 def aggregateUnits(tokens):
 	"""
 	Combine tokens which constitute compound units
-	@param tokens: a list of tokens
+	@param tokens: a list or stream of tokens
 	"""
+	tokens = UC_Utils.toTokenStream(tokens)
 	aggregatedTokens = []
 	unitTokens = []
 	parsingExp = 0
@@ -180,7 +220,7 @@ def aggregateUnits(tokens):
 		if parsingExp != 1: return parsingExp
 		if tokens:
 			if tokens[0] == UC_Common.OPERATOR_MUL or tokens[0] == UC_Common.OPERATOR_DIV:
-				unitTokens.append(tokens.pop(0))
+				unitTokens.append(tokens.popleft())
 			elif UC_Utils.isValidSymbol(tokens[0]):
 				unitTokens.append(UC_Common.OPERATOR_MUL)
 		return 0
@@ -189,10 +229,10 @@ def aggregateUnits(tokens):
 		if tokens:
 			token = tokens[0]
 			if token == UC_Common.OPERATOR_EXP:
-				unitTokens.append(tokens.pop(0))
+				unitTokens.append(tokens.popleft())
 				return 1
 			elif token == UC_Common.OPERATOR_MUL or token == UC_Common.OPERATOR_DIV:
-				unitTokens.append(tokens.pop(0))
+				unitTokens.append(tokens.popleft())
 			elif UC_Utils.isValidSymbol(token):
 				unitTokens.append(UC_Common.OPERATOR_MUL)
 		return parsingExp
@@ -215,6 +255,9 @@ def aggregateUnits(tokens):
 				unitTokens.append(token)
 				parsingExp = handleParseExpDecrement(tokens, unitTokens, parsingExp)
 			else: unitTokens = appendUnitTokens(aggregatedTokens, unitTokens, token)
+		elif token == UC_Common.PLACEHOLDER:
+			if parsingExp: raise UC_Common.UnitError(f"Expected int; received '{token}'")
+			else: unitTokens = appendUnitTokens(aggregatedTokens, unitTokens, token)
 		elif UC_Utils.isValidSymbol(token):
 			if parsingExp: raise UC_Common.UnitError(f"Expected int; received '{token}'")
 			unitTokens.append(token)
@@ -230,26 +273,27 @@ def aggregateUnits(tokens):
 def aggregateQuantities(tokens):
 	"""
 	Combine tokens which constitute a quantity
-	@param tokens: a list of tokens
+	@param tokens: a list or stream of tokens
 	"""
+	tokens = UC_Utils.toTokenStream(tokens)
 	aggregatedTokens = []
 	needsValue = True
 
 	while tokens:
 		if UC_Utils.isOperator(tokens[0]):
 			if needsValue: raise UC_Common.UnitError(f"Expected float; received '{tokens[0]}'")
-			aggregatedTokens.append(tokens.pop(0))
+			aggregatedTokens.append(tokens.popleft())
 			needsValue = True
 		elif UC_Utils.isSpecialChar(tokens[0]):
-			aggregatedTokens.append(tokens.pop(0))
+			aggregatedTokens.append(tokens.popleft())
 		else:
 			needsValue = False
 
 			# Get value
 			quantity = '1'
 			try:
-				float(tokens[0])
-				quantity = tokens.pop(0)
+				if tokens[0] != UC_Common.PLACEHOLDER: float(tokens[0])
+				quantity = tokens.popleft()
 			except:
 				# Inject multiplication where needed
 				if aggregatedTokens and aggregatedTokens[-1] == UC_Common.BRACKET_SHUT:
@@ -258,7 +302,7 @@ def aggregateQuantities(tokens):
 			# Get unit
 			unit = []
 			if tokens and isinstance(tokens[0], list):
-				unit = tokens.pop(0)
+				unit = tokens.popleft()
 
 			aggregatedTokens.append((quantity, unit))
 	if needsValue and aggregatedTokens: raise UC_Common.UnitError(f"Expected float; no tokens received")
@@ -266,54 +310,58 @@ def aggregateQuantities(tokens):
 	return aggregatedTokens
 
 def aggregate(tokens):
+	# Each stage produces a new list, so it can be consumed in constant time per token
 	tokens = aggregateSign(tokens)
-	tokens = aggregateUnits(tokens)
-	tokens = aggregateQuantities(tokens)
+	tokens = aggregateUnits(UC_Utils.TokenStream(tokens))
+	tokens = aggregateQuantities(UC_Utils.TokenStream(tokens))
 	return tokens
 
 def parseUnit(tokens):
 	tokens = convertToRPN(tokens)
 
 	stack = []
-	for token in tokens:
-		if token == UC_Common.OPERATOR_ADD:
-			a = stack.pop()
-			if not isinstance(a, int): raise UC_Common.UnitError(f"Expected int; received '{a}'")
-			b = stack.pop()
-			if not isinstance(b, int): raise UC_Common.UnitError(f"Expected int; received '{b}'")
-			stack.append(b + a)
-		elif token == UC_Common.OPERATOR_SUB:
-			a = stack.pop()
-			if not isinstance(a, int): raise UC_Common.UnitError(f"Expected int; received '{a}'")
-			b = stack.pop()
-			if not isinstance(b, int): raise UC_Common.UnitError(f"Expected int; received '{b}'")
-			stack.append(b - a)
-		elif token == UC_Common.OPERATOR_MUL:
-			a = stack.pop()
-			if not isinstance(a, dict): a = {a: 1}
-			b = stack.pop()
-			if not isinstance(b, dict): b = {b: 1}
-			for sym, exp in b.items():
-				if sym not in a: a[sym] = 0
-				a[sym] += exp
-			stack.append(a)
-		elif token == UC_Common.OPERATOR_DIV:
-			a = stack.pop()
-			if not isinstance(a, dict): a = {a: 1}
-			b = stack.pop()
-			if not isinstance(b, dict): b = {b: 1}
-			for sym, exp in a.items():
-				if sym not in b: b[sym] = 0
-				b[sym] -= exp
-			stack.append(b)
-		elif token == UC_Common.OPERATOR_EXP:
-			a = stack.pop()
-			b = stack.pop()
-			if not isinstance(a, int): raise UC_Common.UnitError(f"Expected int; received '{a}'")
-			stack.append({b: a})
-		else:
-			if UC_Utils.isInt(token): stack.append(int(token))
-			else: stack.append(token)
+	# Operators without enough operands leave the stack empty
+	try:
+		for token in tokens:
+			if token == UC_Common.OPERATOR_ADD:
+				a = stack.pop()
+				if not isinstance(a, int): raise UC_Common.UnitError(f"Expected int; received '{a}'")
+				b = stack.pop()
+				if not isinstance(b, int): raise UC_Common.UnitError(f"Expected int; received '{b}'")
+				stack.append(b + a)
+			elif token == UC_Common.OPERATOR_SUB:
+				a = stack.pop()
+				if not isinstance(a, int): raise UC_Common.UnitError(f"Expected int; received '{a}'")
+				b = stack.pop()
+				if not isinstance(b, int): raise UC_Common.UnitError(f"Expected int; received '{b}'")
+				stack.append(b - a)
+			elif token == UC_Common.OPERATOR_MUL:
+				a = stack.pop()
+				if not isinstance(a, dict): a = {a: 1}
+				b = stack.pop()
+				if not isinstance(b, dict): b = {b: 1}
+				for sym, exp in b.items():
+					if sym not in a: a[sym] = 0
+					a[sym] += exp
+				stack.append(a)
+			elif token == UC_Common.OPERATOR_DIV:
+				a = stack.pop()
+				if not isinstance(a, dict): a = {a: 1}
+				b = stack.pop()
+				if not isinstance(b, dict): b = {b: 1}
+				for sym, exp in a.items():
+					if sym not in b: b[sym] = 0
+					b[sym] -= exp
+				stack.append(b)
+			elif token == UC_Common.OPERATOR_EXP:
+				a = stack.pop()
+				b = stack.pop()
+				if not isinstance(a, int): raise UC_Common.UnitError(f"Expected int; received '{a}'")
+				stack.append({b: a})
+			else:
+				if UC_Utils.isInt(token): stack.append(int(token))
+				else: stack.append(token)
+	except IndexError: raise UC_Common.UnitError("Invalid expression")
 
 	# Aggregate into a single map
 	units = {}
@@ -329,45 +377,131 @@ def parseUnit(tokens):
 		else: raise UC_Common.UnitError("Invalid expression")
 	return units
 
-def parseExpr(tokens):
+def parseExpr(tokens, numberType = Decimal):
 	stack = []
-	for token in tokens:
-		if token == UC_Common.OPERATOR_ADD:
-			a = stack.pop()
-			b = stack.pop()
-			stack.append(UC_AST.AST_Add(b, a))
-		elif token == UC_Common.OPERATOR_SUB:
-			a = stack.pop()
-			b = stack.pop()
-			stack.append(UC_AST.AST_Sub(b, a))
-		elif token == UC_Common.OPERATOR_MUL:
-			a = stack.pop()
-			b = stack.pop()
-			stack.append(UC_AST.AST_Mul(b, a))
-		elif token == UC_Common.OPERATOR_DIV:
-			a = stack.pop()
-			b = stack.pop()
-			stack.append(UC_AST.AST_Div(b, a))
-		elif token == UC_Common.OPERATOR_EXP:
-			a = stack.pop()
-			b = stack.pop()
-			stack.append(UC_AST.AST_Exp(b, a))
-		elif token == UC_Common.OPERATOR_EQL:
-			a = stack.pop()
-			b = stack.pop()
-			stack.append(UC_AST.AST_Eql(b, a))
-		else:
-			valStr, unitTokens = token
-			val = Decimal(valStr)
-			baseUnits = UC_Unit.Unit(baseUnits = parseUnit(unitTokens)).reduce()
-			unit = UC_Unit.Unit(baseUnits = baseUnits)
-			stack.append(UC_Unit.Quantity(val, unit))
-	if not stack: return UC_Unit.Quantity(1, UC_Unit.Unit())
+	# Operators without enough operands leave the stack empty
+	try:
+		for token in tokens:
+			if token == UC_Common.OPERATOR_ADD:
+				a = stack.pop()
+				b = stack.pop()
+				stack.append(UC_AST.AST_Add(b, a))
+			elif token == UC_Common.OPERATOR_SUB:
+				a = stack.pop()
+				b = stack.pop()
+				stack.append(UC_AST.AST_Sub(b, a))
+			elif token == UC_Common.OPERATOR_MUL:
+				a = stack.pop()
+				b = stack.pop()
+				stack.append(UC_AST.AST_Mul(b, a))
+			elif token == UC_Common.OPERATOR_DIV:
+				a = stack.pop()
+				b = stack.pop()
+				stack.append(UC_AST.AST_Div(b, a))
+			elif token == UC_Common.OPERATOR_EXP:
+				a = stack.pop()
+				b = stack.pop()
+				stack.append(UC_AST.AST_Exp(b, a))
+			elif token == UC_Common.OPERATOR_EQL:
+				a = stack.pop()
+				b = stack.pop()
+				stack.append(UC_AST.AST_Eql(b, a))
+			else:
+				valStr, unitTokens = token
+				baseUnits = UC_Unit.Unit(baseUnits = parseUnit(unitTokens)).reduce()
+				unit = UC_Unit.Unit(baseUnits = baseUnits)
+				if valStr == UC_Common.PLACEHOLDER: stack.append(UC_AST.AST_Placeholder(unit))
+				else: stack.append(UC_Unit.Quantity(UC_Utils.toNumber(valStr, numberType), unit))
+	except IndexError: raise UC_Common.UnitError("Invalid expression")
+
+	if not stack: return UC_Unit.Quantity(UC_Utils.toNumber(1, numberType), UC_Unit.Unit())
 	if len(stack) != 1: raise UC_Common.UnitError("Invalid expression")
 	return stack[0]
 
-def parse(string):
+def parse(string, numberType = Decimal):
+	"""
+	Convert a string into an AST
+	@param string: the string to parse
+	@param numberType: the numeric type of magnitudes - Decimal, float, or Fraction, matching the convertor
+	@return the AST
+	"""
+	if UC_Metrics.enabled: return parseTimed(string, numberType)
 	tokens = tokenize(string)
-	tokens = aggregate(tokens)
+	tokens = aggregate(UC_Utils.TokenStream(tokens))
 	tokens = convertToRPN(tokens)
-	return parseExpr(tokens)
\ No newline at end of file
+	return parseExpr(tokens, numberType)
+
+def parseTimed(string, numberType = Decimal):
+	"""
+	Convert a string into an AST, recording the time taken by each stage
+	@param string: the string to parse
+	@param numberType: the numeric type of magnitudes - Decimal, float, or Fraction, matching the convertor
+	@return the AST
+	"""
+	UC_Metrics.increment("parses")
+	stopwatch = UC_Metrics.Stopwatch("parse")
+	tokens = tokenize(string)
+	stopwatch.lap("tokenize")
+	tokens = aggregate(UC_Utils.TokenStream(tokens))
+	stopwatch.lap("aggregate")
+	tokens = convertToRPN(tokens)
+	stopwatch.lap("rpn")
+	ast = parseExpr(tokens, numberType)
+	stopwatch.lap("parse_expr")
+	stopwatch.stop()
+	return ast
+
+def parseCached(string, numberType = Decimal):
+	"""
+	Parse a string, reusing the AST from a previous call with the same string
+	ASTs are not modified by evaluation, so a cached AST can be evaluated any number of times
+	@param string: the string to parse
+	@param numberType: the numeric type of magnitudes - Decimal, float, or Fraction, matching the convertor
+	@return the AST
+	"""
+	key = (string, numberType)
+	ast = parseCache.get(key)
+	if ast is None:
+		ast = parse(string, numberType)
+		parseCache.put(key, ast)
+	return ast
+
+def parseSimplified(string, numberType = Decimal):
+	"""
+	Parse a string for repeated evaluation, reusing the AST from a previous call with the same string
+	The AST is simplified for the convertor it is evaluated with, and simplified again when the convertor's definitions change
+	@param string: the string to parse
+	@param numberType: the numeric type of magnitudes - Decimal, float, or Fraction, matching the convertor
+	@return the AST
+	"""
+	key = (string, numberType, True)
+	ast = parseCache.get(key)
+	if ast is None:
+		ast = UC_AST.AST_Simplified(parseCached(string, numberType))
+		parseCache.put(key, ast)
+	return ast
+
+def compile(string, numberType = Decimal):
+	"""
+	Parse a string and compile it for repeated evaluation
+	The expression is lowered into a flat stack machine program for the convertor it is evaluated with, so
+	evaluating it neither recurses nor calls a method per node
+	@param string: the string to parse
+	@param numberType: the numeric type of magnitudes - Decimal, float, or Fraction, matching the convertor
+	@return the compiled expression, which is evaluated with evaluate(convertor, value = None)
+	"""
+	return UC_Compiler.CompiledExpression(parseCached(string, numberType))
+
+def setParseCacheCapacity(capacity):
+	"""
+	Replace the parsed expression cache with an empty cache of the given size
+	@param capacity: the maximum number of ASTs to cache - a capacity of 0 disables caching
+	"""
+	global parseCache
+	parseCache = UC_Cache.LRUCache(capacity)
+
+def clearParseCache():
+	"""
+	Discard all cached ASTs
+	"""
+	parseCache.clear()
\ No newline at end of file
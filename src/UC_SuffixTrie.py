@@ -0,0 +1,125 @@
+import src.UC_Common as UC_Common
+
+# Key marking the end of a symbol within a trie node
+TERMINAL = None
+
+# Maximum number of resolved splits to cache - the cache is cleared once full, which only costs recomputing splits
+SPLIT_CAPACITY = 1 << 12
+
+class SuffixTrie:
+	"""
+	Index of unit symbols stored in reverse, for finding the longest symbol which is a suffix of a string
+	Lookups depend on the length of the string rather than the number of indexed symbols
+	"""
+	def __init__(self, syms = (), splitCapacity = SPLIT_CAPACITY):
+		"""
+		SuffixTrie constructor
+		@param syms: the symbols to index
+		@param splitCapacity: the maximum number of resolved splits to cache
+		"""
+		self.root = {}
+		self.size = 0
+		self.splits = {}
+		self.splitCapacity = splitCapacity
+		for sym in syms: self.add(sym)
+
+	def __len__(self):
+		return self.size
+
+	def __contains__(self, sym):
+		node = self.findNode(sym)
+		return node is not None and TERMINAL in node
+
+	def findNode(self, string):
+		"""
+		Find the node reached by walking the reversed string from the root
+		@param string: the string to walk
+		@return the node, or None if no indexed symbol ends with the string
+		"""
+		node = self.root
+		for char in reversed(string):
+			node = node.get(char)
+			if node is None: return None
+		return node
+
+	def add(self, sym):
+		"""
+		Add a symbol to the index
+		@param sym: the symbol to add
+		"""
+		node = self.root
+		for char in reversed(sym):
+			if char not in node: node[char] = {}
+			node = node[char]
+		if TERMINAL not in node:
+			node[TERMINAL] = sym
+			self.size += 1
+			self.splits.clear()
+
+	def remove(self, sym):
+		"""
+		Remove a symbol from the index
+		@param sym: the symbol to remove
+		"""
+		path = [self.root]
+		for char in reversed(sym):
+			node = path[-1].get(char)
+			if node is None: return
+			path.append(node)
+		if TERMINAL not in path[-1]: return
+		del path[-1][TERMINAL]
+		self.size -= 1
+		self.splits.clear()
+
+		# Prune nodes which no longer lead to any symbol
+		for depth in range(len(sym), 0, -1):
+			if path[depth]: break
+			del path[depth - 1][sym[len(sym) - depth]]
+
+	def endingWith(self, suffix):
+		"""
+		Find all indexed symbols which end with a suffix
+		@param suffix: the suffix to search for
+		@return a list of the matching symbols, including the suffix itself if it is indexed
+		"""
+		node = self.findNode(suffix)
+		if node is None: return []
+
+		syms = []
+		nodes = [node]
+		while nodes:
+			node = nodes.pop()
+			for char, child in node.items():
+				if char is TERMINAL: syms.append(child)
+				else: nodes.append(child)
+		return syms
+
+	def longestSuffix(self, string):
+		"""
+		Find the longest indexed symbol which is a suffix of a string
+		@param string: the string to search
+		@return the longest matching symbol, or an empty string if there is none
+		"""
+		longestSuffix = ""
+		node = self.root
+		for char in reversed(string):
+			node = node.get(char)
+			if node is None: break
+			if TERMINAL in node: longestSuffix = node[TERMINAL]
+		return longestSuffix
+
+	def stripPrefix(self, string):
+		"""
+		Split a string into a prefix and the longest indexed symbol which it ends with
+		@param string: the string to split
+		@return the prefix and the symbol
+		"""
+		split = self.splits.get(string)
+		if split is not None: return split
+
+		longestSuffix = self.longestSuffix(string)
+		if len(longestSuffix) == 0: raise UC_Common.UnitError(f"Invalid unit: received '{string}'")
+		split = (string[0:len(string)-len(longestSuffix)], longestSuffix)
+		if len(self.splits) >= self.splitCapacity: self.splits.clear()
+		self.splits[string] = split
+		return split
\ No newline at end of file
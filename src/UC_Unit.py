@@ -1,6 +1,87 @@
+from types import MappingProxyType
 import src.UC_Common as UC_Common
 
+# Units keyed on their symbol and base units, so that identical units share one object
+# The table is cleared once full, which only costs sharing since units are compared by value
+INTERN_CAPACITY = 1 << 16
+internedUnits = {}
+
+def internKey(sym, baseUnits):
+	# Exponents which compare equal may still be displayed differently (e.g. Decimal 2 and 2.0), so
+	# only integer exponents are keyed on their value alone
+	items = tuple(baseUnits.items())
+	for baseSym, exp in items:
+		if type(exp) is not int:
+			return (sym, tuple((baseSym, exp) if type(exp) is int else (baseSym, type(exp), str(exp)) for baseSym, exp in items))
+	return (sym, items)
+
+# Products and quotients of pairs of units, keyed on the identities of the operands
+# Each entry keeps its operands alive, so their identities cannot be reused while it is cached
+MEMO_CAPACITY = 1 << 14
+unitProducts = {}
+unitQuotients = {}
+
+def memoize(table, left, right, function):
+	key = (id(left), id(right))
+	entry = table.get(key)
+	if entry is not None: return entry[2]
+	result = function(left, right)
+	if len(table) >= MEMO_CAPACITY: table.clear()
+	table[key] = (left, right, result)
+	return result
+
+def multiply(left, right):
+	units = dict(left.reduced if left.sym else left.baseUnits)
+	for sym, exp in right.reduced.items(): units[sym] = units.get(sym, 0) + exp
+	return Unit(baseUnits = {sym: exp for sym, exp in units.items() if exp != 0})
+
+def divide(left, right):
+	units = dict(left.reduced if left.sym else left.baseUnits)
+	for sym, exp in right.reduced.items(): units[sym] = units.get(sym, 0) - exp
+	return Unit(baseUnits = {sym: exp for sym, exp in units.items() if exp != 0})
+
 class Unit:
+	"""
+	An immutable unit, either a named unit or a product of powers of units
+	Identical units are interned, and each unit precomputes its reduced form and a sorted key, so units can be
+	compared and hashed quickly and used as map keys
+	"""
+	__slots__ = ("sym", "baseUnits", "reduced", "key", "hash")
+
+	def __new__(cls, sym: str = None, baseUnits: dict = None):
+		"""
+		Unit constructor
+		@param sym: The symbol for the unit
+		@param baseUnits: The base units for the derived unit
+		"""
+		if baseUnits is None: baseUnits = {}
+		elif sym == None and len(baseUnits) == 1:
+			(baseSym, exp), = baseUnits.items()
+			if exp == 1: sym, baseUnits = baseSym, {}
+
+		key = internKey(sym, baseUnits)
+		unit = internedUnits.get(key)
+		if unit is not None: return unit
+
+		# Copy the base units, so that the unit is unaffected by changes to the map it was constructed from
+		baseUnits = dict(baseUnits)
+		unit = super().__new__(cls)
+		reduced = {sym: 1} if sym != None else {baseSym: exp for baseSym, exp in baseUnits.items() if exp != 0}
+		setField = object.__setattr__
+		setField(unit, "sym", sym)
+		setField(unit, "baseUnits", MappingProxyType(baseUnits))
+		setField(unit, "reduced", MappingProxyType(reduced))
+		setField(unit, "key", tuple(sorted(reduced.items())))
+		setField(unit, "hash", hash(unit.key))
+		if len(internedUnits) >= INTERN_CAPACITY: internedUnits.clear()
+		return internedUnits.setdefault(key, unit)
+
+	def __setattr__(self, name, value):
+		raise AttributeError(f"Cannot set '{name}': units are immutable")
+
+	def __delattr__(self, name):
+		raise AttributeError(f"Cannot delete '{name}': units are immutable")
+
 	def isBaseUnit(self):
 		return self.sym != None and len(self.baseUnits) == 0
 
@@ -8,34 +89,11 @@ class Unit:
 		return len(self.baseUnits) > 0
 
 	def reduce(self):
-		tmp1 = {}
-		if self.sym != None:
-			tmp1[self.sym] = 1
-		else:
-			for sym, exp in self.baseUnits.items():
-				if sym in tmp1:
-					tmp1[sym] += exp
-				else:
-					tmp1[sym] = exp
-		
-		tmp2 = {}
-		for sym, exp in tmp1.items():
-			if tmp1[sym] != 0:
-				tmp2[sym] = exp
-		
-		return tmp2
-
-	def __init__(self, sym: str = None, baseUnits: dict = {}):
 		"""
-		Unit constructor
-		@param sym: The symbol for the unit
-		@param baseUnits: The base units for the derived unit
+		Get the unit as a map of symbols to non-zero exponents
+		@return a read-only map of unit symbols to exponents
 		"""
-		self.sym = sym
-		self.baseUnits = baseUnits
-		if sym == None and len(baseUnits) == 1 and [*baseUnits.values()][0] == 1:
-			self.sym = [*baseUnits.keys()][0]
-			self.baseUnits = {}
+		return self.reduced
 
 	def __str__(self, showDefinition = False):
 		if (showDefinition and self.baseUnits) or not self.sym:
@@ -45,57 +103,25 @@ class Unit:
 			return outStr.strip()
 		return self.sym
 
+	def __repr__(self):
+		return f"Unit({self.sym!r}, {dict(self.baseUnits)!r})"
+
 	def __eq__(self, other):
-		if other is None: return False
-		if self.sym and self.sym == other.sym: return True
-		selfUnits = self.reduce()
-		otherUnits = other.reduce()
-		if len(selfUnits) != len(otherUnits): return False
-		for	sym, exp in selfUnits.items():
-			if (not sym in otherUnits) or (exp != otherUnits[sym]):
-				return False
-		return True
+		if self is other: return True
+		if not isinstance(other, Unit): return NotImplemented
+		return self.hash == other.hash and self.key == other.key
 
 	def __ne__(self, other):
 		return not (self == other)
 
-	def __mul__(self, other):
-		units = {}
+	def __hash__(self):
+		return self.hash
 
-		if self.sym:
-			units[self.sym] = 1
-		else:
-			for unit, exp in self.baseUnits.items():
-				units[unit] = exp
-		
-		if other.sym:
-			if not (other.sym in units): units[other.sym] = 0
-			units[other.sym] += 1
-		else:
-			for unit, exp in other.baseUnits.items():
-				if not (unit in units): units[unit] = 0
-				units[unit] += exp
-
-		return Unit(baseUnits = Unit(baseUnits = units).reduce())
+	def __mul__(self, other):
+		return memoize(unitProducts, self, other, multiply)
 
 	def __truediv__(self, other):
-		units = {}
-
-		if self.sym:
-			units[self.sym] = 1
-		else:
-			for unit, exp in self.baseUnits.items():
-				units[unit] = exp
-
-		if other.sym:
-			if not (other.sym in units): units[other.sym] = 0
-			units[other.sym] -= 1
-		else:
-			for unit, exp in other.baseUnits.items():
-				if not (unit in units): units[unit] = 0
-				units[unit] -= exp
-
-		return Unit(baseUnits = Unit(baseUnits = units).reduce())
+		return memoize(unitQuotients, self, other, divide)
 
 	def __pow__(self, power):
 		if self.sym: return Unit(baseUnits = {self.sym: power})
@@ -105,13 +131,29 @@ class Unit:
 		return Unit(baseUnits = units)
 
 	def clone(self):
-		return Unit(self.sym, self.baseUnits.copy())
+		# Units are immutable, so they can be shared rather than copied
+		return self
+
+	def __copy__(self):
+		return self
+
+	def __deepcopy__(self, memo):
+		return self
+
+	def __reduce__(self):
+		return (Unit, (self.sym, dict(self.baseUnits)))
 
 class Quantity:
+	"""
+	A magnitude with a unit
+	Arithmetic shares units between quantities rather than copying them, since units are immutable
+	"""
+	__slots__ = ("value", "unit")
+
 	def __init__(self, value: float, unit: Unit):
 		self.value = value
 		self.unit  = unit
-	
+
 	def __str__(self):
 		unitStr = str(self.unit)
 		if unitStr: return f'{self.value} {unitStr}'
@@ -121,16 +163,19 @@ class Quantity:
 		if other is None: return False
 		return self.value == other.value and self.unit == other.unit
 
+	def __repr__(self):
+		return f"Quantity({self.value!r}, {self.unit!r})"
+
 	def __ne__(self, other):
 		return not (self == other)
 
 	def __add__(self, other):
-		if self.unit != other.unit: raise UC_Common.UnitError('Incompatible units')
-		return Quantity(self.value + other.value, self.unit.clone())
+		if not self.unit == other.unit: raise UC_Common.UnitError('Incompatible units')
+		return Quantity(self.value + other.value, self.unit)
 
 	def __sub__(self, other):
-		if self.unit != other.unit: raise UC_Common.UnitError('Incompatible units')
-		return Quantity(self.value - other.value, self.unit.clone())
+		if not self.unit == other.unit: raise UC_Common.UnitError('Incompatible units')
+		return Quantity(self.value - other.value, self.unit)
 
 	def __mul__(self, other):
 		return Quantity(self.value * other.value, self.unit * other.unit)
@@ -142,4 +187,8 @@ class Quantity:
 		if other.unit.reduce(): raise UC_Common.UnitError(f"Cannot exponentiate with unit '{str(other.unit)}'")
 		return Quantity(self.value ** other.value, self.unit ** other.value)
 	
-	def evaluate(self, convertor): return self
\ No newline at end of file
+	def evaluate(self, convertor): return Quantity(self.value, self.unit)
+
+	def compileNumeric(self, convertor, number):
+		value = number(self.value)
+		return self.unit, lambda placeholderValue: value
\ No newline at end of file
@@ -1,5 +1,9 @@
+from collections import deque
 from decimal import Decimal
+from fractions import Fraction
 import src.UC_Common as UC_Common
+import src.UC_Metrics as UC_Metrics
+import src.UC_SuffixTrie as UC_SuffixTrie
 
 def isValidSymbol(sym):
 	"""
@@ -80,34 +84,137 @@ def hasHigherPrecedence(operatorA, operatorB):
 	precedenceB, associativityB = UC_Common.operatorPrecedences[operatorB]
 	return (precedenceA > precedenceB) or (precedenceA == precedenceB and associativityB == 1)
 
-def peekNextToken(tokens: list = []):
+class TokenStream:
+	"""
+	Queue of tokens which are consumed from the front in constant time
+	Tokens are drawn lazily from any iterable, so a stream may be fed by a generator
+	"""
+	END = object()
+
+	def __init__(self, tokens = ()):
+		"""
+		TokenStream constructor
+		@param tokens: an iterable of tokens
+		"""
+		self.tokens = iter(tokens)
+		self.lookahead = deque()
+
+	def __bool__(self):
+		return self.fill(1)
+
+	def __getitem__(self, index):
+		if not self.fill(index + 1): raise IndexError("Token stream index out of range")
+		return self.lookahead[index]
+
+	def fill(self, count):
+		"""
+		Buffer tokens until a number of tokens can be peeked
+		@param count: the number of tokens to buffer
+		@return True if enough tokens remain, False otherwise
+		"""
+		while len(self.lookahead) < count:
+			token = next(self.tokens, TokenStream.END)
+			if token is TokenStream.END: return False
+			self.lookahead.append(token)
+		return True
+
+	def popleft(self):
+		"""
+		Remove the next token from the stream
+		@return the next token
+		"""
+		if not self.fill(1): raise IndexError("Pop from empty token stream")
+		return self.lookahead.popleft()
+
+class ListTokenStream(TokenStream):
+	"""
+	Stream which consumes tokens from the front of a caller's list, so that the list holds the remaining tokens
+	Removing from the front of a list takes linear time, so long inputs should be wrapped in a TokenStream instead
+	"""
+	def __init__(self, tokens):
+		"""
+		ListTokenStream constructor
+		@param tokens: the list of tokens to consume
+		"""
+		self.tokens = tokens
+
+	def __bool__(self):
+		return bool(self.tokens)
+
+	def __getitem__(self, index):
+		if index >= len(self.tokens): raise IndexError("Token stream index out of range")
+		return self.tokens[index]
+
+	def fill(self, count):
+		return len(self.tokens) >= count
+
+	def popleft(self):
+		if not self.tokens: raise IndexError("Pop from empty token stream")
+		return self.tokens.pop(0)
+
+def toTokenStream(tokens):
+	"""
+	Wrap tokens in a stream unless they are already in one
+	Lists are consumed in place, as they were before token streams were introduced
+	@param tokens: a list, an iterable of tokens, or a TokenStream
+	@return a TokenStream of the tokens
+	"""
+	if isinstance(tokens, TokenStream): return tokens
+	if isinstance(tokens, list): return ListTokenStream(tokens)
+	return TokenStream(tokens)
+
+def peekNextToken(tokens: TokenStream):
 	"""
 	Get the next token without removing it from the queue
-	@param tokens: a list of tokens
+	@param tokens: a stream of tokens
 	@return the next token
 	"""
 
+	tokens = toTokenStream(tokens)
 	if not tokens: raise UC_Common.UnitError(f"Expected token; none received")
 	return tokens[0]
 
-def getNextToken(tokens: list = [], expectedToken = None):
+def getNextToken(tokens: TokenStream, expectedToken = None):
 	"""
 	Get the next token and remove it from the queue
-	@param tokens: a list of tokens
+	@param tokens: a stream of tokens
 	@param expectedToken: the expected token - an error is thrown if the next token
 	does not equal the expected token
 	@return the next token
 	"""
 
+	tokens = toTokenStream(tokens)
 	if not tokens: raise UC_Common.UnitError(f"Expected token; none received")
-	token = tokens.pop(0)
+	token = tokens.popleft()
 	if expectedToken and token != expectedToken: raise UC_Common.UnitError(f"Expected '{expectedToken}'; received '{token}'")
 	return token
 
+def toDecimal(value):
+	"""
+	Convert a number to a Decimal, using the shortest representation of floats
+	@param value: the number to convert
+	@return the number as a Decimal
+	"""
+	if isinstance(value, Decimal): return value
+	if isinstance(value, Fraction): return Decimal(value.numerator) / Decimal(value.denominator)
+	return Decimal(str(value))
+
+def toNumber(value, numberType = Decimal):
+	"""
+	Convert a number or numeric string to a numeric type
+	@param value: the number or string to convert
+	@param numberType: the numeric type to convert to - Decimal, float, or Fraction
+	@return the converted number
+	"""
+	if isinstance(value, numberType): return value
+	if numberType is Decimal: return toDecimal(value)
+	if numberType is Fraction and isinstance(value, float): return Fraction(str(value))
+	return numberType(value)
+
 def parseFloat(tokens):
 	"""
 	Get the next token as a float and remove it from the queue
-	@param tokens: a list of tokens
+	@param tokens: a stream of tokens
 	@return the next token as a float
 	"""
 	scaleFactorStr = getNextToken(tokens)
@@ -118,7 +225,7 @@ def parseFloat(tokens):
 def parseInt(tokens):
 	"""
 	Get the next token as an int and remove it from the queue
-	@param tokens: a list of tokens
+	@param tokens: a stream of tokens
 	@return the next token as an int
 	"""
 	scaleFactorStr = getNextToken(tokens)
@@ -129,7 +236,7 @@ def parseInt(tokens):
 def parseSymbol(tokens):
 	"""
 	Get the next token as a unit symbol and remove it from the queue
-	@param tokens: a list of tokens
+	@param tokens: a stream of tokens
 	@return the next token as a unit symbol
 	"""
 	sym = getNextToken(tokens)
@@ -139,6 +246,7 @@ def parseSymbol(tokens):
 
 def stripPrefix(units, string):
 	# Find longest matching suffix
+	# Callers which strip prefixes repeatedly should use a UC_SuffixTrie.SuffixTrie instead
 	longestSuffix = ""
 	for sym in units.keys():
 		if string.endswith(sym) and len(sym) > len(longestSuffix):
@@ -148,38 +256,50 @@ def stripPrefix(units, string):
 	if len(longestSuffix) == 0: raise UC_Common.UnitError(f"Invalid unit: received '{string}'")
 	return string[0:len(string)-len(longestSuffix)], longestSuffix
 
-# Topological sort implemented using DFS
-def topologicalSortVisit(units: dict, unit: str, sortedValues: list, permVisited: set, tempVisited: set):
+# Topological sort implemented using an iterative DFS
+def topologicalSortVisit(units: dict, unit: str, sortedValues: list, permVisited: set, tempVisited: set, symbolIndex):
+	# Units are appended to sortedValues after all of their dependencies
 	if unit in permVisited: return
 	if unit in tempVisited: raise UC_Common.UnitError(f"Dependency cycle detected for unit '{unit}'")
 	tempVisited[unit] = True
 
-	for baseUnit in units[unit].baseUnits.keys():
-		prefix, sym = stripPrefix(units, baseUnit)
-		topologicalSortVisit(units, sym, sortedValues, permVisited, tempVisited)
-
-	del tempVisited[unit]
-	permVisited[unit] = True
-
-	sortedValues.insert(0, unit)
+	# Keep the remaining dependencies of each unit on the path being explored
+	stack = [(unit, iter(units[unit].baseUnits.keys()))]
+	while stack:
+		current, dependencies = stack[-1]
+		for baseUnit in dependencies:
+			prefix, sym = symbolIndex.stripPrefix(baseUnit)
+			if sym in permVisited: continue
+			if sym in tempVisited: raise UC_Common.UnitError(f"Dependency cycle detected for unit '{sym}'")
+			tempVisited[sym] = True
+			stack.append((sym, iter(units[sym].baseUnits.keys())))
+			break
+		else:
+			stack.pop()
+			del tempVisited[current]
+			permVisited[current] = True
+			sortedValues.append(current)
 
 # Perform a topological sort over the conversions
-def topologicalSort(units: dict, toSort: list = None):
+def topologicalSort(units: dict, toSort: list = None, symbolIndex = None):
+	if UC_Metrics.enabled: UC_Metrics.increment("topological_sorts")
+	if symbolIndex is None: symbolIndex = UC_SuffixTrie.SuffixTrie(units.keys())
 	sortedValues = []
 	permVisited = {}
 	tempVisited = {}
 
-	# Sort the entire graph
+	# Sort the entire graph, with each unit before its dependencies
 	for unit in ([*units.keys()] if toSort == None else toSort):
-		prefix, sym = stripPrefix(units, unit)
+		prefix, sym = symbolIndex.stripPrefix(unit)
 		if sym not in permVisited:
-			topologicalSortVisit(units, sym, sortedValues, permVisited, tempVisited)
+			topologicalSortVisit(units, sym, sortedValues, permVisited, tempVisited, symbolIndex)
+	sortedValues.reverse()
 	if toSort == None: return sortedValues
 
 	# Generate a filter from the desired values
 	desiredValues = {}
 	for unit in toSort:
-		prefix, sym = stripPrefix(units, unit)
+		prefix, sym = symbolIndex.stripPrefix(unit)
 		if sym not in desiredValues: desiredValues[sym] = []
 		desiredValues[sym].append(prefix)
 
@@ -191,17 +311,46 @@ def topologicalSort(units: dict, toSort: list = None):
 
 	return filteredValues
 
-def validate(units, conversions, prefixes):
+def validateDependencies(dependencies, units, prefixes, symbolIndex):
+	"""
+	Ensure that unit references resolve to defined units and prefixes
+	@param dependencies: the (possibly prefixed) unit symbols to check
+	@param units: a map of unit symbols to unit objects
+	@param prefixes: a map of prefixes to exponents
+	@param symbolIndex: an index of the unit symbols, used to strip prefixes
+	"""
+	for baseUnit in dependencies:
+		prefix, sym = symbolIndex.stripPrefix(baseUnit)
+		if sym not in units: raise UC_Common.UnitError(f"Invalid unit symbol: '{sym}'")
+		if prefix and (prefix not in prefixes): raise UC_Common.UnitError(f"Invalid prefix: '{prefix}'")
+
+def validateAcyclic(unit, units, symbolIndex):
+	"""
+	Ensure that no chain of dependencies leads from a unit back to itself
+	Only the units reachable from the given unit are visited
+	@param unit: the unit symbol to check
+	@param units: a map of unit symbols to unit objects
+	@param symbolIndex: an index of the unit symbols, used to strip prefixes
+	"""
+	visited = set()
+	toVisit = [*units[unit].baseUnits.keys()]
+	while toVisit:
+		prefix, sym = symbolIndex.stripPrefix(toVisit.pop())
+		if sym == unit: raise UC_Common.UnitError(f"Dependency cycle detected for unit '{unit}'")
+		if sym not in visited:
+			visited.add(sym)
+			toVisit.extend(units[sym].baseUnits.keys())
+
+def validate(units, conversions, prefixes, symbolIndex = None):
+	if symbolIndex is None: symbolIndex = UC_SuffixTrie.SuffixTrie(units.keys())
+
 	# Ensure that all units and dependencies are defined
 	for unit in units.values():
-		for baseUnit in unit.baseUnits.keys():
-			prefix, sym = stripPrefix(units, baseUnit)
-			if sym not in units: raise UC_Common.UnitError(f"Invalid unit symbol: '{sym}'")
-			if prefix and (prefix not in prefixes): raise UC_Common.UnitError(f"Invalid prefix: '{prefix}'")
+		validateDependencies(unit.baseUnits.keys(), units, prefixes, symbolIndex)
 	
 	# Ensure that all conversion units are defined
 	for unit in conversions.keys():
 		if unit not in units: raise UC_Common.UnitError(f"No unit defined for conversion from: '{unit}'")
 	
 	# Ensure that there are no cycles in the dependency graph
-	topologicalSort(units)
\ No newline at end of file
+	topologicalSort(units, symbolIndex = symbolIndex)
@@ -1,10 +1,22 @@
 import tst.UCT_AST as UCT_AST
+import tst.UCT_Batch as UCT_Batch
+import tst.UCT_Cache as UCT_Cache
+import tst.UCT_Compiler as UCT_Compiler
 import tst.UCT_FileIO as UCT_FileIO
+import tst.UCT_Metrics as UCT_Metrics
+import tst.UCT_Snapshot as UCT_Snapshot
 import tst.UCT_StrParser as UCT_StrParser
+import tst.UCT_SuffixTrie as UCT_SuffixTrie
 import tst.UCT_Unit as UCT_Unit
 
 if (__name__ == "__main__"):
 	UCT_Unit.main()
 	UCT_AST.main()
 	UCT_StrParser.main()
-	UCT_FileIO.main()
\ No newline at end of file
+	UCT_FileIO.main()
+	UCT_SuffixTrie.main()
+	UCT_Cache.main()
+	UCT_Batch.main()
+	UCT_Snapshot.main()
+	UCT_Metrics.main()
+	UCT_Compiler.main()
\ No newline at end of file
@@ -1,3 +1,6 @@
+from concurrent.futures import ThreadPoolExecutor
+from fractions import Fraction
+import random
 from src.UC_AST import *
 from src.UC_Unit import *
 from src.UC_Convertor import *
@@ -79,6 +82,393 @@ def test_conversion(verbose = False):
 
 	return test_result
 
+def test_compiled_units(verbose = False):
+	test_result = 0
+
+	units = {
+		"m": Unit("m"),
+		"two_m": Unit("two_m", {"m": Decimal(1)}),
+		"four_m": Unit("four_m", {"two_m": Decimal(1)}),
+	}
+	conversions = {"two_m": Decimal(2), "four_m": Decimal(2)}
+	prefixes = {"c": (Decimal(10), Decimal(-2))}
+	convertor = Convertor(units, conversions, prefixes)
+
+	# Test that units are compiled to irreducible units
+	test_result += conversion_expect(Unit("four_m"), Unit("m"), 4, convertor, verbose)
+	if convertor.compileUnit("four_m") != (4, {"m": 1}):
+		test_result += test_fail(f"Received '{convertor.compileUnit('four_m')}'; expected '(4, {{'m': 1}})'", verbose)
+
+	# Test that compiled units are discarded when a dependency is redefined
+	convertor.delUnit("two_m")
+	test_result += conversion_expect(Unit("four_m"), Unit("m"), None, convertor, verbose)
+	convertor.addUnit("two_m", Decimal(3), Unit("m"))
+	convertor.addUnit("four_m", Decimal(2), Unit("two_m"))
+	test_result += conversion_expect(Unit("four_m"), Unit("m"), 6, convertor, verbose)
+
+	# Test that compiled units are discarded when a new unit shadows a dependency
+	convertor.addUnit("cm_unit", Decimal(1), Unit("cm"))
+	test_result += conversion_expect(Unit("cm_unit"), Unit("m"), Decimal("0.01"), convertor, verbose)
+	convertor.addUnit("cm", Decimal(5), Unit("m"))
+	test_result += conversion_expect(Unit("cm_unit"), Unit("m"), 5, convertor, verbose)
+
+	return test_result
+
+def add_expect(convertor, sym, unit, success, verbose):
+	units = convertor.units.copy()
+	try:
+		convertor.addUnit(sym, Decimal(2), unit)
+		if not success: return test_fail(f"Added unit '{sym}'; expected error", verbose)
+	except UC_Common.UnitError as err:
+		if success: return test_fail(f"Failed to add unit '{sym}': {err}", verbose)
+		if convertor.units != units or sym in convertor.symbolIndex: return test_fail(f"Failed addition of '{sym}' modified definitions", verbose)
+	return 0
+
+def test_validation(verbose = False):
+	test_result = 0
+
+	units = {
+		"m": Unit("m"),
+		"v": Unit("v", {"m": 1}),
+		"w": Unit("w", {"kv": 1}),
+		"x": Unit("x", {"dam": 1}),
+	}
+	conversions = {"v": Decimal(2), "w": Decimal(2), "x": Decimal(2)}
+	prefixes = {"k": (Decimal(10), Decimal(3)), "da": (Decimal(10), Decimal(1))}
+	convertor = Convertor(units, conversions, prefixes)
+
+	# Test that invalid dependencies are rejected
+	test_result += add_expect(convertor, "a", Unit("s"), False, verbose)
+	test_result += add_expect(convertor, "a", Unit("Mm"), False, verbose)
+	test_result += add_expect(convertor, "a", Unit("a"), False, verbose)
+
+	# Test that definitions which change how existing references resolve are checked
+	test_result += add_expect(convertor, "kv", Unit("w"), False, verbose)
+	test_result += add_expect(convertor, "am", Unit("m"), False, verbose)
+	test_result += add_expect(convertor, "kv", Unit("m"), True, verbose)
+	test_result += conversion_expect(Unit("w"), Unit("m"), 4, convertor, verbose)
+	test_result += add_expect(convertor, "a", Unit("Mw"), False, verbose)
+	convertor.addPrefix("M", Decimal(10), Decimal(6))
+	test_result += add_expect(convertor, "a", Unit("Mw"), True, verbose)
+
+	# Test that incremental validation agrees with validating all definitions
+	generator = random.Random(0)
+	syms = ["m", "km", "dm", "kdm", "d", "kd", "a", "ka"]
+	convertor = Convertor({"m": Unit("m")}, {}, {"k": (Decimal(10), Decimal(3)), "d": (Decimal(10), Decimal(-1))})
+	for i in range(200):
+		sym = generator.choice(syms)
+		if sym in convertor.units: continue
+		unit = Unit(baseUnits = {dependencySym: 1 for dependencySym in generator.sample(syms, 2)})
+		units = convertor.units.copy()
+		units[sym] = Unit(sym, unit.reduce())
+		try:
+			UC_Utils.validate(units, {}, convertor.prefixes)
+			success = True
+		except UC_Common.UnitError: success = False
+		test_result += add_expect(convertor, sym, unit, success, verbose)
+
+	return test_result
+
+def findDependentsNaively(convertor, syms, prefix = None):
+	# Repeatedly scan every definition for dependencies on the found units
+	found = set()
+	foundDependentUnit = True
+	while foundDependentUnit:
+		foundDependentUnit = False
+		for sym, unit in convertor.units.items():
+			if sym in found: continue
+			for dependencySym in unit.baseUnits.keys():
+				dependencyPrefix, baseSym = convertor.stripPrefix(dependencySym)
+				if baseSym in syms or baseSym in found or (prefix and dependencyPrefix == prefix):
+					found.add(sym)
+					foundDependentUnit = True
+					break
+	return found
+
+def test_dependents(verbose = False):
+	test_result = 0
+
+	units = {
+		"m": Unit("m"),
+		"s": Unit("s"),
+		"ft": Unit("ft", {"m": 1}),
+		"yd": Unit("yd", {"ft": 1}),
+		"kph": Unit("kph", {"km": 1, "s": -1}),
+		"mps": Unit("mps", {"m": 1, "s": -1}),
+	}
+	conversions = {"ft": Decimal("0.3048"), "yd": Decimal(3), "kph": Decimal(1), "mps": Decimal(1)}
+	prefixes = {"k": (Decimal(10), Decimal(3)), "c": (Decimal(10), Decimal(-2))}
+	convertor = Convertor(units, conversions, prefixes)
+
+	# Test direct dependents of units and prefixes
+	for sym, expected in [("m", {"ft", "kph", "mps"}), ("s", {"kph", "mps"}), ("yd", set())]:
+		if convertor.dependents(sym) != expected: test_result += test_fail(f"Received dependents {convertor.dependents(sym)} of '{sym}'; expected {expected}", verbose)
+	if convertor.prefixDependents("k") != {"kph"}: test_result += test_fail(f"Received dependents {convertor.prefixDependents('k')} of prefix 'k'", verbose)
+	if convertor.findDependents(["m"]) != {"ft", "yd", "kph", "mps"}: test_result += test_fail("Incorrect transitive dependents of 'm'", verbose)
+
+	# Test that dependents follow references when a new unit shadows them
+	convertor.addUnit("km", Decimal(1000), Unit("m"))
+	if convertor.dependents("km") != {"kph"} or convertor.prefixDependents("k"): test_result += test_fail("Dependents were not updated for shadowing unit", verbose)
+	test_result += conversion_expect(Unit("kph"), Unit("mps"), Decimal(1000), convertor, verbose)
+
+	# Test cascading deletes of units and prefixes
+	if convertor.delUnit("ft") != {"ft", "yd"}: test_result += test_fail("Incorrect units deleted with 'ft'", verbose)
+	convertor.addUnit("cft", Decimal(1), Unit("cm"))
+	if convertor.delPrefix("c") != {"cft"}: test_result += test_fail("Incorrect units deleted with prefix 'c'", verbose)
+	if convertor.dependents("m") != {"km", "mps"}: test_result += test_fail(f"Received dependents {convertor.dependents('m')} of 'm' after deletion", verbose)
+
+	# Test that dependents agree with scanning every definition
+	generator = random.Random(1)
+	convertor = Convertor({"m": Unit("m")}, {}, {"k": (Decimal(10), Decimal(3)), "c": (Decimal(10), Decimal(-2))})
+	for i in range(200):
+		sym = "".join(generator.choice("abckm") for j in range(generator.randint(1, 3)))
+		dependencies = [generator.choice(["", "k", "c"]) + generator.choice([*convertor.units]) for j in range(2)]
+		try: convertor.addUnit(sym, Decimal(2), Unit(baseUnits = {dependencySym: 1 for dependencySym in dependencies}))
+		except UC_Common.UnitError: pass
+	for sym in convertor.units:
+		if convertor.findDependents([sym]) != findDependentsNaively(convertor, {sym}):
+			test_result += test_fail(f"Incorrect transitive dependents of '{sym}'", verbose)
+	for prefix in convertor.prefixes:
+		direct = convertor.prefixDependents(prefix)
+		if direct | convertor.findDependents(direct) != findDependentsNaively(convertor, set(), prefix):
+			test_result += test_fail(f"Incorrect transitive dependents of prefix '{prefix}'", verbose)
+
+	return test_result
+
+def test_ranks(verbose = False):
+	test_result = 0
+
+	units = {
+		"m": Unit("m"),
+		"s": Unit("s"),
+		"ft": Unit("ft", {"m": 1}),
+		"yd": Unit("yd", {"ft": 1}),
+		"ydps": Unit("ydps", {"yd": 1, "s": -1}),
+	}
+	conversions = {"ft": Decimal("0.3048"), "yd": Decimal(3), "ydps": Decimal(1)}
+	prefixes = {"k": (Decimal(10), Decimal(3))}
+	convertor = Convertor(units, conversions, prefixes)
+
+	# Test that units are ranked above their dependencies
+	expected = {"m": 0, "s": 0, "ft": 1, "yd": 2, "ydps": 3}
+	if convertor.ranks != expected: test_result += test_fail(f"Received ranks {convertor.ranks}; expected {expected}", verbose)
+
+	# Test that ranks are updated when dependencies change
+	convertor.addUnit("kyd", Decimal(1), Unit("ydps"))
+	convertor.addUnit("mi", Decimal(1), Unit("kyd"))
+	convertor.addUnit("ft_s", Decimal(1), Unit("ft"))
+	convertor.addUnit("ks", Decimal(1), Unit("mi"))
+	expected.update({"kyd": 4, "mi": 5, "ft_s": 2, "ks": 6})
+	if convertor.ranks != expected: test_result += test_fail(f"Received ranks {convertor.ranks}; expected {expected}", verbose)
+	convertor.delUnit("yd")
+	for sym in ["yd", "ydps", "kyd", "mi", "ks"]: expected.pop(sym)
+	if convertor.ranks != expected: test_result += test_fail(f"Received ranks {convertor.ranks}; expected {expected}", verbose)
+
+	# Test that long chains of units are validated and compiled without recursion
+	size = 5000
+	syms = ["u" + "".join(chr(ord('a') + int(digit)) for digit in str(i)) for i in range(size)]
+	with convertor.transaction() as transaction:
+		transaction.addUnit(syms[0], Decimal(2), Unit("m"))
+		for i in range(1, size): transaction.addUnit(syms[i], Decimal(1), Unit(syms[i - 1]))
+	if convertor.ranks[syms[-1]] != size: test_result += test_fail(f"Received rank {convertor.ranks[syms[-1]]}; expected {size}", verbose)
+	test_result += conversion_expect(Unit(syms[-1]), Unit("km"), Decimal("0.002"), convertor, verbose)
+	UC_Utils.validate(convertor.units, convertor.conversions, convertor.prefixes)
+
+	# Test that chains of units added one at a time are ranked and compiled
+	chain = [sym + "_" for sym in syms]
+	convertor.addUnit(chain[0], Decimal(3), Unit("m"))
+	for i in range(1, size): convertor.addUnit(chain[i], Decimal(1), Unit(chain[i - 1]))
+	if convertor.ranks[chain[-1]] != size: test_result += test_fail(f"Received rank {convertor.ranks[chain[-1]]}; expected {size}", verbose)
+	test_result += conversion_expect(Unit(chain[-1]), Unit("km"), Decimal("0.003"), convertor, verbose)
+	test_result += add_expect(convertor, "a", Unit(chain[-1]), True, verbose)
+
+	return test_result
+
+def explanation_expect(left, right, convertor, verbose):
+	# Compare the explained scale factor against the converted scale factor
+	explanation = convertor.explain(left, right)
+	try: expected = convertor.convert(left, right)
+	except UC_Common.UnitError:
+		if explanation.error is None: return test_fail(f"Explained '{left}' to '{right}'; expected error", verbose)
+		return 0
+	if explanation.error is not None: return test_fail(f"Received error '{explanation.error}'; expected '{expected}'", verbose)
+	if explanation.scaleFactor != expected: return test_fail(f"Received '{explanation.scaleFactor}'; expected '{expected}'", verbose)
+	return 0
+
+def test_explain(verbose = False):
+	test_result = 0
+
+	units = {
+		"m": Unit("m"),
+		"s": Unit("s"),
+		"ft": Unit("ft", {"m": 1}),
+		"yd": Unit("yd", {"ft": 1}),
+		"ydps": Unit("ydps", {"yd": 1, "s": -1}),
+		"Hz": Unit("Hz", {"s": -1}),
+	}
+	conversions = {"ft": Decimal("0.3048"), "yd": Decimal(3), "ydps": Decimal(1), "Hz": Decimal(1)}
+	prefixes = {"k": (Decimal(10), Decimal(3))}
+	convertor = Convertor(units, conversions, prefixes)
+
+	# Test that explained conversions agree with direct conversions
+	test_result += explanation_expect(Unit("ydps"), Unit(baseUnits = {"km": 1, "s": -1}), convertor, verbose)
+	test_result += explanation_expect(Unit(baseUnits = {"kyd": 2}), Unit(baseUnits = {"m": 2}), convertor, verbose)
+	test_result += explanation_expect(Unit(baseUnits = {"ydps": 1, "s": 1}), Unit("ft"), convertor, verbose)
+	test_result += explanation_expect(Unit(baseUnits = {"Hz": 1, "s": 1}), Unit(), convertor, verbose)
+	test_result += explanation_expect(Unit("ydps"), Unit("m"), convertor, verbose)
+	test_result += explanation_expect(Unit("mi"), Unit("m"), convertor, verbose)
+
+	# Test that each reduction step is recorded
+	explanation = convertor.explain(Unit("kyd"), Unit("m"))
+	descriptions = [description for depth, description, scaleFactor, elapsed in explanation.steps]
+	for expected in ["strip prefix 'k' from kyd", "reduce yd to ft", "reduce ft to m", "m is irreducible"]:
+		if expected not in descriptions: test_result += test_fail(f"Missing step '{expected}' in {descriptions}", verbose)
+	if explanation.getDepth() != 3: test_result += test_fail(f"Received depth {explanation.getDepth()}; expected 3", verbose)
+	if "Result: 1 kyd = 914.4000 m" not in str(explanation): test_result += test_fail(f"Received '{str(explanation)}'", verbose)
+
+	# Test that cancelled units are recorded
+	explanation = convertor.explain(Unit(baseUnits = {"Hz": 1, "s": 1}), Unit())
+	if "cancel s" not in [description for depth, description, scaleFactor, elapsed in explanation.steps]:
+		test_result += test_fail(f"Missing cancelled unit in '{str(explanation)}'", verbose)
+
+	return test_result
+
+def test_transaction(verbose = False):
+	test_result = 0
+
+	units = {
+		"m": Unit("m"),
+		"ft": Unit("ft", {"m": 1}),
+	}
+	conversions = {"ft": Decimal("0.3048")}
+	prefixes = {"k": (Decimal(10), Decimal(3))}
+	convertor = Convertor(units, conversions, prefixes)
+	test_result += conversion_expect(Unit("ft"), Unit("m"), Decimal("0.3048"), convertor, verbose)
+
+	# Test that staged changes are applied together when the block exits
+	with convertor.transaction() as transaction:
+		transaction.addUnit("yd", Decimal(3), Unit("ft"))
+		transaction.addUnit("mi", Decimal(1760), Unit("yd"))
+		transaction.addUnit("league", Decimal(3), Unit("kmi"))
+		transaction.delUnit("ft")
+		transaction.addUnit("fathom", Decimal(2), Unit("yd"))
+		transaction.addUnit("ft", Decimal("0.5"), Unit("m"))
+		transaction.addUnit("yd", Decimal(3), Unit("ft"))
+		transaction.addPrefix("M", Decimal(10), Decimal(6))
+		if "ft" not in convertor.units or "yd" in convertor.units:
+			test_result += test_fail("Staged changes were applied before commit", verbose)
+	test_result += conversion_expect(Unit("ft"), Unit("m"), Decimal("0.5"), convertor, verbose)
+	test_result += conversion_expect(Unit("fathom"), Unit("m"), Decimal(3), convertor, verbose)
+	test_result += conversion_expect(Unit("yd"), Unit("Mm"), Decimal("1.5E-6"), convertor, verbose)
+	if "mi" in convertor.units or "league" in convertor.units:
+		test_result += test_fail("Dependents of deleted unit were not deleted", verbose)
+
+	# Test that committed transactions cannot stage further changes
+	before = (convertor.units.copy(), convertor.conversions.copy(), convertor.prefixes.copy())
+	for change in [
+		lambda: transaction.addUnit("bad", Decimal(1), Unit("nonexistent")),
+		lambda: transaction.addPrefix("G", Decimal(10), Decimal(9)),
+		lambda: transaction.delUnit("ft"),
+		lambda: transaction.delPrefix("M"),
+		transaction.commit,
+	]:
+		try:
+			change()
+			test_result += test_fail("Changed a committed transaction", verbose)
+		except UC_Common.UnitError: pass
+	if (convertor.units, convertor.conversions, convertor.prefixes) != before:
+		test_result += test_fail("Committed transaction modified definitions", verbose)
+	test_result += conversion_expect(Unit("ft"), Unit("m"), Decimal("0.5"), convertor, verbose)
+
+	# Test that invalid transactions leave the convertor unchanged
+	before = (convertor.units.copy(), convertor.conversions.copy(), convertor.prefixes.copy())
+	try:
+		with convertor.transaction() as transaction:
+			transaction.addUnit("a", Decimal(2), Unit("b"))
+			transaction.addUnit("b", Decimal(2), Unit("a"))
+			transaction.delPrefix("M")
+		test_result += test_fail("Committed cyclic definitions", verbose)
+	except UC_Common.UnitError: pass
+	try:
+		with convertor.transaction() as transaction:
+			transaction.addUnit("a", Decimal(2), Unit("m"))
+			raise ValueError()
+	except ValueError: pass
+	if (convertor.units, convertor.conversions, convertor.prefixes) != before:
+		test_result += test_fail("Failed transaction modified definitions", verbose)
+	test_result += conversion_expect(Unit("yd"), Unit("Mm"), Decimal("1.5E-6"), convertor, verbose)
+
+	# Test that transactions are not committed over changes made after they started
+	transaction = convertor.transaction()
+	transaction.addUnit("a", Decimal(2), Unit("m"))
+	convertor.addUnit("b", Decimal(3), Unit("m"))
+	try:
+		transaction.commit()
+		test_result += test_fail("Committed a transaction over concurrent changes", verbose)
+	except UC_Common.UnitError: pass
+	if "a" in convertor.units or "b" not in convertor.units:
+		test_result += test_fail("Conflicting transaction modified definitions", verbose)
+
+	return test_result
+
+def test_compiled_conversions(verbose = False):
+	test_result = 0
+
+	units = {
+		"m": Unit("m"),
+		"s": Unit("s"),
+		"ft": Unit("ft", {"m": Decimal(1)}),
+	}
+	conversions = {"ft": Decimal("0.3048")}
+	prefixes = {"k": (Decimal(10), Decimal(3))}
+	convertor = Convertor(units, conversions, prefixes)
+
+	# Test Decimal conversions
+	conversion = convertor.compile(Unit("ft"), Unit("km"))
+	for value, expected in [(1, Decimal("0.0003048")), (Decimal("2.5"), Decimal("0.000762")), (0.5, Decimal("0.0001524"))]:
+		result = conversion(value)
+		if result != expected or not isinstance(result, Decimal):
+			test_result += test_fail(f"Received '{result}'; expected '{expected}'", verbose)
+
+	# Test float conversions
+	conversion = convertor.compile(Unit(baseUnits = {"km": 1, "s": -1}), Unit(baseUnits = {"m": 1, "s": -1}), True)
+	result = conversion(Decimal("1.5"))
+	if result != 1500.0 or not isinstance(result, float):
+		test_result += test_fail(f"Received '{result}'; expected '1500.0'", verbose)
+
+	# Test that incompatible units fail to compile
+	try:
+		convertor.compile(Unit("ft"), Unit("s"))
+		test_result += test_fail("Compiled conversion between incompatible units", verbose)
+	except UC_Common.UnitError: pass
+
+	return test_result
+
+def test_number_types(verbose = False):
+	test_result = 0
+
+	units = {
+		"m": Unit("m"),
+		"ft": Unit("ft", {"m": Decimal(1)}),
+		"square_ft": Unit("square_ft", {"ft": Decimal(2)}),
+	}
+	conversions = {"ft": Decimal("0.3048"), "square_ft": Decimal(1)}
+	prefixes = {"c": (Decimal(10), Decimal(-2))}
+
+	# Test that scale factors are computed using the selected numeric type
+	expected = {
+		Decimal: Decimal("929.0304"),
+		float: 0.3048 ** 2 * 1e4,
+		Fraction: Fraction(1161288, 1250),
+	}
+	for numberType, scaleFactor in expected.items():
+		convertor = Convertor(units, conversions, prefixes, numberType = numberType)
+		result = convertor.convert(Unit("square_ft"), Unit(baseUnits = {"cm": 2}))
+		if not isinstance(result, numberType) or abs(result - scaleFactor) > 1e-9:
+			test_result += test_fail(f"Received '{result}'; expected {numberType.__name__} '{scaleFactor}'", verbose)
+
+	return test_result
+
 def ast_expect(ast, expected, convertor, verbose):
 	if expected == None:
 		try:
@@ -165,11 +555,148 @@ def test_ast(verbose = False):
 
 	return test_result
 
+def test_reentrancy(verbose = False):
+	test_result = 0
+
+	units = {
+		"m": Unit("m"),
+		"two_m": Unit("two_m", {"m": Decimal(1)}),
+	}
+	convertors = [
+		Convertor(units, {"two_m": Decimal(2)}, {"c": (Decimal(10), Decimal(-2))}),
+		Convertor(units, {"two_m": Decimal(4)}, {"c": (Decimal(10), Decimal(-2))}),
+	]
+	leaf = Quantity(1, Unit("two_m"))
+	ast = AST_Eql(
+		AST_Sub(AST_Add(leaf, Quantity(1, Unit("m"))), Quantity(1, Unit("cm"))),
+		Quantity(1, Unit("m"))
+	)
+	expected = [
+		Quantity(Decimal("2.99"), Unit("m")),
+		Quantity(Decimal("4.99"), Unit("m")),
+	]
+
+	# Test that evaluation does not modify the tree
+	for i in range(3):
+		for convertor, quantity in zip(convertors, expected):
+			result = ast.evaluate(convertor)
+			if result != quantity: test_result += test_fail(f"Received '{result}'; expected '{quantity}'", verbose)
+	if leaf != Quantity(1, Unit("two_m")): test_result += test_fail(f"Leaf was modified to '{leaf}'", verbose)
+	if leaf.evaluate(convertors[0]) is leaf: test_result += test_fail("Leaf returned itself as its result", verbose)
+
+	# Test concurrent evaluation against different convertors
+	with ThreadPoolExecutor(8) as executor:
+		results = [*executor.map(lambda i: ast.evaluate(convertors[i % 2]), range(200))]
+	for i, result in enumerate(results):
+		if result != expected[i % 2]:
+			test_result += test_fail(f"Received '{result}' from concurrent evaluation; expected '{expected[i % 2]}'", verbose)
+			break
+
+	return test_result
+
+def test_simplify(verbose = False):
+	test_result = 0
+
+	units = {
+		"m": Unit("m"),
+		"s": Unit("s"),
+		"two_m": Unit("two_m", {"m": Decimal(1)}),
+	}
+	convertor = Convertor(units, {"two_m": Decimal(2)}, {"c": (Decimal(10), Decimal(-2))})
+	placeholder = AST_Placeholder(Unit("two_m"))
+	asts = [
+		AST_Eql(AST_Add(Quantity(Decimal(1), Unit("two_m")), Quantity(Decimal(50), Unit("cm"))), Quantity(Decimal(1), Unit("m"))),
+		AST_Mul(AST_Mul(Quantity(Decimal(2), Unit("m")), Quantity(Decimal(3), Unit("s"))), Quantity(Decimal(4), Unit("m"))),
+		AST_Div(Quantity(Decimal(1), Unit("m")), AST_Sub(Quantity(Decimal(1), Unit("s")), Quantity(Decimal(1), Unit("s")))),
+		AST_Add(Quantity(Decimal(1), Unit("m")), Quantity(Decimal(1), Unit("s"))),
+		AST_Eql(AST_Mul(AST_Mul(Quantity(Decimal(2), Unit()), placeholder), Quantity(Decimal(3), Unit())), Quantity(Decimal(1), Unit("m"))),
+	]
+
+	# Test that simplified trees evaluate to the same results and errors as the original trees
+	for ast in asts:
+		simplified = simplify(ast, convertor)
+		try: expected = ast.evaluate(convertor)
+		except (UC_Common.UnitError, ArithmeticError) as err: expected = type(err)
+		try: result = simplified.evaluate(convertor)
+		except (UC_Common.UnitError, ArithmeticError) as err: result = type(err)
+		if result != expected: test_result += test_fail(f"Simplified '{ast}' to '{simplified}', which evaluates to '{result}'; expected '{expected}'", verbose)
+
+	# Test that constant subtrees are folded and conversion factors are resolved
+	simplified = simplify(asts[0], convertor)
+	if not isinstance(simplified, Quantity): test_result += test_fail(f"Received '{simplified}'; expected a quantity", verbose)
+	simplified = simplify(asts[4], convertor)
+	if not isinstance(simplified, AST_Converted) or simplified.scaleFactor != 2:
+		test_result += test_fail(f"Received '{simplified}'; expected a resolved conversion", verbose)
+	elif not isinstance(simplified.left, AST_Product) or simplified.left.factors != [placeholder]:
+		test_result += test_fail(f"Received '{simplified.left}'; expected a product with one placeholder", verbose)
+
+	# Test that compiled simplified trees match compiled original trees
+	unit, function = asts[4].compileNumeric(convertor, Decimal)
+	simplifiedUnit, simplifiedFunction = simplify(asts[4], convertor).compileNumeric(convertor, Decimal)
+	if (simplifiedUnit, simplifiedFunction(Decimal(5))) != (unit, function(Decimal(5))):
+		test_result += test_fail(f"Received '{simplifiedFunction(Decimal(5))} {simplifiedUnit}'; expected '{function(Decimal(5))} {unit}'", verbose)
+
+	# Test that simplified trees are simplified again when definitions change
+	ast = AST_Simplified(AST_Eql(Quantity(Decimal(3), Unit("two_m")), Quantity(Decimal(1), Unit("m"))))
+	for conversion, expected in [(Decimal(2), Decimal(6)), (Decimal(4), Decimal(12))]:
+		if "two_m" in convertor.units: convertor.delUnit("two_m")
+		convertor.addUnit("two_m", conversion, Unit("m"))
+		result = ast.evaluate(convertor)
+		if result != Quantity(expected, Unit("m")): test_result += test_fail(f"Received '{result}'; expected '{expected} m'", verbose)
+	other = Convertor(units, {"two_m": Decimal(2)}, {})
+	result = ast.evaluate(other)
+	if result != Quantity(Decimal(6), Unit("m")): test_result += test_fail(f"Received '{result}' from another convertor; expected '6 m'", verbose)
+	if str(ast) != str(ast.root): test_result += test_fail(f"Received '{ast}'; expected '{ast.root}'", verbose)
+
+	# Test that deep trees are simplified without recursion
+	ast = Quantity(Decimal(1), Unit("m"))
+	for i in range(10000): ast = AST_Add(ast, Quantity(Decimal(1), Unit("cm")))
+	result = simplify(ast, convertor)
+	if result != Quantity(Decimal(100) + 10000, Unit("cm")): test_result += test_fail(f"Received '{result}'; expected '10100 cm'", verbose)
+
+	return test_result
+
+def test_isolation(verbose = False):
+	test_result = 0
+
+	units = {"m": Unit("m")}
+	conversions = {}
+	prefixes = {"k": (Decimal(10), Decimal(3))}
+	convertors = [Convertor(units, conversions, prefixes), Convertor(units, conversions, prefixes)]
+
+	# Test that convertors built on the same maps do not see each other's changes
+	convertors[0].addUnit("two_m", Decimal(2), Unit("m"))
+	convertors[0].addPrefix("c", Decimal(10), Decimal(-2))
+	if units != {"m": Unit("m")} or conversions or len(prefixes) != 1:
+		test_result += test_fail("Adding definitions modified the caller's maps", verbose)
+	if "two_m" in convertors[1].units or "c" in convertors[1].prefixes:
+		test_result += test_fail("Adding definitions modified another convertor", verbose)
+	test_result += conversion_expect(Unit("two_m"), Unit("m"), 2, convertors[0], verbose)
+	test_result += conversion_expect(Unit("two_m"), Unit("m"), None, convertors[1], verbose)
+	convertors[1].addUnit("two_m", Decimal(4), Unit("m"))
+	test_result += conversion_expect(Unit("two_m"), Unit("km"), Decimal("0.002"), convertors[0], verbose)
+	test_result += conversion_expect(Unit("two_m"), Unit("km"), Decimal("0.004"), convertors[1], verbose)
+	convertors[0].delUnit("two_m")
+	test_result += conversion_expect(Unit("two_m"), Unit("m"), 4, convertors[1], verbose)
+
+	return test_result
+
 def main():
 	# Run tests
 	verbose = True
 	print(f"test_conversion: {test_conversion(verbose)} tests failed")
+	print(f"test_compiled_units: {test_compiled_units(verbose)} tests failed")
+	print(f"test_validation: {test_validation(verbose)} tests failed")
+	print(f"test_dependents: {test_dependents(verbose)} tests failed")
+	print(f"test_ranks: {test_ranks(verbose)} tests failed")
+	print(f"test_explain: {test_explain(verbose)} tests failed")
+	print(f"test_transaction: {test_transaction(verbose)} tests failed")
+	print(f"test_compiled_conversions: {test_compiled_conversions(verbose)} tests failed")
+	print(f"test_number_types: {test_number_types(verbose)} tests failed")
 	print(f"test_ast: {test_ast(verbose)} tests failed")
+	print(f"test_reentrancy: {test_reentrancy(verbose)} tests failed")
+	print(f"test_isolation: {test_isolation(verbose)} tests failed")
+	print(f"test_simplify: {test_simplify(verbose)} tests failed")
 
 if (__name__ == "__main__"):
 	main()
\ No newline at end of file
@@ -0,0 +1,242 @@
+import array
+from decimal import Decimal
+import io
+import json
+import operator
+import src.UC_Batch as UC_Batch
+import src.UC_Common as UC_Common
+import src.UC_Convertor as UC_Convertor
+import src.UC_StrParser as UC_StrParser
+import src.UC_Unit as UC_Unit
+
+def test_fail(msg, verbose):
+	if verbose: print(f"Test failed: {msg}")
+	return 1
+
+def batch_expect(string, values, convertor, verbose):
+	# Compare batch evaluation against evaluating each value separately
+	try: batch = UC_Batch.BatchExpression(string, convertor)
+	except Exception as err: return test_fail(f"Failed to compile '{string}': {err}", verbose)
+	results = batch.evaluate(values)
+	for value, result in zip(values, results):
+		expected = UC_StrParser.parse(string.replace("?", f"({value})")).evaluate(convertor)
+		if UC_Unit.Quantity(result, batch.unit) != expected:
+			return test_fail(f"Received '{result} {batch.unit}' for '{string}' with {value}; expected '{expected}'", verbose)
+	return 0
+
+def batch_error_expect(string, convertor, verbose):
+	try:
+		UC_Batch.BatchExpression(string, convertor)
+		return test_fail(f"Compiled '{string}'; expected error", verbose)
+	except: return 0
+
+def test_batch(verbose = False):
+	test_result = 0
+	units = {
+		"m": UC_Unit.Unit("m"),
+		"s": UC_Unit.Unit("s"),
+		"ft": UC_Unit.Unit("ft", {"m": 1}),
+		"inch": UC_Unit.Unit("inch", {"ft": 1}),
+	}
+	conversions = {"ft": Decimal("0.3048"), "inch": Decimal(1) / Decimal(12)}
+	prefixes = {"k": (Decimal(10), Decimal(3))}
+	convertor = UC_Convertor.Convertor(units, conversions, prefixes)
+	values = [0, 1, Decimal("2.5"), -3, 1e3]
+
+	# Test expressions with placeholders
+	test_result += batch_expect("? ft : m", values, convertor, verbose)
+	test_result += batch_expect("?ft:m", values, convertor, verbose)
+	test_result += batch_expect("-? km / 2 s : m / s", values, convertor, verbose)
+	test_result += batch_expect("? ft + 6 inch - ? m : inch", values, convertor, verbose)
+	test_result += batch_expect("(? ft)^2 : m^2", values, convertor, verbose)
+	test_result += batch_expect("1 m + 2 m", values, convertor, verbose)
+
+	# Test expressions which cannot be compiled
+	test_result += batch_error_expect("? ft : s", convertor, verbose)
+	test_result += batch_error_expect("2^(? m)", convertor, verbose)
+	test_result += batch_error_expect("1 m ^ ?", convertor, verbose)
+
+	# Test that placeholders cannot be evaluated without values
+	try:
+		UC_StrParser.parse("? ft").evaluate(convertor)
+		test_result += test_fail("Evaluated placeholder without a value", verbose)
+	except: pass
+
+	# Test element-wise evaluation of NumPy arrays
+	if UC_Batch.numpy is not None:
+		batch = UC_Batch.BatchExpression("? ft : m", convertor)
+		results = batch.evaluate(UC_Batch.numpy.array([1, 2, 3]))
+		if not UC_Batch.numpy.allclose(results, [0.3048, 0.6096, 0.9144]):
+			test_result += test_fail(f"Received {results}; expected [0.3048 0.6096 0.9144]", verbose)
+		results = UC_Batch.BatchExpression("1 ft : m", convertor).evaluate(UC_Batch.numpy.zeros(2))
+		if results.shape != (2,): test_result += test_fail(f"Received shape {results.shape}; expected (2,)", verbose)
+
+	return test_result
+
+def test_evaluate_lines(verbose = False):
+	test_result = 0
+	units = {
+		"m": UC_Unit.Unit("m"),
+		"s": UC_Unit.Unit("s"),
+		"ft": UC_Unit.Unit("ft", {"m": 1}),
+	}
+	conversions = {"ft": Decimal("0.3048")}
+	prefixes = {"k": (Decimal(10), Decimal(3))}
+	convertor = UC_Convertor.Convertor(units, conversions, prefixes)
+	lines = ["1 ft : m\n", "\n", "1 m : s\n", "((1\n", "1 / 0\n", "  2 km : m  \n", "m )\n", "m ^\n"]
+	expected = [
+		(1, "1 ft : m", "0.3048 m", None),
+		(3, "1 m : s", None, "Invalid conversion: m to s"),
+		(4, "((1", None, "Detected mismatched parentheses: '('"),
+		(5, "1 / 0", None, "DivisionByZero"),
+		(6, "2 km : m", "2000 m", None),
+		(7, "m )", None, "Detected mismatched parentheses: ')'"),
+		(8, "m ^", None, "Invalid expression"),
+	]
+
+	# Test that each line is evaluated separately, in order, with errors reported per line
+	for workers in [1, 3]:
+		results = [*UC_Batch.evaluateLines(lines, convertor, workers)]
+		if results != expected: test_result += test_fail(f"Received {results} with {workers} workers; expected {expected}", verbose)
+
+	# Test that results are kept in order when evaluated in many chunks
+	lines = [f"{i} km : m" if i % 3 else "1 m : s" for i in range(3 * UC_Batch.CHUNK_SIZE)]
+	sequential = [*UC_Batch.evaluateLines(lines, convertor)]
+	concurrent = [*UC_Batch.evaluateLines(lines, convertor, 4)]
+	if sequential != concurrent: test_result += test_fail("Received different results from concurrent evaluation", verbose)
+
+	# Test CSV and JSONL output
+	file = io.StringIO()
+	count = UC_Batch.writeResults(expected, file, "csv")
+	if count != (7, 5): test_result += test_fail(f"Received counts {count}; expected (7, 5)", verbose)
+	rows = file.getvalue().splitlines()
+	if rows[0] != "line,expression,result,error" or rows[2] != "3,1 m : s,,Invalid conversion: m to s":
+		test_result += test_fail(f"Received CSV rows {rows}", verbose)
+	file = io.StringIO()
+	UC_Batch.writeResults(expected, file, "jsonl")
+	records = [json.loads(line) for line in file.getvalue().splitlines()]
+	if records[0] != {"line": 1, "expression": "1 ft : m", "result": "0.3048 m", "error": None}:
+		test_result += test_fail(f"Received JSON record {records[0]}", verbose)
+	try:
+		UC_Batch.writeResults(expected, io.StringIO(), "xml")
+		test_result += test_fail("Wrote results in unknown format", verbose)
+	except ValueError: pass
+
+	return test_result
+
+def array_expect(result, values, unit, verbose):
+	if not isinstance(result, UC_Batch.QuantityArray): return test_fail(f"Received '{result}'; expected an array", verbose)
+	if result.unit != unit or [round(value, 9) for value in result.values] != values:
+		return test_fail(f"Received '{result}'; expected '{UC_Batch.QuantityArray(values, unit)}'", verbose)
+	return 0
+
+def test_quantity_array(verbose = False):
+	test_result = 0
+	units = {
+		"m": UC_Unit.Unit("m"),
+		"s": UC_Unit.Unit("s"),
+		"ft": UC_Unit.Unit("ft", {"m": 1}),
+	}
+	convertor = UC_Convertor.Convertor(units, {"ft": Decimal("0.3048")}, {"k": (Decimal(10), Decimal(3))})
+	unit_m, unit_s = UC_Unit.Unit("m"), UC_Unit.Unit("s")
+
+	for useNumpy in [False, True] if UC_Batch.numpy is not None else [False]:
+		a = UC_Batch.QuantityArray([1, 2, 3], unit_m, useNumpy)
+		b = UC_Batch.QuantityArray([4, 5, 6], unit_m, useNumpy)
+		if useNumpy != UC_Batch.isNumpyArray(a.values): test_result += test_fail(f"Received buffer {type(a.values)}", verbose)
+
+		# Test element-wise arithmetic and broadcasting of scalars
+		test_result += array_expect(a + b, [5, 7, 9], unit_m, verbose)
+		test_result += array_expect(b - a, [3, 3, 3], unit_m, verbose)
+		test_result += array_expect(a * b, [4, 10, 18], unit_m * unit_m, verbose)
+		test_result += array_expect(b / a, [4, 2.5, 2], UC_Unit.Unit(), verbose)
+		test_result += array_expect(a / UC_Unit.Quantity(Decimal(2), unit_s), [0.5, 1, 1.5], unit_m / unit_s, verbose)
+		test_result += array_expect(a + UC_Unit.Quantity(1, unit_m), [2, 3, 4], unit_m, verbose)
+		test_result += array_expect(a ** UC_Unit.Quantity(Decimal(2), UC_Unit.Unit()), [1, 4, 9], unit_m ** Decimal(2), verbose)
+		test_result += array_expect(2 * a, [2, 4, 6], unit_m, verbose)
+		test_result += array_expect(6 / a, [6, 3, 2], UC_Unit.Unit() / unit_m, verbose)
+		test_result += array_expect(UC_Batch.QuantityArray([4, 9], None, useNumpy) ** UC_Batch.QuantityArray([0.5, 2], None, useNumpy), [2, 81], UC_Unit.Unit(), verbose)
+
+		# Test conversion
+		test_result += array_expect(UC_Batch.QuantityArray([1, 10], UC_Unit.Unit("ft"), useNumpy).to(UC_Unit.Unit("km"), convertor), [0.0003048, 0.003048], UC_Unit.Unit("km"), verbose)
+		if a[1] != UC_Unit.Quantity(2, unit_m): test_result += test_fail(f"Received '{a[1]}'; expected '2 m'", verbose)
+
+		# Test operations which break the unit rules
+		for name, operation in [
+			("adding incompatible units", lambda: a + UC_Batch.QuantityArray([1, 2, 3], unit_s, useNumpy)),
+			("subtracting incompatible units", lambda: a - UC_Unit.Quantity(1, unit_s)),
+			("exponentiating by a unit", lambda: a ** UC_Unit.Quantity(2, unit_s)),
+			("exponentiating a unit by an array", lambda: a ** UC_Batch.QuantityArray([1, 2, 3], None, useNumpy)),
+			("converting to an incompatible unit", lambda: a.to(unit_s, convertor)),
+		]:
+			try:
+				operation()
+				test_result += test_fail(f"Succeeded {name}", verbose)
+			except UC_Common.UnitError: pass
+
+	# Test that array.array buffers are kept, and that mismatched lengths cannot be combined
+	values = array.array('d', [1, 2])
+	if UC_Batch.QuantityArray(values, unit_m).values is not values: test_result += test_fail("Copied an array.array buffer", verbose)
+	try:
+		UC_Batch.QuantityArray(values, unit_m) + UC_Batch.QuantityArray(array.array('d', [1, 2, 3]), unit_m)
+		test_result += test_fail("Added arrays of different lengths", verbose)
+	except ValueError: pass
+
+	return test_result
+
+def test_numpy_arrays(verbose = False):
+	test_result = 0
+
+	# NumPy is optional, so its paths are skipped when it is not installed
+	numpy = UC_Batch.numpy
+	if numpy is None:
+		print("test_numpy_arrays: skipped, NumPy is not installed")
+		return test_result
+	unit_m = UC_Unit.Unit("m")
+	convertor = UC_Convertor.Convertor({"m": unit_m, "ft": UC_Unit.Unit("ft", {"m": 1})}, {"ft": Decimal("0.3048")}, {})
+
+	# Test buffer selection
+	values = numpy.array([1.0, 2.0, 3.0])
+	if UC_Batch.toBuffer(values) is not values: test_result += test_fail("Copied a NumPy float buffer", verbose)
+	buffer = UC_Batch.toBuffer(numpy.array([1, 2, 3]))
+	if buffer.dtype != float or list(buffer) != [1, 2, 3]: test_result += test_fail(f"Received buffer {buffer!r}; expected floats", verbose)
+	if not UC_Batch.isNumpyArray(UC_Batch.toBuffer([1, 2])): test_result += test_fail("Did not use NumPy by default", verbose)
+	if not isinstance(UC_Batch.toBuffer(values, False), array.array): test_result += test_fail("Did not convert NumPy buffer to array.array", verbose)
+	if not UC_Batch.isNumpyArray(UC_Batch.QuantityArray([1, 2], unit_m).values): test_result += test_fail("Did not store a list in NumPy", verbose)
+	if UC_Batch.isNumpyArray(UC_Batch.QuantityArray(array.array('d', [1, 2]), unit_m).values): test_result += test_fail("Converted an array.array to NumPy", verbose)
+	if UC_Batch.QuantityArray(values, unit_m).values is not values: test_result += test_fail("Copied a NumPy array", verbose)
+
+	# Test element-wise operations, broadcasting, and mixing NumPy arrays with array.array buffers
+	result = UC_Batch.elementwise(operator.add, values, 1.0)
+	if not UC_Batch.isNumpyArray(result) or list(result) != [2, 3, 4]: test_result += test_fail(f"Received {result!r}; expected [2, 3, 4]", verbose)
+	result = UC_Batch.elementwise(operator.mul, array.array('d', [1, 2, 3]), values)
+	if not UC_Batch.isNumpyArray(result) or list(result) != [1, 4, 9]: test_result += test_fail(f"Received {result!r}; expected [1, 4, 9]", verbose)
+	try:
+		UC_Batch.elementwise(operator.add, values, numpy.array([1.0, 2.0]))
+		test_result += test_fail("Added NumPy arrays of different lengths", verbose)
+	except ValueError: pass
+	a = UC_Batch.QuantityArray(values, unit_m)
+	test_result += array_expect(a + UC_Batch.QuantityArray(array.array('d', [1, 1, 1]), unit_m), [2, 3, 4], unit_m, verbose)
+	test_result += array_expect(a ** 2, [1, 4, 9], unit_m ** 2, verbose)
+	test_result += array_expect(1 - UC_Batch.QuantityArray(values), [0, -1, -2], UC_Unit.Unit(), verbose)
+	test_result += array_expect(a.to(UC_Unit.Unit("ft"), convertor), [3.280839895, 6.56167979, 9.842519685], UC_Unit.Unit("ft"), verbose)
+
+	# Test indexing, slicing, and iteration
+	if a[0] != UC_Unit.Quantity(1.0, unit_m) or not isinstance(a[0].value, float): test_result += test_fail(f"Received '{a[0]}'; expected '1.0 m'", verbose)
+	test_result += array_expect(a[1:], [2, 3], unit_m, verbose)
+	if [*a] != [UC_Unit.Quantity(value, unit_m) for value in [1.0, 2.0, 3.0]]: test_result += test_fail(f"Received {[*a]}; expected quantities", verbose)
+	if str(a) != "[1.0, 2.0, 3.0] m": test_result += test_fail(f"Received '{a}'; expected '[1.0, 2.0, 3.0] m'", verbose)
+	if a != UC_Batch.QuantityArray(array.array('d', [1, 2, 3]), unit_m): test_result += test_fail("NumPy and array.array arrays are not equal", verbose)
+
+	return test_result
+
+def main():
+	# Run tests
+	verbose = True
+	print(f"test_batch: {test_batch(verbose)} tests failed")
+	print(f"test_evaluate_lines: {test_evaluate_lines(verbose)} tests failed")
+	print(f"test_quantity_array: {test_quantity_array(verbose)} tests failed")
+	print(f"test_numpy_arrays: {test_numpy_arrays(verbose)} tests failed")
+
+if (__name__ == "__main__"):
+	main()
\ No newline at end of file
@@ -0,0 +1,79 @@
+from src.UC_Cache import *
+from src.UC_Convertor import *
+from src.UC_Unit import *
+
+def test_fail(msg, verbose):
+	if verbose: print(f"Test failed: {msg}")
+	return 1
+
+def stats_expect(cache, expected, verbose):
+	stats = cache.getStats()
+	for name, value in expected.items():
+		if stats[name] != value: return test_fail(f"Received {name} {stats[name]}; expected {value}", verbose)
+	return 0
+
+def test_eviction(verbose = False):
+	test_result = 0
+	cache = LRUCache(2)
+
+	# Test hits and misses
+	cache.put("a", 1)
+	cache.put("b", 2)
+	if cache.get("a") != 1: test_result += test_fail("Failed to get cached value", verbose)
+	if cache.get("c") != None: test_result += test_fail("Received value for uncached key", verbose)
+	test_result += stats_expect(cache, {"size": 2, "hits": 1, "misses": 1, "evictions": 0}, verbose)
+
+	# Test that the least recently used entry is evicted
+	cache.put("c", 3)
+	if "b" in cache: test_result += test_fail("Least recently used entry was not evicted", verbose)
+	if "a" not in cache or "c" not in cache: test_result += test_fail("Recently used entry was evicted", verbose)
+	test_result += stats_expect(cache, {"size": 2, "evictions": 1}, verbose)
+
+	# Test clearing and disabling the cache
+	cache.clear()
+	test_result += stats_expect(cache, {"size": 0, "hits": 1}, verbose)
+	cache = LRUCache(0)
+	cache.put("a", 1)
+	if "a" in cache: test_result += test_fail("Disabled cache stored an entry", verbose)
+
+	return test_result
+
+def test_conversion_cache(verbose = False):
+	test_result = 0
+
+	units = {
+		"m": Unit("m"),
+		"ft": Unit("ft", {"m": 1}),
+	}
+	conversions = {"ft": Decimal("0.3048")}
+	prefixes = {"k": (Decimal(10), Decimal(3))}
+	convertor = Convertor(units, conversions, prefixes, 4)
+
+	# Test that repeated conversions are cached
+	convertor.convert(Unit("ft"), Unit("m"))
+	convertor.convert(Unit(baseUnits = {"ft": 1}), Unit("m"))
+	test_result += stats_expect(convertor.conversionCache, {"size": 1, "hits": 1, "misses": 1}, verbose)
+
+	# Test that failed conversions are not cached
+	try: convertor.convert(Unit("ft"), Unit("kg"))
+	except UC_Common.UnitError: pass
+	test_result += stats_expect(convertor.conversionCache, {"size": 1}, verbose)
+
+	# Test that cached conversions are discarded when definitions change
+	convertor.delUnit("ft")
+	convertor.addUnit("ft", Decimal("0.5"), Unit("m"))
+	if convertor.convert(Unit("ft"), Unit("m")) != Decimal("0.5"):
+		test_result += test_fail("Received stale conversion after redefining unit", verbose)
+	convertor.addPrefix("M", Decimal(10), Decimal(6))
+	test_result += stats_expect(convertor.conversionCache, {"size": 0}, verbose)
+
+	return test_result
+
+def main():
+	# Run tests
+	verbose = True
+	print(f"test_eviction: {test_eviction(verbose)} tests failed")
+	print(f"test_conversion_cache: {test_conversion_cache(verbose)} tests failed")
+
+if (__name__ == "__main__"):
+	main()
\ No newline at end of file
@@ -0,0 +1,137 @@
+from decimal import Decimal
+from fractions import Fraction
+import src.UC_AST as UC_AST
+import src.UC_Common as UC_Common
+import src.UC_Compiler as UC_Compiler
+import src.UC_Convertor as UC_Convertor
+import src.UC_StrParser as UC_StrParser
+import src.UC_Unit as UC_Unit
+
+def test_fail(msg, verbose):
+	if verbose: print(f"Test failed: {msg}")
+	return 1
+
+def loadConvertor(numberType = Decimal):
+	units = {
+		"m": UC_Unit.Unit("m"),
+		"s": UC_Unit.Unit("s"),
+		"ft": UC_Unit.Unit("ft", {"m": 1}),
+		"inch": UC_Unit.Unit("inch", {"ft": 1}),
+	}
+	conversions = {"ft": Decimal("0.3048"), "inch": Decimal(1) / Decimal(12)}
+	prefixes = {"k": (Decimal(10), Decimal(3)), "c": (Decimal(10), Decimal(-2))}
+	return UC_Convertor.Convertor(units, conversions, prefixes, numberType = numberType)
+
+def compile_expect(string, convertor, verbose):
+	# Compare the compiled expression against evaluating the tree
+	try: expected = UC_StrParser.parse(string, convertor.numberType).evaluate(convertor)
+	except (UC_Common.UnitError, ArithmeticError) as err: expected = type(err)
+	try: result = UC_StrParser.compile(string, convertor.numberType).evaluate(convertor)
+	except (UC_Common.UnitError, ArithmeticError) as err: result = type(err)
+	if result != expected: return test_fail(f"Received '{result}' for '{string}'; expected '{expected}'", verbose)
+	return 0
+
+def placeholder_expect(string, value, convertor, verbose):
+	# Compare the compiled expression against the numeric function compiled from the tree
+	unit, function = UC_StrParser.parse(string, convertor.numberType).compileNumeric(convertor, convertor.toNumber)
+	expected = UC_Unit.Quantity(function(value), unit)
+	expression = UC_StrParser.compile(string, convertor.numberType)
+	result = expression.evaluate(convertor, value)
+	if result != expected: return test_fail(f"Received '{result}' for '{string}' with {value}; expected '{expected}'", verbose)
+
+	# Test that interpreting the program matches running its assembled function
+	interpreted = expression.getProgram(convertor).interpret(value)
+	if interpreted != result.value: return test_fail(f"Interpreted '{string}' with {value} as '{interpreted}'; expected '{result.value}'", verbose)
+	return 0
+
+def test_compile(verbose = False):
+	test_result = 0
+
+	# Test that compiled expressions evaluate to the same results and errors as trees
+	for numberType in [Decimal, float, Fraction]:
+		convertor = loadConvertor(numberType)
+		test_result += compile_expect("1 ft + 6 inch : m", convertor, verbose)
+		test_result += compile_expect("3 m - 2 ft - 1 inch", convertor, verbose)
+		test_result += compile_expect("2 km * 3 s * 4 m / 2 s", convertor, verbose)
+		test_result += compile_expect("(2 ft + 1 m)^2 : cm^2", convertor, verbose)
+		test_result += compile_expect("(2 ft)^(6 inch / 1 ft) : m^(1/2)", convertor, verbose)
+		test_result += compile_expect("1 m / (1 s - 1 s)", convertor, verbose)
+		test_result += compile_expect("1 m + 1 s", convertor, verbose)
+		test_result += compile_expect("1 m : 1 s", convertor, verbose)
+		test_result += compile_expect("(1 m)^(1 s)", convertor, verbose)
+		test_result += compile_expect("1 furlong", convertor, verbose)
+
+	# Test expressions with placeholders
+	convertor = loadConvertor()
+	test_result += placeholder_expect("? ft : m", Decimal(3), convertor, verbose)
+	test_result += placeholder_expect("? ft + 6 inch - ? m : inch", Decimal("1.5"), convertor, verbose)
+	test_result += placeholder_expect("2 * ? m * 3 s * ? km", Decimal(7), convertor, verbose)
+	test_result += placeholder_expect("(? ft)^2 / 4 s : m^2/s", Decimal(10), convertor, verbose)
+	try:
+		UC_StrParser.compile("? ft : m").evaluate(convertor)
+		test_result += test_fail("Evaluated a placeholder without a value", verbose)
+	except UC_Common.UnitError: pass
+
+	# Test that constant expressions are lowered to a single instruction
+	program = UC_StrParser.compile("1 ft + 6 inch : m").getProgram(convertor)
+	if len(program.instructions) != 1 or program.instructions[0][0] != UC_Compiler.OP_CONST:
+		test_result += test_fail(f"Received program '{program}'; expected a single constant", verbose)
+	program = UC_StrParser.compile("? ft : m").getProgram(convertor)
+	if [opcode for opcode, argument in program.instructions] != [UC_Compiler.OP_LOAD, UC_Compiler.OP_CONST, UC_Compiler.OP_EQL]:
+		test_result += test_fail(f"Received program '{program}'; expected LOAD, CONST, EQL", verbose)
+
+	return test_result
+
+def test_recompile(verbose = False):
+	test_result = 0
+	convertor = loadConvertor()
+	expression = UC_StrParser.compile("3 yd : m")
+
+	# Test that expressions are lowered again when definitions change
+	try:
+		expression.evaluate(convertor)
+		test_result += test_fail("Evaluated an undefined unit", verbose)
+	except UC_Common.UnitError: pass
+	for conversion, expected in [(Decimal(3), Decimal("2.7432")), (Decimal(4), Decimal("3.6576"))]:
+		if "yd" in convertor.units: convertor.delUnit("yd")
+		convertor.addUnit("yd", conversion, UC_Unit.Unit("ft"))
+		result = expression.evaluate(convertor)
+		if result != UC_Unit.Quantity(expected, UC_Unit.Unit("m")): test_result += test_fail(f"Received '{result}'; expected '{expected} m'", verbose)
+
+	# Test that expressions are lowered separately for each convertor
+	other = loadConvertor()
+	other.addUnit("yd", Decimal(3), UC_Unit.Unit("ft"))
+	result = expression.evaluate(other)
+	if result != UC_Unit.Quantity(Decimal("2.7432"), UC_Unit.Unit("m")): test_result += test_fail(f"Received '{result}'; expected '2.7432 m'", verbose)
+	if str(expression) != str(expression.root): test_result += test_fail(f"Received '{expression}'; expected '{expression.root}'", verbose)
+
+	return test_result
+
+def test_deep_expressions(verbose = False):
+	test_result = 0
+	convertor = loadConvertor()
+
+	# Test that deep trees are lowered and evaluated without recursion
+	depth = 10000
+	ast = UC_AST.AST_Placeholder(UC_Unit.Unit("m"))
+	for i in range(depth): ast = UC_AST.AST_Add(UC_AST.AST_Placeholder(UC_Unit.Unit("cm")), ast)
+	result = UC_Compiler.CompiledExpression(ast).evaluate(convertor, Decimal(100))
+	if result != UC_Unit.Quantity(Decimal(depth + 100), UC_Unit.Unit("m")):
+		test_result += test_fail(f"Received '{result}'; expected '{depth + 100} m'", verbose)
+
+	# Test that long products are assembled without recursion
+	result = UC_StrParser.compile(" * ".join(["?"] * depth)).evaluate(convertor, Decimal(1))
+	if result != UC_Unit.Quantity(Decimal(1), UC_Unit.Unit()):
+		test_result += test_fail(f"Received '{result}'; expected '1'", verbose)
+
+	return test_result
+
+def main():
+	# Run tests
+	verbose = True
+	print(f"test_compile: {test_compile(verbose)} tests failed")
+	print(f"test_recompile: {test_recompile(verbose)} tests failed")
+	print(f"test_deep_expressions: {test_deep_expressions(verbose)} tests failed")
+
+if (__name__ == "__main__"):
+	main()
\ No newline at end of file
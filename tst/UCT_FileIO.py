@@ -1,4 +1,6 @@
 from decimal import Decimal
+import os
+import tempfile
 import src.UC_Common as UC_Common
 import src.UC_Utils as UC_Utils
 import src.UC_FileIO as UC_FileIO
@@ -59,6 +61,11 @@ def test_tokenization(verbose = False):
 		["ABC", "D", "A", "BC", "DEF", "G"],
 	verbose)
 
+	# Test token positions
+	positions = list(UC_FileIO.generateTokens(["A:1; # B", "  CD\t2"]))
+	expected = [("A", 1, 1), (":", 1, 2), ("1", 1, 3), (";", 1, 4), ("CD", 2, 3), ("2", 2, 6)]
+	if positions != expected: test_result += test_fail(f"Expected {expected}, received {positions}", verbose)
+
 	return test_result
 
 def test_parser(verbose = False):
@@ -74,6 +81,18 @@ def test_parser(verbose = False):
 		test_result += test_fail(f"Received unexpected token {token}", verbose)
 	except: pass
 
+	# Test that parsing consumes tokens from the caller's list
+	tokens = ["A", ";", "B", ";"]
+	UC_FileParser.parseUnit({}, {}, tokens)
+	if tokens != ["B", ";"]: test_result += test_fail(f"Expected remaining tokens ['B', ';'], received {tokens}", verbose)
+
+	# Test token streams fed by generators
+	tokens = UC_Utils.TokenStream(token for token in ["A1", "B2"])
+	if UC_Utils.peekNextToken(tokens) != "A1": test_result += test_fail("Failed to peek expected symbol", verbose)
+	if tokens[1] != "B2": test_result += test_fail("Failed to peek expected symbol", verbose)
+	if UC_Utils.getNextToken(tokens, "A1") != "A1": test_result += test_fail("Failed to get expected symbol", verbose)
+	if UC_Utils.getNextToken(tokens) != "B2" or tokens: test_result += test_fail("Failed to consume stream", verbose)
+
 	# Test the parsing of basic datatypes
 	res = UC_Utils.parseInt(["2"])
 	if res != Decimal("2"): test_result += test_fail("Incorrectly parsed int", verbose)
@@ -141,11 +160,34 @@ def test_parser(verbose = False):
 	
 	return test_result
 
+def load_error_expect(contents, expected, verbose):
+	file = tempfile.NamedTemporaryFile('w', suffix = ".uc", delete = False)
+	file.write(contents)
+	file.close()
+	try:
+		UC_FileIO.loadFile(file.name, {}, {}, {})
+		return test_fail(f"Loaded '{contents}'; expected error", verbose)
+	except UC_Common.FileFormatError as err:
+		if expected not in str(err): return test_fail(f"Received error '{err}'; expected '{expected}'", verbose)
+		return 0
+	finally: os.remove(file.name)
+
+def test_loading(verbose = False):
+	test_result = 0
+
+	# Test that parsing errors report the position of the offending token
+	test_result += load_error_expect("m;\nkm : 1000, m 1 x;\n", "line 2, column 16", verbose)
+	test_result += load_error_expect("m;\n\n  m;\n", "line 3, column 3", verbose)
+	test_result += load_error_expect("10 : k 3,\n", "line 1, column 9", verbose)
+
+	return test_result
+
 def main():
 	# Run tests
 	verbose = True
 	print(f"test_tokenization: {test_tokenization(verbose)} tests failed")
 	print(f"test_parser: {test_parser(verbose)} tests failed")
+	print(f"test_loading: {test_loading(verbose)} tests failed")
 
 if (__name__ == "__main__"):
 	main()
\ No newline at end of file
@@ -0,0 +1,97 @@
+from decimal import Decimal
+import src.UC_Convertor as UC_Convertor
+import src.UC_FileIO as UC_FileIO
+import src.UC_Metrics as UC_Metrics
+import src.UC_StrParser as UC_StrParser
+import src.UC_Unit as UC_Unit
+
+def test_fail(msg, verbose):
+	if verbose: print(f"Test failed: {msg}")
+	return 1
+
+def counter_expect(expected, verbose):
+	counters = UC_Metrics.snapshot()["counters"]
+	for name, value in expected.items():
+		if counters.get(name, 0) != value: return test_fail(f"Received {name} {counters.get(name, 0)}; expected {value}", verbose)
+	return 0
+
+def test_histogram(verbose = False):
+	test_result = 0
+
+	# Test that values are counted in cumulative buckets
+	histogram = UC_Metrics.Histogram((1, 10))
+	for value in [0.5, 1, 5, 100]: histogram.observe(value)
+	stats = histogram.getStats()
+	if stats["buckets"] != {1: 2, 10: 3}: test_result += test_fail(f"Received buckets {stats['buckets']}; expected {{1: 2, 10: 3}}", verbose)
+	if stats["count"] != 4 or stats["sum"] != 106.5:
+		test_result += test_fail(f"Received count {stats['count']} and sum {stats['sum']}; expected 4 and 106.5", verbose)
+
+	return test_result
+
+def test_metrics(verbose = False):
+	test_result = 0
+
+	units = {
+		"m": UC_Unit.Unit("m"),
+		"s": UC_Unit.Unit("s"),
+		"ft": UC_Unit.Unit("ft", {"m": 1}),
+	}
+	conversions = {"ft": Decimal("0.3048")}
+	prefixes = {"k": (Decimal(10), Decimal(3))}
+	convertor = UC_Convertor.Convertor(units, conversions, prefixes)
+
+	# Test that nothing is recorded while disabled
+	UC_Metrics.reset()
+	UC_StrParser.parse("1 ft : m").evaluate(convertor)
+	if UC_Metrics.snapshot() != {"counters": {}, "histograms": {}}: test_result += test_fail("Recorded metrics while disabled", verbose)
+
+	UC_Metrics.enable()
+	try:
+		# Test parser and conversion counters
+		UC_StrParser.parse("1 ft : km").evaluate(convertor)
+		UC_StrParser.parse("2 ft : km").evaluate(convertor)
+		try: UC_StrParser.parse("1 ft : s").evaluate(convertor)
+		except: pass
+		test_result += counter_expect({
+			"parses": 3,
+			"conversion_cache_hits": 1,
+			"conversion_cache_misses": 2,
+			"conversion_errors": 1,
+			"prefix_strips": 1,
+		}, verbose)
+		histograms = UC_Metrics.snapshot()["histograms"]
+		for name in ["parse_seconds", "parse_tokenize_seconds", "parse_aggregate_seconds", "parse_rpn_seconds", "parse_parse_expr_seconds", "convert_seconds"]:
+			if name not in histograms: test_result += test_fail(f"Missing histogram '{name}'", verbose)
+		if histograms["convert_seconds"]["count"] != 3:
+			test_result += test_fail(f"Received {histograms['convert_seconds']['count']} conversions; expected 3", verbose)
+
+		# Test file loading metrics
+		UC_Metrics.reset()
+		UC_FileIO.loadFile("standard.uc", {}, {}, {})
+		test_result += counter_expect({"file_loads": 1, "topological_sorts": 1}, verbose)
+		if "load_file_validate_seconds" not in UC_Metrics.snapshot()["histograms"]:
+			test_result += test_fail("Missing histogram 'load_file_validate_seconds'", verbose)
+
+		# Test the Prometheus text format
+		text = UC_Metrics.toPrometheus()
+		for expected in [
+			"# TYPE unit_convertor_file_loads_total counter\nunit_convertor_file_loads_total 1\n",
+			"# TYPE unit_convertor_load_file_seconds histogram\n",
+			"unit_convertor_load_file_seconds_bucket{le=\"+Inf\"} 1\n",
+			"unit_convertor_load_file_seconds_count 1\n",
+		]:
+			if expected not in text: test_result += test_fail(f"Missing '{expected}' in Prometheus text", verbose)
+	finally:
+		UC_Metrics.disable()
+		UC_Metrics.reset()
+
+	return test_result
+
+def main():
+	# Run tests
+	verbose = True
+	print(f"test_histogram: {test_histogram(verbose)} tests failed")
+	print(f"test_metrics: {test_metrics(verbose)} tests failed")
+
+if (__name__ == "__main__"):
+	main()
@@ -0,0 +1,75 @@
+from decimal import Decimal
+import os
+import tempfile
+import src.UC_Common as UC_Common
+import src.UC_Convertor as UC_Convertor
+import src.UC_FileIO as UC_FileIO
+import src.UC_Snapshot as UC_Snapshot
+import src.UC_StrParser as UC_StrParser
+import src.UC_Unit as UC_Unit
+
+def test_fail(msg, verbose):
+	if verbose: print(f"Test failed: {msg}")
+	return 1
+
+def loadConvertor(filename):
+	units, conversions, prefixes = {}, {}, {}
+	UC_FileIO.loadFile(filename, units, conversions, prefixes)
+	return UC_Convertor.Convertor(units, conversions, prefixes)
+
+def evaluation_expect(string, convertor, expected, verbose):
+	result = UC_StrParser.parse(string).evaluate(convertor)
+	if str(result) != str(expected): return test_fail(f"Received '{result}' for '{string}'; expected '{expected}'", verbose)
+	return 0
+
+def test_snapshot(verbose = False):
+	test_result = 0
+	directory = tempfile.TemporaryDirectory()
+	filename = os.path.join(directory.name, f"standard{UC_Snapshot.EXTENSION}")
+
+	# Test that a snapshot reproduces the original definitions
+	original = loadConvertor("standard.uc")
+	original.saveSnapshot(filename)
+	if not UC_Snapshot.isSnapshot(filename): test_result += test_fail("Snapshot has no header", verbose)
+	if UC_Snapshot.isSnapshot("standard.uc"): test_result += test_fail("Text file detected as snapshot", verbose)
+	convertor = UC_Convertor.Convertor.fromSnapshot(filename)
+	if convertor.units.keys() != original.units.keys(): test_result += test_fail("Snapshot units differ", verbose)
+	if convertor.conversions != original.conversions: test_result += test_fail("Snapshot conversions differ", verbose)
+	if convertor.prefixes != original.prefixes: test_result += test_fail("Snapshot prefixes differ", verbose)
+	if len(convertor.compiledUnits) != len(original.units): test_result += test_fail("Snapshot units were not compiled", verbose)
+	for string in ["60 mph : m/s", "100 kg * 9.8 m/s^2 : N", "500 N / 12 mm^2 : kPa", "123.4 lb / (5 ft + 6 in)^2 : BMI"]:
+		test_result += evaluation_expect(string, convertor, UC_StrParser.parse(string).evaluate(original), verbose)
+
+	# Test that precompiled units are invalidated when definitions change
+	convertor.delUnit("ft")
+	convertor.addUnit("ft", Decimal("0.5"), UC_Unit.Unit("m"))
+	test_result += evaluation_expect("2 ft : m", convertor, "1.0 m", verbose)
+
+	# Test merging a snapshot into existing definitions
+	convertor = loadConvertor("standard.uc")
+	try:
+		convertor.load(filename)
+		test_result += test_fail("Merged duplicate definitions", verbose)
+	except UC_Common.FileFormatError: pass
+	convertor.load(filename, True)
+	test_result += evaluation_expect("60 mph : m/s", convertor, UC_StrParser.parse("60 mph : m/s").evaluate(original), verbose)
+
+	# Test that corrupt snapshots are rejected
+	with open(filename, 'rb') as file: data = file.read()
+	for corruptData in [b"", UC_Snapshot.MAGIC, data[:len(data) // 2]]:
+		with open(filename, 'wb') as file: file.write(corruptData)
+		try:
+			UC_Convertor.Convertor.fromSnapshot(filename)
+			test_result += test_fail(f"Loaded corrupt snapshot of {len(corruptData)} bytes", verbose)
+		except UC_Common.FileFormatError: pass
+
+	directory.cleanup()
+	return test_result
+
+def main():
+	# Run tests
+	verbose = True
+	print(f"test_snapshot: {test_snapshot(verbose)} tests failed")
+
+if (__name__ == "__main__"):
+	main()
@@ -1,4 +1,8 @@
+from decimal import Decimal
+from fractions import Fraction
+import src.UC_Convertor as UC_Convertor
 import src.UC_StrParser as UC_StrParser
+import src.UC_Unit as UC_Unit
 
 def test_fail(msg, verbose):
 	if verbose: print(f"Test failed: {msg}")
@@ -42,6 +46,20 @@ def test_tokenization(verbose = False):
 		["a", "*", "(", "b", "+", "c", ")", "^", "2", "cm", ":", "m"],
 	verbose)
 
+	# Check floats which are immediately followed by '.'
+	test_result += tokenization_expect("1.5.5", ["1.5", ".", "5"], verbose)
+	test_result += tokenization_expect("1e.5", ["1", "e.", "5"], verbose)
+	test_result += tokenization_expect("1e+.5", ["1", "e", "+", ".", "5"], verbose)
+	test_result += tokenization_expect("a.5.b", ["a.5", ".b"], verbose)
+
+	# Check that the single-pass tokenizer matches the character-level tokenizer
+	chars = "0123456789.eE+-*/^:()? \ta_"
+	for i in range(2000):
+		string = "".join(chars[(i * 7 + j * j * 13) % len(chars)] for j in range(i % 11))
+		expected = UC_StrParser.tokenizeByCharacter(string)
+		test_result += tokenization_expect(string, expected, verbose)
+	test_result += tokenization_expect("2 m² + 1 µm", UC_StrParser.tokenizeByCharacter("2 m² + 1 µm"), verbose)
+
 	return test_result
 
 def aggregation_expect(tokens, expected, verbose):
@@ -260,6 +278,37 @@ def test_parser(verbose = False):
 
 	return test_result
 
+def test_parse_cache(verbose = False):
+	test_result = 0
+	units = {"m": UC_Unit.Unit("m"), "ft": UC_Unit.Unit("ft", {"m": 1})}
+	convertor = UC_Convertor.Convertor(units, {"ft": Decimal("0.3048")}, {"c": (Decimal(10), Decimal(-2))})
+	UC_StrParser.clearParseCache()
+
+	# Test that repeated strings reuse the same AST
+	ast = UC_StrParser.parseCached("1 ft + 2 cm : m")
+	if UC_StrParser.parseCached("1 ft + 2 cm : m") is not ast:
+		test_result += test_fail("Failed to reuse cached AST", verbose)
+	UC_StrParser.clearParseCache()
+	if UC_StrParser.parseCached("1 ft + 2 cm : m") is ast:
+		test_result += test_fail("Reused AST after clearing cache", verbose)
+
+	# Test that cached ASTs can be evaluated repeatedly
+	for string in ["1 ft + 2 cm : m", "1 ft - 2 cm : m", "4^(50 cm / 1 m)"]:
+		ast = UC_StrParser.parseCached(string)
+		expected = UC_StrParser.parse(string).evaluate(convertor)
+		for i in range(3):
+			result = ast.evaluate(convertor)
+			if result != expected: test_result += test_fail(f"Received '{result}' for '{string}'; expected '{expected}'", verbose)
+
+	# Test that magnitudes are parsed using the requested numeric type
+	for numberType in [float, Fraction]:
+		convertor = UC_Convertor.Convertor(units, {"ft": Decimal("0.3048")}, {"c": (Decimal(10), Decimal(-2))}, numberType = numberType)
+		result = UC_StrParser.parseCached("1.5 ft + 2 cm : m", numberType).evaluate(convertor)
+		if not isinstance(result.value, numberType) or abs(result.value - Fraction("0.4772")) > 1e-9:
+			test_result += test_fail(f"Received '{result}'; expected {numberType.__name__} '0.4772 m'", verbose)
+
+	return test_result
+
 def main():
 	# Run tests
 	verbose = True
@@ -267,6 +316,7 @@ def main():
 	print(f"test_aggregation: {test_aggregation(verbose)} tests failed")
 	print(f"test_rpn_conversion: {test_rpn_conversion(verbose)} tests failed")
 	print(f"test_parser: {test_parser(verbose)} tests failed")
+	print(f"test_parse_cache: {test_parse_cache(verbose)} tests failed")
 
 if (__name__ == "__main__"):
 	main()
\ No newline at end of file
@@ -0,0 +1,86 @@
+from src.UC_SuffixTrie import *
+
+def test_fail(msg, verbose):
+	if verbose: print(f"Test failed: {msg}")
+	return 1
+
+def strip_expect(trie, string, expected, verbose):
+	if expected == None:
+		try:
+			result = trie.stripPrefix(string)
+			return test_fail(f"Received '{result}'; expected error", verbose)
+		except: return 0
+	else:
+		result = trie.stripPrefix(string)
+		if result != expected: return test_fail(f"Received '{result}'; expected '{expected}'", verbose)
+		return 0
+
+def test_stripping(verbose = False):
+	test_result = 0
+	trie = SuffixTrie(["m", "g", "mg", "Pa"])
+
+	# Test strings without a prefix
+	test_result += strip_expect(trie, "m", ("", "m"), verbose)
+	test_result += strip_expect(trie, "mg", ("", "mg"), verbose)
+	test_result += strip_expect(trie, "Pa", ("", "Pa"), verbose)
+
+	# Test that the longest matching suffix is used
+	test_result += strip_expect(trie, "kg", ("k", "g"), verbose)
+	test_result += strip_expect(trie, "kmg", ("k", "mg"), verbose)
+	test_result += strip_expect(trie, "kPa", ("k", "Pa"), verbose)
+
+	# Test finding symbols by suffix
+	for suffix, expected in [("g", ["g", "mg"]), ("mg", ["mg"]), ("a", ["Pa"]), ("kg", [])]:
+		result = sorted(trie.endingWith(suffix))
+		if result != expected: test_result += test_fail(f"Received {result} ending with '{suffix}'; expected {expected}", verbose)
+
+	# Test strings with no matching suffix
+	test_result += strip_expect(trie, "", None, verbose)
+	test_result += strip_expect(trie, "a", None, verbose)
+	test_result += strip_expect(trie, "ms", None, verbose)
+
+	return test_result
+
+def test_mutation(verbose = False):
+	test_result = 0
+	trie = SuffixTrie(["m", "g"])
+
+	# Test that cached splits are updated when a symbol is added
+	test_result += strip_expect(trie, "mg", ("m", "g"), verbose)
+	trie.add("mg")
+	test_result += strip_expect(trie, "mg", ("", "mg"), verbose)
+	if len(trie) != 3: test_result += test_fail(f"Received size {len(trie)}; expected 3", verbose)
+
+	# Test that cached splits are updated when a symbol is removed
+	trie.remove("mg")
+	test_result += strip_expect(trie, "mg", ("m", "g"), verbose)
+	trie.remove("g")
+	test_result += strip_expect(trie, "mg", None, verbose)
+	test_result += strip_expect(trie, "cm", ("c", "m"), verbose)
+	if "g" in trie: test_result += test_fail("Removed symbol is still indexed", verbose)
+	if len(trie) != 1: test_result += test_fail(f"Received size {len(trie)}; expected 1", verbose)
+
+	# Test that removing a symbol keeps symbols which share its suffix
+	trie.add("cm")
+	trie.remove("m")
+	test_result += strip_expect(trie, "cm", ("", "cm"), verbose)
+	test_result += strip_expect(trie, "km", None, verbose)
+	trie.remove("cm")
+	if trie.root: test_result += test_fail("Empty trie was not pruned", verbose)
+
+	# Test that the cache of resolved splits is bounded
+	trie = SuffixTrie(["m"], 8)
+	for i in range(100): test_result += strip_expect(trie, f"p{i}m", (f"p{i}", "m"), verbose)
+	if len(trie.splits) > 8: test_result += test_fail(f"Received {len(trie.splits)} cached splits; expected at most 8", verbose)
+	test_result += strip_expect(trie, "p0m", ("p0", "m"), verbose)
+
+	return test_result
+
+def main():
+	# Run tests
+	verbose = True
+	print(f"test_stripping: {test_stripping(verbose)} tests failed")
+	print(f"test_mutation: {test_mutation(verbose)} tests failed")
+
+if (__name__ == "__main__"):
+	main()
\ No newline at end of file
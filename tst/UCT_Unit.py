@@ -1,3 +1,4 @@
+from decimal import Decimal
 from src.UC_Unit import *
 
 def test_fail(msg, verbose):
@@ -104,12 +105,81 @@ def test_multiplication(verbose = False):
 
 	return test_result
 
+def test_interning(verbose = False):
+	test_result = 0
+
+	# Test that identical units share one object
+	if Unit("m") is not Unit(baseUnits = {"m": 1}):
+		test_result += test_fail("constructing identical units returned different objects", verbose)
+	if Unit(baseUnits = {"m": 1, "s": -1}) is not Unit("m") / Unit("s"):
+		test_result += test_fail("dividing units returned a different object from the identical unit", verbose)
+	if Unit("m").clone() is not Unit("m"): test_result += test_fail("cloning a unit returned a new object", verbose)
+
+	# Test that equal units displayed differently are not shared
+	if str(Unit(baseUnits = {"m": Decimal("2.0")})) != "m^(2.0)" or str(Unit(baseUnits = {"m": Decimal(2)})) != "m^(2)":
+		test_result += test_fail("interning changed how exponents are displayed", verbose)
+
+	# Test that units are immutable
+	baseUnits = {"m": 1, "s": -2}
+	unit = Unit(baseUnits = baseUnits)
+	baseUnits["m"] = 3
+	if unit.reduce() != {"m": 1, "s": -2}: test_result += test_fail("modifying the constructor argument changed the unit", verbose)
+	try:
+		unit.sym = "a"
+		test_result += test_fail("set the symbol of a unit", verbose)
+	except AttributeError: pass
+	try:
+		unit.baseUnits["m"] = 3
+		test_result += test_fail("modified the base units of a unit", verbose)
+	except TypeError: pass
+
+	# Test that equal units have equal hashes and can be used as keys
+	unit_a = Unit(baseUnits = {"m": 1, "s": -1, "kg": 0})
+	unit_b = Unit(baseUnits = {"s": -1, "m": 1})
+	if unit_a != unit_b or hash(unit_a) != hash(unit_b):
+		test_result += test_fail("equivalent units are unequal or have different hashes", verbose)
+	if {unit_a: 1}.get(unit_b) != 1: test_result += test_fail("failed to look up an equivalent unit", verbose)
+	if Unit("m") == Unit(baseUnits = {"m": 2}) or Unit("m") == None:
+		test_result += test_fail("unequal units are equal", verbose)
+
+	return test_result
+
+def test_memoization(verbose = False):
+	test_result = 0
+	unit_m = Unit("m")
+	unit_s = Unit("s")
+
+	# Test that products and quotients of the same units are reused
+	if (unit_m * unit_s) is not (unit_m * unit_s) or (unit_m / unit_s) is not (unit_m / unit_s):
+		test_result += test_fail("repeated unit arithmetic returned different objects", verbose)
+
+	# Test that equal units displayed differently are not conflated
+	unit_ms = Unit(baseUnits = {"m": 1, "s": 1})
+	unit_sm = Unit(baseUnits = {"s": 1, "m": 1})
+	if str(unit_ms * Unit("g")) != "m s g" or str(unit_sm * Unit("g")) != "s m g":
+		test_result += test_fail("memoized products changed the order of units", verbose)
+
+	# Test that quantity arithmetic shares units rather than copying them
+	q1 = Quantity(1, unit_ms)
+	if (q1 + Quantity(2, unit_sm)).unit is not unit_ms or (q1 - q1).unit is not unit_ms:
+		test_result += test_fail("adding quantities did not reuse the unit", verbose)
+	if (q1 * q1).unit is not (Quantity(3, unit_ms) * Quantity(4, unit_ms)).unit:
+		test_result += test_fail("multiplying quantities did not reuse the product unit", verbose)
+	try:
+		q1.magnitude = 2
+		test_result += test_fail("set an undeclared attribute on a quantity", verbose)
+	except AttributeError: pass
+
+	return test_result
+
 def main():
 	# Run tests
 	verbose = True
 	print(f"test_equality: {test_equality(verbose)} tests failed")
 	print(f"test_addition: {test_addition(verbose)} tests failed")
 	print(f"test_multiplication: {test_multiplication(verbose)} tests failed")
+	print(f"test_interning: {test_interning(verbose)} tests failed")
+	print(f"test_memoization: {test_memoization(verbose)} tests failed")
 
 if (__name__ == "__main__"):
 	main()
\ No newline at end of file